@@ -1,17 +1,18 @@
 import json
 import re
 import os
+import uuid
 import logging
 import requests as r
+import transport
 import configparser
 from pydantic import BaseModel
 from pathlib import Path
 from datetime import datetime
 from enum import StrEnum, Enum
-from typing import Callable, Any, Optional
-from collections import defaultdict
+from typing import TYPE_CHECKING, Callable, Any, Collection, Optional, TypeVar
+from collections import Counter, defaultdict
 from functools import partial, wraps
-from tkinter import Tk, filedialog
 from models import (
     SCACustomerV2,
     ProductPriceBasic,
@@ -21,14 +22,29 @@ from models import (
     RatingRels,
     Vendor,
     VendorCustomer,
-    Attr,
+    PRODUCT_PRICES,
+    trusted_constructor,
+    pricing_sort_key,
 )
 from auth import AuthToken
+from decoding import document, loads, read_document
+from write_behind import EditKind, EditKey, PendingEdit
+from metrics import METRICS, route_template
+from retries import RetryPolicy, call_with_retries
+from singleflight import SingleFlight
+from tracing import span, traced
+from pricing_engine import PriceEngine
+from logging_setup import StepLogger
+
+if TYPE_CHECKING:
+    from catalog import CatalogMirror
+    from snapshot import Snapshot
 
 logger = logging.getLogger(__name__)
+T = TypeVar("T")
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 configs = configparser.ConfigParser()
-configs.read("config.ini")
+configs.read(os.environ.get("BACKEND_TUI_CONFIG", "config.ini"))
 
 
 def debug(content: Any) -> None:
@@ -47,10 +63,10 @@ def debug(content: Any) -> None:
 def reset_request_methods() -> None:
     AuthToken.get_new_token()
     global r_get, r_post, r_patch, r_delete
-    r_get = partial(retry(r.get), verify=VERIFY)
-    r_post = partial(retry(r.post), verify=VERIFY)
-    r_patch = partial(retry(r.patch), verify=VERIFY)
-    r_delete = partial(retry(r.delete), verify=VERIFY)
+    r_get = partial(retry(transport.get), verify=VERIFY)
+    r_post = partial(retry(transport.post, resend_safe=False), verify=VERIFY)
+    r_patch = partial(retry(transport.patch), verify=VERIFY)
+    r_delete = partial(retry(transport.delete), verify=VERIFY)
 
 
 class ADPPricingClasses(StrEnum):
@@ -85,7 +101,32 @@ class NewProductDetails(BaseModel):
     material_group: str
 
 
-LOCAL_STORAGE = {"pricing_by_customer": {}}
+LOCAL_STORAGE = {"pricing_by_customer": {}, "ratings": {}, "zero_discount": {}}
+# fetches, and the parsing after them, in flight
+FETCHES = SingleFlight()
+# set by use_snapshot when running offline
+SNAPSHOT: Optional["Snapshot"] = None
+# set by use_catalog, answers catalog lookups without a backend call
+CATALOG: Optional["CatalogMirror"] = None
+
+
+def use_snapshot(path: Path) -> None:
+    """serve the read paths from an offline snapshot and stop all network calls"""
+    global SNAPSHOT
+    from snapshot import Snapshot
+
+    SNAPSHOT = Snapshot(path)
+    transport.go_offline()
+    logger.info(f"offline, using snapshot {path} from {SNAPSHOT.meta['created']}")
+
+
+def use_catalog(path: Path) -> "CatalogMirror":
+    """look products and classes up in the local catalog mirror at `path`"""
+    global CATALOG
+    from catalog import CatalogMirror
+
+    CATALOG = CatalogMirror(path)
+    return CATALOG
 
 
 def restructure_included(included: list[dict], primary: str, ids: list[int] = None):
@@ -101,9 +142,9 @@ def restructure_included(included: list[dict], primary: str, ids: list[int] = No
 
     for item in primary_objs:
         structured[item["id"]] = {
-            attr: value for attr, value in item["attributes"].items()
+            attr: value for attr, value in item.get("attributes", {}).items()
         }
-        for rel_key, rel_item in item["relationships"].items():
+        for rel_key, rel_item in item.get("relationships", {}).items():
             if "data" in rel_item:
                 related_ids = []
                 match rel_item["data"]:
@@ -192,6 +233,8 @@ def restructure_pricing_by_customer(
 
 
 def select_file() -> str:
+    from tkinter import Tk, filedialog
+
     root = Tk()
     root.withdraw()
     try:
@@ -212,6 +255,8 @@ def get_save_dir() -> Path:
     elif Path.exists(non_onedrive):
         return non_onedrive
     else:
+        from tkinter import Tk, filedialog
+
         root = Tk()
         root.withdraw()
         try:
@@ -231,33 +276,74 @@ PRICE_FILE_DOWNLOAD_LINK = (
     "?return_type=xlsx&effective_date={effective_date}"
 )
 
+# the local layout isn't the server's template, so it's opt-in
+LOCAL_PRICE_FILES = configs.getboolean("OTHER", "local_price_files", fallback=False)
+SPARSE_FIELDSETS = configs.getboolean("OTHER", "sparse_fieldsets", fallback=True)
+# unresolved models past which one download of every catalog identifier
+# beats a filtered lookup, and a round trip, for each
+CATALOG_LISTING_OVER = configs.getint("OTHER", "catalog_listing_over", fallback=20)
+LOCAL_PRICE_CHECKS = configs.getboolean("OTHER", "local_price_checks", fallback=True)
+# share of local price checks also asked of the server, to catch drift
+PRICE_CHECK_SAMPLE = configs.getfloat("OTHER", "price_check_sample", fallback=0.05)
 VERIFY = configs.getboolean("SSL", "verify")
+RETRY_POLICY = RetryPolicy(
+    attempts=configs.getint("OTHER", "retry_attempts", fallback=4),
+    base_delay=configs.getfloat("OTHER", "retry_base_s", fallback=0.25),
+    max_delay=configs.getfloat("OTHER", "retry_max_s", fallback=8.0),
+)
 
 if VERIFY:
     if path := configs.get("SSL", "path", fallback=None):
         VERIFY = path
 
 
-def retry(func: Callable) -> Callable:
+def retry(func: Callable, resend_safe: bool = True) -> Callable:
+    """
+    Re-authenticates once on a 401 and retries transient failures as
+    RETRY_POLICY says. Calls that aren't `resend_safe` carry an
+    Idempotency-Key and are only resent when retries.call_with_retries can
+    tell the first attempt had no effect, which an `exists` check helps with.
+    """
+
     @wraps(func)
-    def inner(*args, **kwargs):
-        auth_header = AuthToken.header
-        resp: r.Response = func(*args, headers=auth_header, **kwargs)
-        if resp.status_code == 401:
-            reset_request_methods()
-            auth_header = AuthToken.header
-            resp = func(*args, headers=auth_header, **kwargs)
+    def inner(
+        *args,
+        exists: Callable[[], r.Response | None] = None,
+        resend_safe: bool = resend_safe,
+        headers: dict = None,
+        **kwargs,
+    ):
+        extra_headers = dict(headers or {})
+        if not resend_safe:
+            extra_headers["Idempotency-Key"] = str(uuid.uuid4())
+
+        def send(attempt: int) -> r.Response:
+            # there's no token when running offline from a snapshot
+            auth_header = getattr(AuthToken, "header", None) or {}
+            headers = auth_header | extra_headers
+            resp: r.Response = func(
+                *args, headers=headers, retry_count=attempt, **kwargs
+            )
             if resp.status_code == 401:
-                raise Exception("Unable to authenticate")
-        return resp
+                reset_request_methods()
+                headers = AuthToken.header | extra_headers
+                resp = func(*args, headers=headers, retry_count=attempt + 1, **kwargs)
+                if resp.status_code == 401:
+                    raise Exception("Unable to authenticate")
+            return resp
+
+        url = kwargs.get("url") or (args[0] if args else "")
+        return call_with_retries(
+            send, RETRY_POLICY, resend_safe, exists, route_template(url)
+        )
 
     return inner
 
 
-r_get = partial(retry(r.get), verify=VERIFY)
-r_post = partial(retry(r.post), verify=VERIFY)
-r_patch = partial(retry(r.patch), verify=VERIFY)
-r_delete = partial(retry(r.delete), verify=VERIFY)
+r_get = partial(retry(transport.get), verify=VERIFY)
+r_post = partial(retry(transport.post, resend_safe=False), verify=VERIFY)
+r_patch = partial(retry(transport.patch), verify=VERIFY)
+r_delete = partial(retry(transport.delete), verify=VERIFY)
 
 
 class FileSaveError(Exception):
@@ -270,84 +356,265 @@ class UploadError(Exception):
     """Exception for an error in uploading a file"""
 
 
-def get_pricing_by_customer(for_customer: VendorCustomer) -> list[ProductPriceBasic]:
-    customer_id = for_customer.id
-    vendor_id = for_customer.vendor.id
-    default_sort_attr = Attr(id=-1, attr="", type_="", value="999999")
-    default_desc_attr = Attr(id=-1, attr="", type_="", value="")
-    if stored_pricing := LOCAL_STORAGE["pricing_by_customer"].get(customer_id):
-        pricing = stored_pricing
-    else:
-        pricing_url = (
-            BACKEND_URL + f"/v2/vendors/{vendor_id}/vendor-customers/{customer_id}"
-        )
-        includes = "include=vendor-pricing-by-customer.vendor-products"
-        includes += ",vendor-pricing-by-customer.vendor-pricing-by-customer-attrs"
-        resp: r.Response = r_get(f"{pricing_url}?{includes}")
-        data: dict = resp.json()
-        if not data.get("data"):
-            raise Exception("No product")
+class PersistError(Exception):
+    """Exception for an edit the backend refused to persist"""
+
+
+def sparse_fields(fields: dict[str, tuple[str, ...]]) -> str:
+    """
+    JSON:API sparse fieldset parameters asking for only `fields` of each
+    resource type. Relationships are fields too, the ones an include
+    follows have to be listed.
+    """
+    if not SPARSE_FIELDSETS:
+        return ""
+    return "".join(
+        f"&fields[{type_}]={','.join(names)}" for type_, names in fields.items()
+    )
+
+
+def shared_fetch(name: str, url: str, fetch: Callable[[], T]) -> T:
+    """
+    `fetch` of `url` once for all callers wanting it at the same time, they
+    share its parsed result
+    """
+    key = ("GET", url, transport.auth_scope(getattr(AuthToken, "header", None)))
+    return FETCHES.do(key, fetch, name)
+
+
+# what parse_pricing_by_customer reads
+PRICING_BY_CUSTOMER_FIELDS = {
+    "vendor-customers": ("vendor-pricing-by-customer",),
+    "vendor-pricing-by-customer": (
+        "price",
+        "effective-date",
+        "use-as-override",
+        "vendor-products",
+        "vendor-pricing-by-customer-attrs",
+    ),
+    "vendor-products": ("vendor-product-identifier", "vendor-product-description"),
+    "vendor-pricing-by-customer-attrs": ("attr", "type", "value"),
+}
+
+
+def pricing_by_customer_url(for_customer: VendorCustomer) -> str:
+    vendor_id, customer_id = for_customer.vendor.id, for_customer.id
+    pricing_url = (
+        BACKEND_URL + f"/v2/vendors/{vendor_id}/vendor-customers/{customer_id}"
+    )
+    includes = "include=vendor-pricing-by-customer.vendor-products"
+    includes += ",vendor-pricing-by-customer.vendor-pricing-by-customer-attrs"
+    return f"{pricing_url}?{includes}{sparse_fields(PRICING_BY_CUSTOMER_FIELDS)}"
+
+
+def parse_pricing_by_customer(data: dict) -> tuple[dict, list[ProductPriceBasic]]:
+    """
+    a customer's pricing document as stored in LOCAL_STORAGE and as
+    validated models
+    """
+    if not data.get("data"):
+        raise Exception("No product")
 
+    with span("restructure_included", included=len(data["included"])):
         includes_pricing_by_customer = restructure_included(
             data["included"], "vendor-pricing-by-customer"
         )
+    with span("restructure_pricing_by_customer"):
         pricing = restructure_pricing_by_customer(includes_pricing_by_customer)
-        LOCAL_STORAGE["pricing_by_customer"][customer_id] = pricing
-
-    result = [ProductPriceBasic(id=id_, **attrs) for id_, attrs in pricing.items()]
-    result.sort(
-        key=lambda p: (
-            int(p.attrs.get("sort_order", default_sort_attr).value),
-            p.attrs.get("custom_description", default_desc_attr).value,
-            (p.description if p.description else ""),
-            p.price,
-            p.model_number,
+    with span("validate", rows=len(pricing)):
+        result = PRODUCT_PRICES.validate_python(
+            [{"id": id_, **attrs} for id_, attrs in pricing.items()]
         )
-    )
+    return pricing, result
+
+
+def decode_pricing_by_customer(content: bytes) -> dict:
+    """
+    parse_pricing_by_customer from the raw response body, returning only
+    what is stored, so it can run in a worker process
+    """
+    return parse_pricing_by_customer(loads(content))[0]
+
+
+@traced()
+def get_pricing_by_customer(for_customer: VendorCustomer) -> list[ProductPriceBasic]:
+    customer_id = for_customer.id
+    stored_pricing = LOCAL_STORAGE["pricing_by_customer"].get(customer_id)
+    if stored_pricing:
+        METRICS.count_cache("pricing_by_customer", "hit")
+    elif SNAPSHOT:
+        stored_pricing = SNAPSHOT.pricing_by_customer(customer_id)
+        if not stored_pricing:
+            raise Exception(f"No pricing for {for_customer.name} in the snapshot")
+        LOCAL_STORAGE["pricing_by_customer"][customer_id] = stored_pricing
+    validated = []
+    if not stored_pricing:
+        url = pricing_by_customer_url(for_customer)
+
+        def fetch() -> dict:
+            resp: r.Response = r_get(url, decode=read_document)
+            with METRICS.parsing(resp.url):
+                data: dict = document(resp)
+                pricing, result = parse_pricing_by_customer(data)
+            validated.append(result)
+            LOCAL_STORAGE["pricing_by_customer"][customer_id] = pricing
+            return pricing
+
+        stored_pricing = shared_fetch("pricing_by_customer", url, fetch)
+    if validated:
+        result = validated[0]
+    else:
+        # stored as restructure_pricing_by_customer left it, normalize
+        # coerces the ids as validation would
+        with span("construct from cache", rows=len(stored_pricing)):
+            construct = trusted_constructor(ProductPriceBasic)
+            result = [
+                construct({"id": id_, **attrs}) for id_, attrs in stored_pricing.items()
+            ]
+
+    with span("sort", rows=len(result)):
+        result.sort(key=pricing_sort_key)
     return result
 
 
+@traced()
 def get_ratings(for_customer: VendorCustomer) -> Ratings:
-    url = f"/vendors/adp/{for_customer.id}/adp-program-ratings"
-    resp: r.Response = r_get(url)
-    data: dict = resp.json()
-    if not data.get("data"):
-        raise Exception("No Ratings")
-    customer_ratings = [
-        Rating(
-            id=record["id"],
-            attributes=RatingAttrs(**record["attributes"]),
-            relationships=RatingRels(
-                adp_customers={"data": {"id": for_customer.id, "type": "adp-customers"}}
-            ),
-        )
-        for record in data["data"]
-    ]
-    customer_ratings.sort(
-        key=lambda rating: (
-            rating.attributes.outdoor_model,
-            rating.attributes.indoor_model,
+    relationships = {
+        "adp-customers": {"data": {"id": for_customer.id, "type": "adp-customers"}}
+    }
+    stored_ratings = LOCAL_STORAGE["ratings"].get(for_customer.id)
+    if stored_ratings:
+        METRICS.count_cache("ratings", "hit")
+    elif SNAPSHOT:
+        stored_ratings = SNAPSHOT.ratings(for_customer.id)
+        if not stored_ratings:
+            raise Exception(f"No Ratings for {for_customer.name} in the snapshot")
+        LOCAL_STORAGE["ratings"][for_customer.id] = stored_ratings
+    validated = []
+    if not stored_ratings:
+        url = BACKEND_URL + f"/vendors/adp/{for_customer.id}/adp-program-ratings"
+
+        def fetch() -> list[dict]:
+            resp: r.Response = r_get(url, decode=read_document)
+            with METRICS.parsing(resp.url):
+                data: dict = document(resp)
+                if not data.get("data"):
+                    raise Exception("No Ratings")
+                with span("validate", rows=len(data["data"])):
+                    customer_ratings = [
+                        Rating(
+                            id=record["id"],
+                            attributes=RatingAttrs(**record["attributes"]),
+                            relationships=RatingRels(
+                                adp_customers={
+                                    "data": {
+                                        "id": for_customer.id,
+                                        "type": "adp-customers",
+                                    }
+                                }
+                            ),
+                        )
+                        for record in data["data"]
+                    ]
+            validated.append(customer_ratings)
+            stored = [
+                {
+                    "id": rating.id,
+                    "attributes": rating.attributes.model_dump(exclude_unset=True),
+                }
+                for rating in customer_ratings
+            ]
+            LOCAL_STORAGE["ratings"][for_customer.id] = stored
+            return stored
+
+        stored_ratings = shared_fetch("ratings", url, fetch)
+    if validated:
+        customer_ratings = validated[0]
+    else:
+        # validated when they were first fetched
+        with span("construct from cache", rows=len(stored_ratings)):
+            construct = trusted_constructor(Rating)
+            customer_ratings = [
+                construct(
+                    {
+                        "id": record["id"],
+                        "attributes": record["attributes"],
+                        "relationships": relationships,
+                    }
+                )
+                for record in stored_ratings
+            ]
+    with span("sort", rows=len(customer_ratings)):
+        customer_ratings.sort(
+            key=lambda rating: (
+                rating.attributes.outdoor_model,
+                rating.attributes.indoor_model,
+            )
         )
-    )
     return Ratings(data=customer_ratings)
 
 
-def get_vendors() -> list[Vendor]:
+VENDOR_FIELDS = {"vendors": ("name",)}
+
+
+def vendors_url() -> str:
     resource = "/v2/vendors"
     page_num = "page_number=0"
-    url = f"{BACKEND_URL}{resource}?{page_num}"
-    resp: r.Response = r_get(url=url)
-    resp_data = resp.json()
-    return [Vendor(v["id"], v["attributes"]["name"]) for v in resp_data["data"]]
+    return f"{BACKEND_URL}{resource}?{page_num}{sparse_fields(VENDOR_FIELDS)}"
 
 
-def get_sca_customers_w_vendor_accounts(vendor: Vendor) -> list[SCACustomerV2]:
+@traced()
+def get_vendors() -> list[Vendor]:
+    if SNAPSHOT:
+        return SNAPSHOT.vendors()
+    url = vendors_url()
+
+    def fetch() -> list[Vendor]:
+        resp: r.Response = r_get(url=url, decode=read_document)
+        with METRICS.parsing(resp.url):
+            resp_data = document(resp)
+            return [
+                Vendor.interned(v["id"], v["attributes"]["name"])
+                for v in resp_data["data"]
+            ]
+
+    return shared_fetch("vendors", url, fetch)
+
+
+# what join_vendor_customers reads
+CUSTOMER_FIELDS = {
+    "vendor-customers": ("name", "customer-location-mapping"),
+    "customer-location-mapping": ("customer-locations",),
+    "customer-locations": ("customers",),
+    "customers": ("name",),
+}
+
+
+def customers_url(vendor: Vendor) -> str:
     v2_vendor_resource = f"/v2/vendors/{vendor.id}/vendor-customers"
     page_num = "page_number=0"
     includes = "include=customer-location-mapping.customer-locations.customers"
-    url = f"{BACKEND_URL}{v2_vendor_resource}?{includes}&{page_num}"
-    resp: r.Response = r_get(url=url)
-    resp_data = resp.json()
+    fields = sparse_fields(CUSTOMER_FIELDS)
+    return f"{BACKEND_URL}{v2_vendor_resource}?{includes}&{page_num}{fields}"
+
+
+@traced()
+def get_sca_customers_w_vendor_accounts(vendor: Vendor) -> list[SCACustomerV2]:
+    if SNAPSHOT:
+        return SNAPSHOT.customers(vendor)
+    url = customers_url(vendor)
+
+    def fetch() -> list[SCACustomerV2]:
+        resp: r.Response = r_get(url=url, decode=read_document)
+        with METRICS.parsing(resp.url):
+            return join_vendor_customers(vendor, document(resp))
+
+    return shared_fetch("customers", url, fetch)
+
+
+@traced()
+def join_vendor_customers(vendor: Vendor, resp_data: dict) -> list[SCACustomerV2]:
+    """group a vendor's accounts under the SCA customers they are mapped to"""
     data, included = resp_data["data"], resp_data["included"]
     customers = {
         r["id"]: r["attributes"]["name"] for r in included if r["type"] == "customers"
@@ -395,7 +662,7 @@ def get_sca_customers_w_vendor_accounts(vendor: Vendor) -> list[SCACustomerV2]:
             sca_id=sca_id,
             sca_name=sca_name,
             vendor=vendor,
-            entity_accounts=vendor_customers_selected,
+            entity_accounts=tuple(vendor_customers_selected),
         )
         result.append(customer_obj)
 
@@ -403,6 +670,97 @@ def get_sca_customers_w_vendor_accounts(vendor: Vendor) -> list[SCACustomerV2]:
     return result
 
 
+def _index(included: list[dict]) -> dict[tuple[str, str], dict]:
+    """
+    included objects by type and id, ids as strings since the backend may
+    send either
+    """
+    return {(item["type"], str(item["id"])): item for item in included}
+
+
+def _linked(index: dict[tuple, dict], item: dict, rel: str) -> list[dict]:
+    """the included objects `item` points to through relationship `rel`"""
+    data = item.get("relationships", {}).get(rel, {}).get("data")
+    match data:
+        case dict():
+            data = [data]
+        case None:
+            return []
+    return [index[key] for d in data if (key := (d["type"], str(d["id"]))) in index]
+
+
+ZERO_DISCOUNT_FIELDS = {
+    "vendors": ("vendor-pricing-classes",),
+    "vendor-pricing-classes": ("name", "vendor-pricing-by-class"),
+    "vendor-pricing-by-class": ("price", "vendor-products"),
+    "vendor-products": (
+        "vendor-product-identifier",
+        "vendor-product-description",
+        "vendor-product-attrs",
+    ),
+    "vendor-product-attrs": ("attr", "value"),
+}
+
+
+def zero_discount_url() -> str:
+    includes = "include=vendor-pricing-classes.vendor-pricing-by-class"
+    includes += ".vendor-products.vendor-product-attrs"
+    return (
+        f"{BACKEND_URL}/v2/vendors/adp?{includes}{sparse_fields(ZERO_DISCOUNT_FIELDS)}"
+    )
+
+
+@traced()
+def get_zero_discount_pricing() -> dict[int, dict]:
+    """
+    ADP zero discount prices by product id, shaped like
+    restructure_pricing_by_class. The included objects are indexed once
+    rather than rescanned per relationship as restructure_included does,
+    there is a row for every ADP product.
+    """
+    if cached := LOCAL_STORAGE["zero_discount"]:
+        METRICS.count_cache("zero_discount", "hit")
+        return cached
+    url = zero_discount_url()
+    return shared_fetch("zero_discount", url, partial(_fetch_zero_discount, url))
+
+
+def _fetch_zero_discount(url: str) -> dict[int, dict]:
+    resp: r.Response = r_get(url, decode=read_document)
+    if resp.status_code != 200:
+        raise Exception(f"Unable to get zero discount pricing: {resp.status_code}")
+    with METRICS.parsing(resp.url):
+        included: list[dict] = document(resp).get("included", [])
+        result = dict()
+        with span("join zero discount pricing", included=len(included)):
+            index = _index(included)
+            for price_class in included:
+                if price_class["type"] != "vendor-pricing-classes" or (
+                    price_class["attributes"]["name"] != ADPPricingClasses.ZERO_DISCOUNT
+                ):
+                    continue
+                for product_price in _linked(
+                    index, price_class, "vendor-pricing-by-class"
+                ):
+                    for product in _linked(index, product_price, "vendor-products"):
+                        product_attrs = {
+                            attr["attributes"]["attr"]: attr["attributes"]["value"]
+                            for attr in _linked(index, product, "vendor-product-attrs")
+                        }
+                        product_attrs |= {
+                            "model_number": product["attributes"][
+                                "vendor-product-identifier"
+                            ],
+                            "description": product["attributes"][
+                                "vendor-product-description"
+                            ],
+                            "price": product_price["attributes"]["price"],
+                        }
+                        result[product["id"]] = product_attrs
+    LOCAL_STORAGE["zero_discount"] = result
+    return result
+
+
 def request_dl_link(vendor: Vendor, customer_id: int) -> str:
     effective_date = datetime.today().date()
     url = PRICE_FILE_DOWNLOAD_LINK.format(
@@ -419,7 +777,19 @@ def request_dl_link(vendor: Vendor, customer_id: int) -> str:
     return resp.json()["download_link"]
 
 
-def download_file(vendor: Vendor, customer_id: str) -> None:
+def download_file(vendor: Vendor, customer_id: str, customer_name: str = None) -> None:
+    # with local_price_files on, pricing already loaded for this customer is
+    # written out locally in price_export's layout instead of the server's
+    stored = LOCAL_STORAGE["pricing_by_customer"].get(customer_id)
+    if LOCAL_PRICE_FILES and stored and customer_name:
+        from price_export import export_price_file
+
+        try:
+            with span("local price file", rows=len(stored)):
+                export_price_file(stored, get_save_dir(), customer_name, vendor.name)
+        except PermissionError as e:
+            raise FileSaveError(filename=e.filename)
+        return
     rel_link = request_dl_link(vendor, customer_id)
     resp: r.Response = r_get(BACKEND_URL + rel_link)
     if resp.status_code != 200:
@@ -438,23 +808,182 @@ def download_file(vendor: Vendor, customer_id: str) -> None:
         raise Exception(rf"unexpected error with file save to {save_path}")
 
 
+def material_group(model: str) -> str | None:
+    """
+    the model's material group from the catalog mirror, the one class it's
+    mapped to besides its top level class
+    """
+    if CATALOG is None:
+        return None
+    top_level = {class_.value["name"] for class_ in ADPProductClasses}
+    groups = [c for c in CATALOG.product_classes(model) if c not in top_level]
+    return groups[0] if len(groups) == 1 else None
+
+
+PRICE_ENGINE = PriceEngine(
+    get_zero_discount_pricing, material_group, sample=PRICE_CHECK_SAMPLE
+)
+
+
 def price_check(customer_id: int, model: str, *args, **kwargs) -> r.Response:
+    """
+    answered locally by PRICE_ENGINE when it has what it needs, zero
+    discount pricing only knows this year's prices
+    """
     year = kwargs.get("BASE_YEAR", datetime.today().year)
+    local = None
+    if LOCAL_PRICE_CHECKS and year == datetime.today().year:
+        local = PRICE_ENGINE.quote(customer_id, model)
+    if local and not PRICE_ENGINE.verifying():
+        METRICS.count_cache("price_check", "hit")
+        return json_response(local)
     query = f"?model_number={model}&customer_id={customer_id}&price_year={year}"
-    return r_get(url=MODEL_LOOKUP + query)
+    resp: r.Response = r_get(url=MODEL_LOOKUP + query)
+    if resp.status_code != 200:
+        return resp
+    server = resp.json()
+    PRICE_ENGINE.learn(customer_id, server)
+    if not local:
+        METRICS.count_cache("price_check", "miss")
+    elif PRICE_ENGINE.agrees(customer_id, local, server):
+        METRICS.count_cache("price_check", "hit")
+        return json_response(local)
+    return resp
 
 
-def custom_response(data: dict) -> r.Response:
+def json_response(body: Any) -> r.Response:
     resp = r.Response()
     resp.status_code = 200
-    resp._content = json.dumps(dict(data=data)).encode("utf-8")
+    resp._content = json.dumps(body).encode("utf-8")
     resp.headers["Content-Type"] = "application/json"
     resp.encoding = "utf-8"
     return resp
 
 
-def new_product(customer_id: int, model: str) -> r.Response:
-    data = post_new_product(customer_id=customer_id, model=model)
+def custom_response(data: dict) -> r.Response:
+    return json_response(dict(data=data))
+
+
+def created_id(resp: r.Response) -> int:
+    """
+    the id of a record just POSTed, or of the one already there when the
+    backend rejected it as a duplicate
+    """
+    if resp.status_code == 409:
+        return resp.json()["detail"]["data"]["id"]
+    return resp.json()["data"]["id"]
+
+
+# identifiers only, to tell which models the catalog already has
+CATALOG_FIELDS = {"vendor-products": ("vendor-product-identifier",)}
+
+
+def vendor_product_url(model: str) -> str:
+    url = f"{BACKEND_URL}/v2/vendors/adp/vendor-products"
+    url += f"?filter_vendor_product_identifier={model}"
+    return url + sparse_fields(CATALOG_FIELDS)
+
+
+def find_vendor_product(model: str) -> dict | None:
+    resp: r.Response = r_get(url=vendor_product_url(model))
+    if resp.status_code != 200:
+        return None
+    data = resp.json()["data"]
+    if not isinstance(data, list):
+        return data
+    matches = [e for e in data if e["attributes"]["vendor-product-identifier"] == model]
+    return matches.pop() if matches else None
+
+
+def find_vendor_products(models: Collection[str]) -> dict[str, dict]:
+    """
+    the catalog records of those of `models` that ADP already has, from the
+    local catalog mirror when there is one. The rest are asked about with a
+    filtered query each, or, past CATALOG_LISTING_OVER of them, with one
+    query for the identifiers of the whole catalog.
+    """
+    found = CATALOG.products(models) if CATALOG else {}
+    # the mirror may be behind, what it doesn't have is asked about
+    models = [model for model in models if model not in found]
+    if len(models) > CATALOG_LISTING_OVER:
+        url = f"{BACKEND_URL}/v2/vendors/adp/vendor-products?page_number=0"
+        url += sparse_fields(CATALOG_FIELDS)
+        resp: r.Response = r_get(url=url, decode=read_document)
+        if resp.status_code == 200:
+            wanted = set(models)
+            with METRICS.parsing(resp.url):
+                return found | {
+                    identifier: record
+                    for record in document(resp)["data"]
+                    if (identifier := record["attributes"]["vendor-product-identifier"])
+                    in wanted
+                }
+        logger.warning(f"catalog query failed ({resp.status_code}), one per model")
+    return found | {
+        model: record for model in models if (record := find_vendor_product(model))
+    }
+
+
+def existing_pricing_attr(
+    customer_id: int, pricing_id: int, attr: str
+) -> r.Response | None:
+    """a customer price attr as the backend has it, looked up before resending"""
+    url = BACKEND_URL + f"/v2/vendors/adp/vendor-customers/{customer_id}"
+    url += "?include=vendor-pricing-by-customer.vendor-pricing-by-customer-attrs"
+    url += sparse_fields(
+        {
+            "vendor-customers": ("vendor-pricing-by-customer",),
+            "vendor-pricing-by-customer": ("vendor-pricing-by-customer-attrs",),
+            "vendor-pricing-by-customer-attrs": ("attr", "type", "value"),
+        }
+    )
+    resp: r.Response = r_get(url)
+    if resp.status_code != 200:
+        return None
+    index = _index(resp.json().get("included", []))
+    pricing = index.get(("vendor-pricing-by-customer", str(pricing_id)))
+    if not pricing:
+        return None
+    for record in _linked(index, pricing, "vendor-pricing-by-customer-attrs"):
+        if record["attributes"]["attr"] == attr:
+            return custom_response(data=record)
+    return None
+
+
+class BulkAddPlan(BaseModel):
+    to_add: list[str]
+    # listed more than once, added once
+    repeated: list[str]
+    already_priced: list[str]
+    # catalog records of the models in to_add that ADP already has
+    catalog: dict[str, dict]
+
+
+def plan_bulk_add(customer_id: int, models: list[str]) -> BulkAddPlan:
+    """
+    Which of the `models` pasted in for a customer still need adding. Repeats
+    and models the customer's loaded pricing already has are left out, and
+    the rest are looked up in the catalog together before anything is
+    written.
+    """
+    counts = Counter(model for model in models if model)
+    priced = {
+        attrs["model_number"]
+        for attrs in LOCAL_STORAGE["pricing_by_customer"].get(customer_id, {}).values()
+    }
+    to_add = [model for model in counts if model not in priced]
+    return BulkAddPlan(
+        to_add=to_add,
+        repeated=[model for model, n in counts.items() if n > 1],
+        already_priced=[model for model in counts if model in priced],
+        catalog=find_vendor_products(to_add) if to_add else {},
+    )
+
+
+def new_product(
+    customer_id: int, model: str, catalog: dict[str, dict] = None
+) -> r.Response:
+    data = post_new_product(customer_id=customer_id, model=model, catalog=catalog)
     data["attributes"]["price"] = data["attributes"].pop("net_price")
     LOCAL_STORAGE["pricing_by_customer"][customer_id] |= {
         data["id"]: data["attributes"]
@@ -462,13 +991,30 @@ def new_product(customer_id: int, model: str) -> r.Response:
     return custom_response(data=data)
 
 
+def find_product_class(name: str) -> int:
+    """the id of the ADP product class called `name`"""
+    if CATALOG and (class_id := CATALOG.class_id(name)) is not None:
+        return class_id
+    product_class_query = f"/v2/vendors/adp/vendor-product-classes?filter_name={name}"
+    product_class_resp: r.Response = r_get(url=BACKEND_URL + product_class_query)
+    product_class_resp_data = product_class_resp.json()["data"]
+    if isinstance(product_class_resp_data, list):
+        data_list = [
+            e for e in product_class_resp_data if e["attributes"]["name"] == name
+        ]
+        return data_list.pop()["id"]
+    return product_class_resp_data["id"]
+
+
 def new_product_setup(customer_id: int, model: str) -> NewProductDetails:
+    log = StepLogger(logger, customer_id=customer_id, model=model)
 
     # look up model
-    logger.info("\tLooking up model details")
+    log.info("\tLooking up model details", extra={"step": "lookup"})
     model_lookup_query = f"?model_number={model}&customer_id={customer_id}"
     model_lookup_resp: r.Response = r_get(url=MODEL_LOOKUP + model_lookup_query)
     model_lookup_content: dict = model_lookup_resp.json()
+    PRICE_ENGINE.learn(customer_id, model_lookup_content)
 
     ## remove anything not considered an arbitrary attribute
     # product class
@@ -493,7 +1039,7 @@ def new_product_setup(customer_id: int, model: str) -> NewProductDetails:
 
     # set up custom attr objects for the payload
     attrs = []
-    logger.info("\tSetting up attributes")
+    log.info("\tSetting up attributes", extra={"step": "attributes"})
     for attr, value in model_lookup_content.items():
         attr: str
         try:
@@ -520,26 +1066,28 @@ def new_product_setup(customer_id: int, model: str) -> NewProductDetails:
         },
         "relationships": {"vendors": {"data": [{"type": "vendors", "id": "adp"}]}},
     }
+
+    def registered() -> r.Response | None:
+        if record := find_vendor_product(model):
+            return custom_response(data=record)
+
     new_product_resp: r.Response = r_post(
-        url=BACKEND_URL + new_product_route, json=dict(data=pl)
+        url=BACKEND_URL + new_product_route, json=dict(data=pl), exists=registered
     )
     new_product_data = new_product_resp.json()["data"]
-    logger.info("\tProduct parent record with model and description registered")
-    logger.info("\tProduct attributes registered to the product")
+    log.info(
+        "\tProduct parent record with model and description registered",
+        extra={"step": "product"},
+    )
+    log.info(
+        "\tProduct attributes registered to the product",
+        extra={"step": "product_attrs"},
+    )
     new_product_id = int(new_product_data["id"])
 
     # map model to its product classes
     for cl in [material_group, class_1.value["name"]]:
-        product_class_query = f"/v2/vendors/adp/vendor-product-classes?filter_name={cl}"
-        product_class_resp: r.Response = r_get(url=BACKEND_URL + product_class_query)
-        product_class_resp_data = product_class_resp.json()["data"]
-        if isinstance(product_class_resp_data, list):
-            data_list = [
-                e for e in product_class_resp_data if e["attributes"]["name"] == cl
-            ]
-            product_class_id = data_list.pop()["id"]
-        else:
-            product_class_id = product_class_resp_data["id"]
+        product_class_id = find_product_class(cl)
         mapping_ep = "/v2/vendors/vendor-product-to-class-mapping"
         pl = {
             "type": "vendor-product-to-class-mapping",
@@ -560,7 +1108,7 @@ def new_product_setup(customer_id: int, model: str) -> NewProductDetails:
             },
         }
         r_post(BACKEND_URL + mapping_ep, json=dict(data=pl))
-        logger.info(f"\tMapped to class: {cl}")
+        log.info(f"\tMapped to class: {cl}", extra={"step": "class_mapping"})
 
     return NewProductDetails(
         id=new_product_id,
@@ -578,46 +1126,32 @@ def new_product_setup(customer_id: int, model: str) -> NewProductDetails:
     )
 
 
-def post_new_product(customer_id: int, model: str) -> dict[str, int | dict]:
+def post_new_product(
+    customer_id: int, model: str, catalog: dict[str, dict] = None
+) -> dict[str, int | dict]:
     """
     STEPS
-        check for existence
+        check for existence, in `catalog` when it was looked up beforehand
         if not exists hit model-lookup
         create model
         assign to customer with customer price
         add custom description
     """
+    log = StepLogger(logger, customer_id=customer_id, model=model)
 
     PRICING_CLASS_ID = 2  # being lazy - for STRATEGY_PRICING
     ZDP_PRICING_CLASS_ID = 1  # ditto - for ZERO_DISCOUNT
-    product_resource = (
-        f"/v2/vendors/adp/vendor-products?filter_vendor_product_identifier={model}"
-    )
 
-    logger.info(f"\tChecking for existence.")
-    product_check_resp: r.Response = r_get(url=BACKEND_URL + product_resource)
-    new_product = False
-    if product_check_resp.status_code == 200:
-        existing_product_data = product_check_resp.json()["data"]
-        if isinstance(existing_product_data, list):
-            filtered = [
-                e
-                for e in existing_product_data
-                if e["attributes"]["vendor-product-identifier"] == model
-            ]
-            if not filtered:
-                new_product = True
-            else:
-                new_product = False
-                existing_product_id = filtered.pop()["id"]
-        else:
-            existing_product_id = existing_product_data["id"]
-    if product_check_resp.status_code == 204 or new_product:
-        new_product = True
-        logger.info(f"\t{model} needs to be built")
+    log.info(f"\tChecking for existence.", extra={"step": "check_existence"})
+    if catalog is None:
+        existing_product = find_vendor_products([model]).get(model)
+    else:
+        existing_product = catalog.get(model)
+    if not existing_product:
+        log.info(f"\t{model} needs to be built", extra={"step": "check_existence"})
         new_product_details = new_product_setup(customer_id, model)
 
-        logger.info(f"\t{model} has been setup")
+        log.info(f"\t{model} has been setup", extra={"step": "setup"})
         new_product_id = new_product_details.id
         effective_date = new_product_details.effective_date
         zero_discount_price = new_product_details.zero_discount_price
@@ -653,11 +1187,12 @@ def post_new_product(customer_id: int, model: str) -> dict[str, int | dict]:
                 "vendors": {"data": [{"type": "vendors", "id": "adp"}]},
             },
         }
+        # a duplicate is answered with 409, so resending is harmless
         resp: r.Response = r_post(
-            url=BACKEND_URL + customer_pricing_ep, json=dict(data=pl)
+            url=BACKEND_URL + customer_pricing_ep, json=dict(data=pl), resend_safe=True
         )
-        logger.info("\tCustomer Pricing set.")
-        new_pricing_id = resp.json()["data"]["id"]
+        log.info("\tCustomer Pricing set.", extra={"step": "customer_pricing"})
+        new_pricing_id = created_id(resp)
 
         # set a customer price attr, custom_description, to the default for the product
         customer_price_attr_ep = "/v2/vendors/vendor-pricing-by-customer-attrs"
@@ -678,10 +1213,16 @@ def post_new_product(customer_id: int, model: str) -> dict[str, int | dict]:
             },
         }
         resp: r.Response = r_post(
-            url=BACKEND_URL + customer_price_attr_ep, json=dict(data=pl)
+            url=BACKEND_URL + customer_price_attr_ep,
+            json=dict(data=pl),
+            exists=partial(
+                existing_pricing_attr, customer_id, new_pricing_id, "custom_description"
+            ),
         )
         new_attr = resp.json()
-        logger.info("\tCustom description established")
+        log.info(
+            "\tCustom description established", extra={"step": "custom_description"}
+        )
 
         # Zero discount Pricing
         class_price_zero_disc_ep = "/v2/vendors/vendor-pricing-by-class"
@@ -706,7 +1247,9 @@ def post_new_product(customer_id: int, model: str) -> dict[str, int | dict]:
         resp: r.Response = r_post(
             url=BACKEND_URL + class_price_zero_disc_ep, json=dict(data=pl)
         )
-        logger.info("\tZero Discount Pricing set.")
+        log.info(
+            "\tZero Discount Pricing set.", extra={"step": "zero_discount_pricing"}
+        )
 
         # add these back in for the return object
         model_lookup_content |= {"zero_discount_price": zero_discount_price}
@@ -732,6 +1275,7 @@ def post_new_product(customer_id: int, model: str) -> dict[str, int | dict]:
         model_lookup_query = f"?model_number={model}&customer_id={customer_id}"
         model_lookup_resp: r.Response = r_get(url=MODEL_LOOKUP + model_lookup_query)
         model_lookup_content: dict = model_lookup_resp.json()
+        PRICE_ENGINE.learn(customer_id, model_lookup_content)
         material_group = model_lookup_content.get("mpg")
         net_price = int(model_lookup_content.get("net_price"))
         default_description = model_lookup_content.get("category")
@@ -752,7 +1296,7 @@ def post_new_product(customer_id: int, model: str) -> dict[str, int | dict]:
             },
             "relationships": {
                 "vendor-products": {
-                    "data": [{"type": "vendor-products", "id": existing_product_id}]
+                    "data": [{"type": "vendor-products", "id": existing_product["id"]}]
                 },
                 "vendor-customers": {
                     "data": [{"type": "vendor-customers", "id": customer_id}]
@@ -763,17 +1307,19 @@ def post_new_product(customer_id: int, model: str) -> dict[str, int | dict]:
                 "vendors": {"data": [{"type": "vendors", "id": "adp"}]},
             },
         }
+        # a duplicate is answered with 409, so resending is harmless
         resp: r.Response = r_post(
-            url=BACKEND_URL + customer_pricing_ep, json=dict(data=pl)
+            url=BACKEND_URL + customer_pricing_ep, json=dict(data=pl), resend_safe=True
         )
+        new_pricing_id = created_id(resp)
         if resp.status_code == 409:
-            new_pricing_id = resp.json()["detail"]["data"]["id"]
-            logger.info(
-                f"\tCustomer has this product associated already. Current ID used {new_pricing_id}"
+            log.info(
+                "\tCustomer has this product associated already. "
+                f"Current ID used {new_pricing_id}",
+                extra={"step": "customer_pricing"},
             )
         else:
-            new_pricing_id = resp.json()["data"]["id"]
-            logger.info("\tPricing set.")
+            log.info("\tPricing set.", extra={"step": "customer_pricing"})
 
         # set a customer price attr, custom_description, to the default for the product
         customer_price_attr_ep = "/v2/vendors/vendor-pricing-by-customer-attrs"
@@ -794,9 +1340,15 @@ def post_new_product(customer_id: int, model: str) -> dict[str, int | dict]:
             },
         }
         resp: r.Response = r_post(
-            url=BACKEND_URL + customer_price_attr_ep, json=dict(data=pl)
+            url=BACKEND_URL + customer_price_attr_ep,
+            json=dict(data=pl),
+            exists=partial(
+                existing_pricing_attr, customer_id, new_pricing_id, "custom_description"
+            ),
+        )
+        log.info(
+            "\tCustom description established", extra={"step": "custom_description"}
         )
-        logger.info("\tCustom description established")
         new_attr = resp.json()
         model_lookup_content["attrs"] = {
             "custom_description": {
@@ -847,11 +1399,12 @@ def post_new_product(customer_id: int, model: str) -> dict[str, int | dict]:
             url=BACKEND_URL + customer_pricing_future, json=dict(data=new_price_pl)
         )
         if resp.status_code == 200:
-            logger.info(
-                f"\tFuture Pricing set with effective date: {future_price_eff_date}"
+            log.info(
+                f"\tFuture Pricing set with effective date: {future_price_eff_date}",
+                extra={"step": "future_pricing"},
             )
         else:
-            logger.error(f"failed to set future price")
+            log.error(f"failed to set future price", extra={"step": "future_pricing"})
 
     return product_result
 
@@ -877,3 +1430,46 @@ def post_new_ratings(customer_id: int, file: str) -> None:
             f"Status code {resp.status_code}. "
             f"Message:\n {resp.content.decode()}"
         )
+    # the next look at this customer's ratings fetches what was just uploaded
+    LOCAL_STORAGE["ratings"].pop(customer_id, None)
+
+
+def persist_pricing_edits(
+    edits: list[PendingEdit],
+) -> dict[EditKey, Optional[Exception]]:
+    """
+    PATCH a batch of coalesced customer pricing edits.
+    Called from the write-behind worker, never from the UI thread.
+    """
+    results: dict[EditKey, Optional[Exception]] = {}
+    for edit in edits:
+        match edit.kind:
+            case EditKind.ATTR:
+                resource = "vendor-pricing-by-customer-attrs"
+                attributes = {"value": str(edit.value)}
+            case EditKind.PRICE:
+                resource = "vendor-pricing-by-customer"
+                attributes = {"price": int(edit.value) * 100}
+        pl = {
+            "id": edit.id,
+            "type": resource,
+            "attributes": attributes,
+            "relationships": {
+                "vendors": {"data": [{"type": "vendors", "id": edit.vendor_id}]}
+            },
+        }
+        try:
+            resp: r.Response = r_patch(
+                url=BACKEND_URL + f"/v2/vendors/{resource}/{edit.id}",
+                json=dict(data=pl),
+            )
+            if not 299 >= resp.status_code >= 200:
+                raise PersistError(
+                    f"Status code {resp.status_code}. "
+                    f"Message: {resp.content.decode()}"
+                )
+        except Exception as e:
+            results[edit.key] = e
+        else:
+            results[edit.key] = None
+    return results
@@ -0,0 +1,235 @@
+"""
+Pricing analytics across every ADP customer.
+
+All customers' pricing is loaded into flat NumPy columns, one element per
+customer product, next to each product's zero discount price (ZDP). Questions
+like "who is priced below ZDP on this model" or "how are discounts spread by
+series" are then array operations rather than a walk through each
+customer's Product Strategy screen.
+"""
+
+import re
+import numpy as np
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, NamedTuple
+from models import VendorCustomer
+
+if TYPE_CHECKING:
+    from bulk_sync import SyncResult
+
+SERIES_PREFIX = re.compile(r"^[A-Z]+")
+NO_SERIES = "-"
+
+
+class SeriesDiscounts(NamedTuple):
+    series: str
+    rows: int
+    customers: int
+    mean: float
+    p10: float
+    median: float
+    p90: float
+
+
+class CustomerDiscounts(NamedTuple):
+    customer: str
+    rows: int
+    below_zdp: int
+    mean: float
+    deepest: float
+
+
+class ModelPricing(NamedTuple):
+    customer: str
+    price: float
+    zdp: float
+    discount: float
+
+
+def collect_pricing(
+    accounts: list[VendorCustomer],
+    on_progress: Callable[["SyncResult"], None] = None,
+) -> tuple[dict[int, dict], list[VendorCustomer]]:
+    """
+    Pricing for each account as held in LOCAL_STORAGE, syncing any not yet
+    cached first. Accounts without pricing are returned separately.
+    """
+    from actions import LOCAL_STORAGE
+    from bulk_sync import sync_pricing
+
+    failed = sync_pricing(accounts, on_progress=on_progress).failed
+    cached = LOCAL_STORAGE["pricing_by_customer"]
+    pricing = {a.id: cached[a.id] for a in accounts if a.id in cached}
+    return pricing, failed
+
+
+def _series(model_number: str, product_attrs: dict | None) -> str:
+    if product_attrs and (series := product_attrs.get("series")):
+        return str(series)
+    match_ = SERIES_PREFIX.match(model_number)
+    return match_.group() if match_ else NO_SERIES
+
+
+def _group_quantiles(
+    codes: np.ndarray, values: np.ndarray, groups: int, qs: tuple[float, ...]
+) -> tuple[np.ndarray, list[np.ndarray]]:
+    """
+    mean and linearly interpolated quantiles of `values` for each
+    group code, all groups at once. NaN values are left out.
+    """
+    keep = ~np.isnan(values)
+    codes, values = codes[keep], values[keep]
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    counts = np.bincount(codes, minlength=groups)
+    sums = np.bincount(codes, weights=values, minlength=groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    if not len(values):
+        return means, [np.full(groups, np.nan) for _ in qs]
+    starts = np.cumsum(counts) - counts
+    last = len(values) - 1
+    quantiles = []
+    for q in qs:
+        pos = starts + q * np.maximum(counts - 1, 0)
+        lo = np.floor(pos).astype(np.int64)
+        frac = pos - lo
+        hi = np.minimum(lo + 1, last)
+        value = values[np.minimum(lo, last)] * (1 - frac) + values[hi] * frac
+        quantiles.append(np.where(counts > 0, value, np.nan))
+    return means, quantiles
+
+
+@dataclass(frozen=True, slots=True)
+class PricingColumns:
+    """one element per customer product, prices in dollars"""
+
+    customer_id: np.ndarray
+    product: np.ndarray  # index into `models`
+    price: np.ndarray
+    zdp: np.ndarray  # NaN where the product has no zero discount price
+    discount: np.ndarray  # 1 - price / zdp
+    models: np.ndarray
+    series: np.ndarray  # index into `series_names`, per product
+    series_names: np.ndarray
+    customer_names: dict[int, str]
+
+    @classmethod
+    def build(
+        cls,
+        pricing: dict[int, dict],
+        zero_discount: dict[int, dict],
+        customer_names: dict[int, str],
+    ) -> "PricingColumns":
+        """
+        `pricing` maps customer ids to their pricing as held in LOCAL_STORAGE,
+        `zero_discount` is get_zero_discount_pricing's result
+        """
+        zdp_products = {p["model_number"]: p for p in zero_discount.values()}
+        model_codes: dict[str, int] = {}
+        customer_ids, products, prices = [], [], []
+        for customer_id, stored_pricing in pricing.items():
+            for product in stored_pricing.values():
+                code = model_codes.setdefault(product["model_number"], len(model_codes))
+                products.append(code)
+                prices.append(product["price"])
+            customer_ids.append(np.full(len(stored_pricing), customer_id))
+
+        models = np.array(list(model_codes), dtype=object)
+        zdp_by_product = np.full(len(models), np.nan)
+        series_codes: dict[str, int] = {}
+        series = np.empty(len(models), dtype=np.int64)
+        for code, model_number in enumerate(model_codes):
+            zdp_product = zdp_products.get(model_number)
+            if zdp_product is not None:
+                zdp_by_product[code] = zdp_product["price"] / 100
+            name = _series(model_number, zdp_product)
+            series[code] = series_codes.setdefault(name, len(series_codes))
+
+        product = np.array(products, dtype=np.int64)
+        price = np.array(prices, dtype=np.float64) / 100
+        zdp = zdp_by_product[product]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            discount = np.where(zdp > 0, 1 - price / zdp, np.nan)
+        return cls(
+            customer_id=(
+                np.concatenate(customer_ids)
+                if customer_ids
+                else np.empty(0, dtype=np.int64)
+            ),
+            product=product,
+            price=price,
+            zdp=zdp,
+            discount=discount,
+            models=models,
+            series=series,
+            series_names=np.array(list(series_codes), dtype=object),
+            customer_names=customer_names,
+        )
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def below_zdp(self, model_number: str) -> list[ModelPricing]:
+        """customers priced below ZDP on a model, deepest discount first"""
+        (codes,) = np.nonzero(self.models == model_number.strip().upper())
+        if not len(codes):
+            return []
+        mask = (self.product == codes[0]) & (self.price < self.zdp)
+        rows = np.nonzero(mask)[0]
+        rows = rows[np.argsort(-self.discount[rows], kind="stable")]
+        return [
+            ModelPricing(
+                self.customer_names.get(int(self.customer_id[i]), ""),
+                float(self.price[i]),
+                float(self.zdp[i]),
+                float(self.discount[i]),
+            )
+            for i in rows
+        ]
+
+    def discounts_by_series(self) -> list[SeriesDiscounts]:
+        """the spread of discounts off ZDP for each series, by series name"""
+        row_series = self.series[self.product]
+        groups = len(self.series_names)
+        means, (p10, median, p90) = _group_quantiles(
+            row_series, self.discount, groups, (0.1, 0.5, 0.9)
+        )
+        counts = np.bincount(row_series, minlength=groups)
+        # distinct customers per series, from unique (series, customer) pairs
+        pairs = np.unique(np.stack((row_series, self.customer_id)), axis=1)
+        customers = np.bincount(pairs[0], minlength=groups)
+        return [
+            SeriesDiscounts(
+                str(self.series_names[g]),
+                int(counts[g]),
+                int(customers[g]),
+                float(means[g]),
+                float(p10[g]),
+                float(median[g]),
+                float(p90[g]),
+            )
+            for g in np.argsort(self.series_names)
+            if counts[g]
+        ]
+
+    def discounts_by_customer(self) -> list[CustomerDiscounts]:
+        """how many products each customer has below ZDP, most first"""
+        ids, codes = np.unique(self.customer_id, return_inverse=True)
+        groups = len(ids)
+        means, (deepest,) = _group_quantiles(codes, self.discount, groups, (1.0,))
+        counts = np.bincount(codes, minlength=groups)
+        below = np.bincount(
+            codes, weights=(self.price < self.zdp).astype(np.float64), minlength=groups
+        )
+        order = np.lexsort((-np.nan_to_num(means), -below))
+        return [
+            CustomerDiscounts(
+                self.customer_names.get(int(ids[g]), str(ids[g])),
+                int(counts[g]),
+                int(below[g]),
+                float(means[g]),
+                float(deepest[g]),
+            )
+            for g in order
+        ]
@@ -1,5 +1,6 @@
 import os
 import requests as r
+import transport
 from functools import partial
 import configparser
 import platform
@@ -7,16 +8,16 @@ import warnings; warnings.simplefilter('ignore')
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 configs = configparser.ConfigParser()
-configs.read('config.ini')
+configs.read(os.environ.get('BACKEND_TUI_CONFIG', 'config.ini'))
 
 VERIFY = configs.getboolean('SSL','verify')
 if VERIFY:
     if path := configs.get('SSL', 'path', fallback=None):
-        r_post = partial(r.post, verify=path)
+        r_post = partial(transport.post, verify=path)
     else:
-        r_post = r.post
+        r_post = transport.post
 else:
-    r_post = partial(r.post, verify=False)
+    r_post = partial(transport.post, verify=False)
 
 
 TOKEN_FILENAME = 'token.txt' 
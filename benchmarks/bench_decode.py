@@ -0,0 +1,98 @@
+"""
+JSON decoding of a large customer pricing document: the standard library
+and orjson on the whole body, as resp.json() did, against decoding.
+read_document taking the body as it arrives. Prints the time each takes
+and how far each pushes the process's peak resident memory, document
+included. Each decoder runs in a process of its own so the peaks don't
+mask one another.
+
+    python benchmarks/bench_decode.py [--rows 20000] [--repeat 3]
+"""
+
+import sys
+import gc
+import json
+import time
+import argparse
+import resource
+import subprocess
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import decoding  # noqa: E402
+import workloads  # noqa: E402
+
+# what transport reads the body in
+CHUNK = 64 * 1024
+
+
+def chunked(body: bytes) -> Iterator[bytes]:
+    """the body as it comes off the socket"""
+    for start in range(0, len(body), CHUNK):
+        yield body[start : start + CHUNK]
+
+
+def whole(loads: Callable[[bytes], Any]) -> Callable[[bytes], Any]:
+    # requests joins the chunks into resp.content before anything decodes it
+    return lambda body: loads(b"".join(chunked(body)))
+
+
+def decoders() -> dict[str, Callable[[bytes], Any]]:
+    found = {"json, whole body": whole(json.loads)}
+    if decoding.orjson:
+        found["orjson, whole body"] = whole(decoding.orjson.loads)
+    decoding.STREAM_OVER = CHUNK
+    found["streamed"] = lambda body: decoding.read_document(chunked(body))
+    return found
+
+
+def measure(name: str, rows: int, repeat: int) -> dict:
+    doc = workloads.pricing_by_customer_doc(rows)
+    body = json.dumps(doc).encode()
+    decode = decoders()[name]
+    gc.collect()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    decoded = decode(body)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    assert decoded == doc, name
+    del decoded
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(body)
+        times.append(time.perf_counter() - start)
+    # ru_maxrss is in KiB
+    return {"seconds": min(times), "peak_kib": peak, "body_kib": len(body) / 1024}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.only:
+        print(json.dumps(measure(args.only, args.rows, args.repeat)))
+        return
+    for i, name in enumerate(decoders()):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--rows", str(args.rows)]
+            + ["--repeat", str(args.repeat), "--only", name],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(proc.stdout)
+        if not i:
+            print(f"{args.rows:,} rows, {result['body_kib']:,.0f} KiB of JSON")
+        print(
+            f"  {name:<20} {result['seconds'] * 1000:8.1f} ms"
+            f"  peak memory +{result['peak_kib'] / 1024:7,.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
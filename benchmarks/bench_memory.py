@@ -0,0 +1,119 @@
+"""
+Memory held by a cached vendor customer tree, before and after the slotted,
+frozen menu dataclasses with interned vendors.
+
+    python benchmarks/bench_memory.py [--accounts 5000] [--per-customer 3]
+"""
+
+import sys
+import gc
+import argparse
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import Vendor, VendorCustomer, SCACustomerV2  # noqa: E402
+
+
+# the definitions as they were before __slots__, frozen and interning
+@dataclass
+class LegacyVendor:
+    id: str
+    name: str
+
+
+@dataclass
+class LegacyVendorCustomer:
+    id: int
+    vendor: LegacyVendor
+    name: str
+
+
+@dataclass
+class LegacySCACustomerV2:
+    sca_id: int
+    sca_name: str
+    vendor: LegacyVendor
+    entity_accounts: list[LegacyVendorCustomer]
+
+
+def legacy_tree(accounts: int, per_customer: int) -> list:
+    result = []
+    # get_sca_customers_w_vendor_accounts shared the vendor it was passed
+    vendor = LegacyVendor("adp", "ADP")
+    for sca_id in range(accounts // per_customer):
+        entity_accounts = [
+            LegacyVendorCustomer(
+                id=sca_id * per_customer + n,
+                vendor=vendor,
+                name=f"CUSTOMER {sca_id:05} - BRANCH {n}",
+            )
+            for n in range(per_customer)
+        ]
+        result.append(
+            LegacySCACustomerV2(
+                sca_id=sca_id,
+                sca_name=f"CUSTOMER {sca_id:05}",
+                vendor=vendor,
+                entity_accounts=entity_accounts,
+            )
+        )
+    return result
+
+
+def slotted_tree(accounts: int, per_customer: int) -> list:
+    result = []
+    for sca_id in range(accounts // per_customer):
+        vendor = Vendor.interned("adp", "ADP")
+        entity_accounts = tuple(
+            VendorCustomer(
+                id=sca_id * per_customer + n,
+                vendor=vendor,
+                name=f"CUSTOMER {sca_id:05} - BRANCH {n}",
+            )
+            for n in range(per_customer)
+        )
+        result.append(
+            SCACustomerV2(
+                sca_id=sca_id,
+                sca_name=f"CUSTOMER {sca_id:05}",
+                vendor=vendor,
+                entity_accounts=entity_accounts,
+            )
+        )
+    return result
+
+
+def retained_bytes(build: Callable[[], list]) -> tuple[int, list]:
+    gc.collect()
+    tracemalloc.start()
+    tree = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, tree
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=5000)
+    parser.add_argument("--per-customer", type=int, default=3)
+    args = parser.parse_args()
+
+    # warm the interning table so it is not counted against the tree
+    Vendor.interned("adp", "ADP")
+    before, _ = retained_bytes(lambda: legacy_tree(args.accounts, args.per_customer))
+    after, tree = retained_bytes(lambda: slotted_tree(args.accounts, args.per_customer))
+    # every account shares the one interned vendor
+    vendor_ids = {id(a.vendor) for c in tree for a in c.entity_accounts}
+    assert vendor_ids == {id(Vendor.interned("adp", "ADP"))}
+    print(f"{args.accounts:,} accounts, {args.per_customer} per SCA customer")
+    print(f"  before  {before / 1024:10,.1f} KiB")
+    print(f"  after   {after / 1024:10,.1f} KiB  ({1 - after / before:.0%} smaller)")
+
+
+if __name__ == "__main__":
+    main()
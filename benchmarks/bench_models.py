@@ -0,0 +1,156 @@
+"""
+Compares validated and trusted construction of the models built per screen.
+
+    python benchmarks/bench_models.py [--rows 10000] [--repeat 5]
+"""
+
+import sys
+import random
+import argparse
+from pathlib import Path
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import (  # noqa: E402
+    ProductPriceBasic,
+    Rating,
+    RatingAttrs,
+    RatingRels,
+    PRODUCT_PRICES,
+    trusted_constructor,
+)
+
+SERIES = ("HE", "HH", "V", "B", "F", "S", "M")
+
+
+def customer_pricing_fixture(rows: int, seed: int = 1) -> dict[str, dict]:
+    """shaped like restructure_pricing_by_customer output, as held in LOCAL_STORAGE"""
+    rand = random.Random(seed)
+    pricing = {}
+    for id_ in range(1, rows + 1):
+        series = rand.choice(SERIES)
+        # ids are strings, as JSON:API documents have them
+        pricing[str(id_)] = {
+            "model_number": f"{series}{rand.randint(100, 999)}{id_:06}",
+            "description": f"{series} series coil",
+            "price": rand.randint(20_000, 400_000),
+            "effective_date": "2024-06-01T00:00:00",
+            "attrs": {
+                "custom_description": {
+                    "id": str(id_ * 2),
+                    "attr": "custom_description",
+                    "type_": "STRING",
+                    "value": f"{series} Coils",
+                },
+                "sort_order": {
+                    "id": str(id_ * 2 + 1),
+                    "attr": "sort_order",
+                    "type_": "NUMBER",
+                    "value": str(rand.randint(1, 50)),
+                },
+            },
+        }
+    return pricing
+
+
+def ratings_fixture(rows: int, seed: int = 1) -> list[dict]:
+    rand = random.Random(seed)
+    return [
+        {
+            "id": id_,
+            "attributes": {
+                "ahrinumber": str(200_000_000 + id_),
+                "outdoor-model": f"OD{rand.randint(1000, 9999)}",
+                "indoor-model": f"ID{rand.randint(1000, 9999)}",
+                "oem-name": "OEM",
+                "seer2": round(rand.uniform(13, 20), 1),
+                "eer2": round(rand.uniform(9, 13), 1),
+                "capacity2": float(rand.randint(18, 60) * 1000),
+                "hspf2": round(rand.uniform(7, 10), 1),
+                "effective-date": "2024-06-01",
+            },
+        }
+        for id_ in range(1, rows + 1)
+    ]
+
+
+def pricing_validated(pricing: dict) -> list:
+    return [ProductPriceBasic(id=id_, **attrs) for id_, attrs in pricing.items()]
+
+
+def pricing_type_adapter(pricing: dict) -> list:
+    return PRODUCT_PRICES.validate_python(
+        [{"id": id_, **attrs} for id_, attrs in pricing.items()]
+    )
+
+
+def pricing_trusted(pricing: dict) -> list:
+    construct = trusted_constructor(ProductPriceBasic)
+    return [construct({"id": id_, **attrs}) for id_, attrs in pricing.items()]
+
+
+RELS = {"adp-customers": {"data": {"id": 1, "type": "adp-customers"}}}
+
+
+def ratings_validated(records: list[dict]) -> list:
+    return [
+        Rating(
+            id=r["id"],
+            attributes=RatingAttrs(**r["attributes"]),
+            relationships=RatingRels(**RELS),
+        )
+        for r in records
+    ]
+
+
+def ratings_trusted(records: list[dict]) -> list:
+    construct = trusted_constructor(Rating)
+    return [
+        construct({"id": r["id"], "attributes": r["attributes"], "relationships": RELS})
+        for r in records
+    ]
+
+
+def best_of(func, arg, repeats: int) -> float:
+    return min(repeat(lambda: func(arg), number=1, repeat=repeats))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pricing = customer_pricing_fixture(args.rows)
+    ratings = ratings_fixture(args.rows)
+    # the trusted path must produce exactly what validation produces
+    assert [repr(p) for p in pricing_validated(pricing)] == [
+        repr(p) for p in pricing_trusted(pricing)
+    ]
+    cached_ratings = [
+        {"id": r.id, "attributes": r.attributes.model_dump(exclude_unset=True)}
+        for r in ratings_validated(ratings)
+    ]
+    assert [repr(r) for r in ratings_validated(ratings)] == [
+        repr(r) for r in ratings_trusted(cached_ratings)
+    ]
+
+    cases = [
+        ("ProductPriceBasic", "validated", pricing_validated, pricing),
+        ("ProductPriceBasic", "TypeAdapter", pricing_type_adapter, pricing),
+        ("ProductPriceBasic", "trusted", pricing_trusted, pricing),
+        ("Rating", "validated", ratings_validated, ratings),
+        ("Rating", "trusted", ratings_trusted, cached_ratings),
+    ]
+    print(f"{args.rows:,} rows, best of {args.repeat}")
+    baseline = {}
+    for model, path, func, data in cases:
+        seconds = best_of(func, data, args.repeat)
+        baseline.setdefault(model, seconds)
+        speedup = baseline[model] / seconds
+        print(f"  {model:<18} {path:<12} {seconds*1000:9.1f} ms  {speedup:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Backpressure check against a backend with limited capacity.
+
+The server handles `--capacity` calls at a time at full speed, slows down
+as more pile up and answers 503 past twice its capacity. Background
+workers hammer it while an interactive caller makes a call every 50 ms,
+once with the calls left ungated and once as background calls under the
+adaptive limit. Under the limit the background work must see far fewer
+503s and the interactive calls must succeed, and faster.
+
+    python benchmarks/check_backpressure.py [--workers 16] [--seconds 4]
+"""
+
+import sys
+import time
+import argparse
+import threading
+from itertools import count
+import statistics
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import transport  # noqa: E402
+from throttle import Priority, priority  # noqa: E402
+
+
+class LimitedHandler(BaseHTTPRequestHandler):
+    capacity = 4
+    service_s = 0.1
+    in_flight = 0
+    lock = threading.Lock()
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            load = cls.in_flight
+        try:
+            if load > cls.capacity * 2:
+                status = 503
+            else:
+                status = 200
+                # queueing inside the backend once it's past capacity
+                time.sleep(cls.service_s * max(1, load / cls.capacity) ** 2)
+            body = b'{"data": []}'
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def trial(url: str, workers: int, seconds: float, gated: bool) -> dict:
+    stop = threading.Event()
+    counts = {"ok": 0, "503": 0, "error": 0}
+    lock = threading.Lock()
+    interactive, interactive_failed = [], 0
+    # distinct accounts, identical GETs in flight together would be coalesced
+    ids = count(1)
+
+    def work() -> None:
+        while not stop.is_set():
+            try:
+                if gated:
+                    with priority(Priority.BULK):
+                        resp = transport.get(
+                            f"{url}/v2/vendors/adp/vendor-customers/{next(ids)}"
+                        )
+                else:
+                    resp = transport.get(
+                        f"{url}/v2/vendors/adp/vendor-customers/{next(ids)}"
+                    )
+                key = "ok" if resp.status_code == 200 else str(resp.status_code)
+            except Exception:
+                key = "error"
+            with lock:
+                counts[key] = counts.get(key, 0) + 1
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        start = time.perf_counter()
+        resp = transport.get(url + "/v2/vendors/adp/vendor-products")
+        if resp.status_code == 200:
+            interactive.append(time.perf_counter() - start)
+        else:
+            interactive_failed += 1
+        time.sleep(0.05)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts | {
+        "interactive failed": interactive_failed,
+        "interactive p50 ms": statistics.median(interactive or [0]) * 1000,
+        "interactive max ms": max(interactive or [0]) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=4)
+    args = parser.parse_args()
+
+    # this check is about backpressure, not about giving up on the backend
+    transport.BREAKER_FAILURES = 10**9
+    transport.ENDPOINT_RATES = dict.fromkeys(transport.ENDPOINT_RATES, 0)
+    transport.BACKGROUND_MAX = args.workers
+    LimitedHandler.capacity = args.capacity
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LimitedHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://{}:{}".format(*server.server_address[:2])
+
+    results = {}
+    for gated in (False, True):
+        name = "adaptive" if gated else "ungated"
+        results[name] = trial(url, args.workers, args.seconds, gated)
+        print(f"{name}:")
+        for key, value in results[name].items():
+            print(f"  {key:<20} {value:>10.1f}")
+    limit = transport.limit_for(url)
+    print(f"adaptive limit settled at {int(limit.limit)} (capacity {args.capacity})")
+    server.shutdown()
+
+    problems = []
+    ungated, adaptive = results["ungated"], results["adaptive"]
+    if adaptive["503"] > max(ungated["503"] * 0.2, 5):
+        problems.append(f"{adaptive['503']} 503s under the adaptive limit")
+    if adaptive["interactive failed"]:
+        problems.append(f"{adaptive['interactive failed']} interactive calls failed")
+    if adaptive["interactive p50 ms"] > ungated["interactive p50 ms"]:
+        problems.append("interactive calls were slower under the adaptive limit")
+    if problems:
+        print("FAIL")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
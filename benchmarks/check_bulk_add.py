@@ -0,0 +1,137 @@
+"""
+Pre-flight check for adding a pasted list of models to a customer.
+
+The list repeats models and has some the customer is already priced on,
+some ADP's catalog already has and some it doesn't. plan_bulk_add must add
+each model once, leave out the ones already priced and tell the existing
+from the new with one catalog call, where the add loop used to make one
+existence call per model entered. A short list the catalog mirror answers
+all but a couple of must cost a filtered lookup for each of those, not a
+download of the whole catalog. Calls and bytes received are reported for
+both.
+
+    python benchmarks/check_bulk_add.py [--catalog 5000] [--models 40]
+"""
+
+import sys
+import json
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import actions  # noqa: E402
+from fake_backend import FixtureStore, serve  # noqa: E402
+from fixtures import Fixture  # noqa: E402
+from metrics import METRICS  # noqa: E402
+
+PATH = "/v2/vendors/adp/vendor-products"
+
+
+def catalog_traffic() -> tuple[int, int]:
+    """calls to the catalog and bytes received from it since the last reset"""
+    stats = [s for s in METRICS.endpoint_stats() if s.route == PATH]
+    calls = sum(s.calls for s in stats)
+    return calls, sum(s.calls * s.mean_wire_bytes for s in stats)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--catalog", type=int, default=5000)
+    parser.add_argument("--models", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    rand = random.Random(1)
+    catalog = [f"B{n:05}C" for n in range(args.catalog)]
+
+    def record(n: int, model: str) -> dict:
+        attributes = {"vendor-product-identifier": model}
+        return {"id": n, "type": "vendor-products", "attributes": attributes}
+
+    doc = {"data": [record(n, model) for n, model in enumerate(catalog)]}
+    fixtures = [Fixture("GET", PATH, "", 200, "application/json", json.dumps(doc))]
+    new = [f"NEW{n:03}" for n in range(args.models)]
+    # the filtered lookup for each model either list may ask about
+    for model in catalog + new:
+        found = [record(catalog.index(model), model)] if model in catalog else []
+        query = urlsplit(actions.vendor_product_url(model)).query
+        body = json.dumps({"data": found})
+        fixtures.append(Fixture("GET", PATH, query, 200, "application/json", body))
+    server = serve(FixtureStore(fixtures), port=0, latency_ms=args.latency_ms)
+    actions.BACKEND_URL = "http://{}:{}".format(*server.server_address[:2])
+
+    existing = rand.sample(catalog, args.models // 2)
+    new = new[: args.models - len(existing)]
+    priced = existing[: len(existing) // 4]
+    actions.LOCAL_STORAGE["pricing_by_customer"][1] = {
+        n: {"model_number": model} for n, model in enumerate(priced)
+    }
+    entered = existing + new + rand.sample(existing + new, args.models // 4)
+    rand.shuffle(entered)
+
+    METRICS.reset()
+    plan = actions.plan_bulk_add(1, entered + [""])
+    calls, received = catalog_traffic()
+    print(
+        f"{len(entered)} models entered: {len(plan.to_add)} to add, "
+        f"{len(plan.catalog)} of them in the catalog, "
+        f"{len(plan.already_priced)} already priced, {len(plan.repeated)} repeated"
+    )
+    print(
+        f"  {calls} catalog call(s), {received:,} bytes received, "
+        f"one call per model was {len(entered)}"
+    )
+
+    problems = []
+    if sorted(plan.to_add) != sorted(set(existing + new) - set(priced)):
+        problems.append("wrong models to add")
+    if sorted(plan.already_priced) != sorted(priced):
+        problems.append("already priced models weren't left out")
+    if set(plan.catalog) != set(existing) - set(priced):
+        problems.append("existing models weren't told from new ones")
+    if calls != 1:
+        problems.append(f"{calls} catalog calls")
+
+    # a short list, all but two of it in the mirror
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = actions.use_catalog(Path(tmp) / "catalog.db")
+        mirror.apply(
+            {
+                n: {
+                    "attributes": {"vendor-product-identifier": model},
+                    "attrs": [],
+                    "classes": [],
+                }
+                for n, model in enumerate(catalog)
+            },
+            {},
+        )
+        short = rand.sample(catalog, 8) + new[:2]
+        METRICS.reset()
+        plan = actions.plan_bulk_add(2, short)
+        short_calls, short_received = catalog_traffic()
+        mirror.close()
+        actions.CATALOG = None
+    print(
+        f"{len(short)} models entered, {len(short) - 2} in the mirror: "
+        f"{short_calls} catalog call(s), {short_received:,} bytes received"
+    )
+    server.shutdown()
+    if set(plan.catalog) != set(short[:-2]):
+        problems.append("the short list's existing models weren't told apart")
+    if short_calls != 2 or short_received >= received / 10:
+        problems.append("the models the mirror lacked cost a catalog download")
+    if problems:
+        print("FAIL")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
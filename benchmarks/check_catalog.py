@@ -0,0 +1,174 @@
+"""
+Catalog mirror check against a backend whose catalog changes between syncs.
+
+The server answers the catalog query with an ETag and a 304 when the
+client's copy is current. A first sync must take in every product, a
+second one must be answered with a 304, and one after a few products are
+added, changed and dropped must write only those. Lookups through the
+mirror must then take microseconds and make no backend calls.
+
+    python benchmarks/check_catalog.py [--products 5000] [--lookups 10000]
+"""
+
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import actions  # noqa: E402
+from catalog import sync_catalog  # noqa: E402
+
+CLASSES = {1: "Coils", 2: "Air Handlers", 3: "CP", 4: "HE"}
+
+
+def catalog_doc(products: dict[int, dict]) -> dict:
+    data, included = [], []
+    for id_, product in products.items():
+        attrs = [
+            {"id": id_ * 10 + n, "type": "vendor-product-attrs"}
+            for n in range(len(product["attrs"]))
+        ]
+        mappings = [
+            {"id": id_ * 10 + n, "type": "vendor-product-to-class-mapping"}
+            for n in range(len(product["classes"]))
+        ]
+        data.append(
+            {
+                "id": id_,
+                "type": "vendor-products",
+                "attributes": {
+                    "vendor-product-identifier": product["model"],
+                    "vendor-product-description": product["description"],
+                },
+                "relationships": {
+                    "vendor-product-attrs": {"data": attrs},
+                    "vendor-product-to-class-mapping": {"data": mappings},
+                },
+            }
+        )
+        for linkage, (attr, value) in zip(attrs, product["attrs"].items()):
+            attributes = {"attr": attr, "type": "STRING", "value": value}
+            included.append(linkage | {"attributes": attributes})
+        for linkage, class_id in zip(mappings, product["classes"]):
+            class_ = {"id": class_id, "type": "vendor-product-classes"}
+            relationships = {"vendor-product-classes": {"data": class_}}
+            included.append(linkage | {"relationships": relationships})
+    included += [
+        {"id": id_, "type": "vendor-product-classes", "attributes": {"name": name}}
+        for id_, name in CLASSES.items()
+    ]
+    return {"data": data, "included": included}
+
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    products: dict[int, dict] = {}
+    calls = 0
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        cls = type(self)
+        cls.calls += 1
+        body = json.dumps(catalog_doc(cls.products)).encode()
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    args = parser.parse_args()
+
+    CatalogHandler.products = {
+        id_: {
+            "model": f"B{id_:05}C",
+            "description": "COIL",
+            "attrs": {"tonnage": str(id_ % 5 + 1), "width": str(14 + id_ % 4)},
+            "classes": [id_ % 2 + 1, id_ % 2 + 3],
+        }
+        for id_ in range(1, args.products + 1)
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CatalogHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    actions.BACKEND_URL = "http://{}:{}".format(*server.server_address[:2])
+
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = actions.use_catalog(Path(tmp) / "catalog.db")
+        first = sync_catalog(mirror)
+        second = sync_catalog(mirror)
+        products = CatalogHandler.products
+        for id_ in (3, 4, 5):
+            products[id_]["attrs"]["tonnage"] = "9"
+        products[args.products + 1] = products[1] | {"model": "NEW00001"}
+        products[args.products + 2] = products[2] | {"model": "NEW00002"}
+        del products[6]
+        third = sync_catalog(mirror)
+        print(f"first sync:  {first}")
+        print(f"second sync: {second}")
+        print(f"third sync:  {third}")
+
+        models = [p["model"] for p in list(products.values())[: args.lookups]]
+        calls = CatalogHandler.calls
+        start = time.perf_counter()
+        for n in range(args.lookups):
+            mirror.product(models[n % len(models)])
+        per_lookup = (time.perf_counter() - start) / args.lookups
+        found = actions.find_vendor_products(models[:50])
+        backend_calls = CatalogHandler.calls - calls
+        print(
+            f"{per_lookup * 1e6:.1f} us a lookup, {backend_calls} backend call(s)"
+            f" for a {len(found)}-model existence check"
+        )
+        if (first.added, first.products) != (args.products, args.products):
+            problems.append("the first sync didn't take in every product")
+        if not second.not_modified:
+            problems.append("an unchanged catalog was fetched again")
+        if (third.added, third.changed, third.removed) != (2, 3, 1):
+            problems.append("the third sync didn't write just what changed")
+        if mirror.product("B00006C") or not mirror.product("NEW00002"):
+            problems.append("the mirror doesn't match the catalog")
+        if mirror.product_attrs("B00004C") != {"tonnage": "9", "width": "14"}:
+            problems.append(f"stale attrs {mirror.product_attrs('B00004C')}")
+        if mirror.product_classes("B00003C") != ["Air Handlers", "HE"]:
+            problems.append(f"wrong classes {mirror.product_classes('B00003C')}")
+        if mirror.class_id("Coils") != 1:
+            problems.append("class lookup failed")
+        if backend_calls or len(found) != 50:
+            problems.append("the existence check wasn't answered locally")
+        if per_lookup > 500e-6:
+            problems.append(f"lookups take {per_lookup * 1e6:.0f} us")
+        mirror.close()
+    server.shutdown()
+    if problems:
+        print("FAIL")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
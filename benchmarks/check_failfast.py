@@ -0,0 +1,101 @@
+"""
+Fail-fast check against a stalled fake backend.
+
+Starts the fake backend with a response delay far beyond the read timeout
+and makes calls through the transport layer. The first few calls must
+give up at the timeout, the rest must be refused at once by the open
+circuit, and once the backend recovers a probe must close it again.
+
+    python benchmarks/check_failfast.py [--timeout-s 0.5] [--calls 12]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import transport  # noqa: E402
+from circuit import CircuitOpenError, CircuitState  # noqa: E402
+from deadlines import DeadlineExceeded, deadline  # noqa: E402
+from fake_backend import FixtureStore, serve  # noqa: E402
+
+
+def timed_call(url: str) -> tuple[str, float]:
+    start = time.perf_counter()
+    try:
+        resp = transport.get(url)
+    except Exception as e:
+        outcome = type(e).__name__
+    else:
+        outcome = str(resp.status_code)
+    return outcome, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--timeout-s", type=float, default=0.5)
+    parser.add_argument("--stall-s", type=float, default=30)
+    parser.add_argument("--failures", type=int, default=3)
+    parser.add_argument("--reset-s", type=float, default=1.0)
+    parser.add_argument("--calls", type=int, default=12)
+    args = parser.parse_args()
+
+    transport.CONNECT_TIMEOUT = transport.READ_TIMEOUT = args.timeout_s
+    transport.BREAKER_FAILURES = args.failures
+    transport.BREAKER_RESET = args.reset_s
+    server = serve(FixtureStore([]), port=0, latency_ms=args.stall_s * 1000)
+    host, port = server.server_address[:2]
+    url = f"http://{host}:{port}/v2/vendors"
+    handler = server.RequestHandlerClass
+    problems = []
+
+    print(f"backend stalled for {args.stall_s:.0f} s per call")
+    start = time.perf_counter()
+    for n in range(1, args.calls + 1):
+        outcome, seconds = timed_call(url)
+        print(f"  call {n:>2}: {outcome:<18} {seconds * 1000:8.1f} ms")
+        if seconds > args.timeout_s * 2:
+            problems.append(f"call {n} took {seconds:.2f} s")
+        if n > args.failures and outcome != CircuitOpenError.__name__:
+            problems.append(f"call {n} was not refused by the open circuit")
+    total = time.perf_counter() - start
+    print(f"{args.calls} calls in {total:.2f} s")
+
+    # a second server, so these calls don't count against the first's circuit
+    other = serve(FixtureStore([]), port=0, latency_ms=args.stall_s * 1000)
+    other_url = "http://{}:{}/v2/vendors".format(*other.server_address[:2])
+    print(f"deadline of 100 ms, shorter than the {args.timeout_s} s timeout")
+    with deadline(0.1):
+        outcome, seconds = timed_call(other_url)
+        print(f"  call: {outcome:<18} {seconds * 1000:8.1f} ms")
+        if seconds > 0.3:
+            problems.append(f"the deadline didn't cut the call short ({seconds:.2f} s)")
+        time.sleep(0.15)
+        outcome, _ = timed_call(other_url)
+        print(f"  after the deadline: {outcome}")
+        if outcome != DeadlineExceeded.__name__:
+            problems.append("a call after the deadline was still sent")
+    other.shutdown()
+
+    print("backend recovers")
+    handler.latency = 0
+    time.sleep(args.reset_s)
+    outcome, seconds = timed_call(url)
+    state = transport.breaker_for(url).state
+    print(f"  probe: {outcome:<18} {seconds * 1000:8.1f} ms, circuit {state}")
+    if state is not CircuitState.CLOSED:
+        problems.append(f"the circuit is {state} after a successful probe")
+    server.shutdown()
+
+    if problems:
+        print("FAIL")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Startup import regression check.
+
+Runs `python -X importtime -c "import main"` and fails when importing the
+UI entry point pulls in modules that are meant to load lazily, or when the
+cumulative import time of main goes over budget.
+
+    python benchmarks/check_importtime.py [--budget-ms 250] [--runs 5]
+"""
+
+import re
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# loaded in the background after the welcome screen is painted
+LAZY_MODULES = (
+    "tkinter",
+    "requests",
+    "pydantic",
+    "schemas",
+    "actions",
+    "vendor_handlers",
+    "auth",
+)
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times() -> dict[str, tuple[int, int]]:
+    """module -> (self us, cumulative us) for a fresh `import main`"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import main failed:\n{proc.stderr}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if match := LINE.match(line):
+            self_us, cumulative_us, indent, module = match.groups()
+            if module == "site" and len(indent) == 1:
+                # interpreter startup, not caused by main
+                times.clear()
+                continue
+            times[module] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=250)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    # the first run warms the bytecode cache, keep the best of the rest
+    runs = [import_times() for _ in range(max(args.runs, 2))][1:]
+    best = min(runs, key=lambda t: t["main"][1])
+    failures = []
+
+    eager = sorted(
+        {module.split(".")[0] for module in best} & set(LAZY_MODULES),
+    )
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+
+    main_ms = best["main"][1] / 1000
+    print(f"import main: {main_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if main_ms > args.budget_ms:
+        failures.append(f"import main took {main_ms:.1f} ms")
+
+    top_level = [
+        (module, cumulative)
+        for module, (_, cumulative) in best.items()
+        if "." not in module and module != "main"
+    ]
+    top_level.sort(key=lambda t: t[1], reverse=True)
+    for module, cumulative in top_level[: args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Local price check check against a scripted model lookup.
+
+The server prices each model at its zero discount price less the better of
+the customer's material group and SNP discounts for the model's group. Once
+a customer's first check in a group has been answered by the server, the
+rest of the group, whose material group the catalog mirror knows, must be
+answered locally with the server's prices and without a call. When the server's discounts change, sampled verification
+must catch it and send that customer's checks back to the server.
+
+    python benchmarks/check_price_engine.py [--models 200] [--latency-ms 50]
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import actions  # noqa: E402
+
+GROUPS = ("CP", "HE", "HD")
+CLASSES = {1: "Coils", 2: "CP", 3: "HE", 4: "HD"}
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    products: dict[str, dict] = {}
+    # (customer id, group): (material group discount, snp discount)
+    discounts: dict[tuple[int, str], tuple[float, float | None]] = {}
+    latency = 0.0
+    calls = 0
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        cls = type(self)
+        cls.calls += 1
+        time.sleep(cls.latency)
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        product = cls.products.get(query["model_number"])
+        if product is None:
+            self.send_error(404)
+            return
+        zdp = product["price"] / 100
+        mgd, snp = cls.discounts[(int(query["customer_id"]), product["mpg"])]
+        answer = {
+            "model_number": product["model_number"],
+            "tonnage": product["tonnage"],
+            "mpg": product["mpg"],
+            "category": "COIL",
+            "top_level_class": "Coils",
+            "effective_date": "2026-01-01T00:00:00",
+            "zero_discount_price": zdp,
+            "material_group_discount": mgd * 100,
+            "material_group_net_price": round(zdp * (1 - mgd), 2),
+            "net_price": round(zdp * (1 - mgd), 2),
+        }
+        if snp is not None:
+            answer["snp_discount"] = snp
+            answer["snp_price"] = round(zdp * (1 - snp), 2)
+            answer["net_price"] = min(answer["net_price"], answer["snp_price"])
+        body = json.dumps(answer).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def timed_checks(customer_id: int, models: list[str]) -> tuple[list[dict], float]:
+    start = time.perf_counter()
+    answers = [actions.price_check(customer_id, model).json() for model in models]
+    return answers, (time.perf_counter() - start) / len(models)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--models", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    products = {
+        id_: {
+            "model_number": f"B{id_:05}C",
+            "tonnage": str(id_ % 5 + 1),
+            "mpg": GROUPS[id_ % len(GROUPS)],
+            "price": 100_000 + id_ * 1_337,
+        }
+        for id_ in range(args.models)
+    }
+    LookupHandler.products = {p["model_number"]: p for p in products.values()}
+    LookupHandler.discounts = {
+        # sent as a discount of 1, which reads as 100% as easily as 1%
+        (1, "CP"): (0.01, None),
+        (1, "HE"): (0.30, 0.38),
+        (1, "HD"): (0.40, 0.25),
+    }
+    LookupHandler.latency = args.latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LookupHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    actions.BACKEND_URL = "http://{}:{}".format(*server.server_address[:2])
+    actions.MODEL_LOOKUP = actions.BACKEND_URL + "/vendors/model-lookup/adp"
+    # zero discount pricing as get_zero_discount_pricing would have it
+    actions.LOCAL_STORAGE["zero_discount"] = {
+        id_: {k: v for k, v in p.items() if k != "mpg"} | {"description": "COIL"}
+        for id_, p in products.items()
+    }
+    tmp = tempfile.TemporaryDirectory()
+    mirror = actions.use_catalog(Path(tmp.name) / "catalog.db")
+    catalog = {
+        id_: {
+            "attributes": {"vendor-product-identifier": p["model_number"]},
+            "attrs": [["tonnage", p["tonnage"]]],
+            "classes": [1, 2 + GROUPS.index(p["mpg"])],
+        }
+        for id_, p in products.items()
+    }
+    mirror.apply(catalog, CLASSES)
+    engine = actions.PRICE_ENGINE
+    engine.sample = 0
+
+    problems = []
+    models = list(LookupHandler.products)
+    # one check per group through the server, the rest of the group locally
+    first = [models[n] for n in range(len(GROUPS))]
+    _, server_latency = timed_checks(1, first)
+    deadline = time.monotonic() + 5
+    while engine.quote(1, models[0]) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    calls = LookupHandler.calls
+    local_answers, local_latency = timed_checks(1, models)
+    local_calls = LookupHandler.calls - calls
+    print(
+        f"{len(models)} checks: {local_calls} server call(s), "
+        f"{local_latency * 1e6:.0f} us a check locally, "
+        f"{server_latency * 1e3:.1f} ms through the server"
+    )
+    if local_calls:
+        problems.append(f"{local_calls} server calls for checks known locally")
+    for model, local in zip(models, local_answers):
+        query = f"?model_number={model}&customer_id=1"
+        answer = actions.r_get(actions.MODEL_LOOKUP + query).json()
+        for key in ("zero_discount_price", "net_price", "mpg", "tonnage"):
+            if local.get(key) != answer.get(key):
+                problems.append(f"{model} {key}: {local.get(key)} != {answer[key]}")
+
+    # the server's discounts move, sampled verification has to notice
+    LookupHandler.discounts[(1, "CP")] = (0.45, None)
+    engine.sample = 1
+    changed = actions.price_check(1, models[len(GROUPS)]).json()
+    engine.sample = 0
+    calls = LookupHandler.calls
+    after = actions.price_check(1, models[2 * len(GROUPS)]).json()
+    expected = round(products[2 * len(GROUPS)]["price"] / 100 * 0.55, 2)
+    print(
+        f"after a discount change: {changed['net_price']} verified, "
+        f"{LookupHandler.calls - calls} server call(s) for the next check"
+    )
+    if changed["net_price"] != round(products[len(GROUPS)]["price"] / 100 * 0.55, 2):
+        problems.append("a changed discount was answered with the old one")
+    if LookupHandler.calls - calls != 1 or after["net_price"] != expected:
+        problems.append("a customer with a mismatch still got local answers")
+    server.shutdown()
+    mirror.close()
+    tmp.cleanup()
+    if problems:
+        print("FAIL")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Priority check with a backlog of background calls.
+
+Bulk workers keep far more calls queued than the adaptive limit lets out
+while prefetch workers and an interactive caller join in. Interactive
+calls must go straight out, prefetch calls must wait less than bulk ones,
+and a prefetch the user starts waiting on must be let out at once. Queue
+waits are read back from METRICS, as the performance panel shows them.
+
+    python benchmarks/check_priorities.py [--bulk 24] [--seconds 3]
+"""
+
+import sys
+import time
+import argparse
+import threading
+from itertools import count
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import transport  # noqa: E402
+from fake_backend import FixtureStore, serve  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from throttle import Priority, Ticket, priority, scheduled  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bulk", type=int, default=24)
+    parser.add_argument("--prefetch", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    transport.ENDPOINT_RATES = dict.fromkeys(transport.ENDPOINT_RATES, 0)
+    transport.BACKGROUND_MIN = transport.BACKGROUND_MAX = args.limit
+    server = serve(FixtureStore([]), port=0, latency_ms=args.latency_ms)
+    url = "http://{}:{}/v2/vendors".format(*server.server_address[:2])
+    stop = threading.Event()
+    # distinct URLs, identical GETs in flight together would be coalesced
+    calls = count()
+
+    def work(level: Priority) -> None:
+        with priority(level):
+            while not stop.is_set():
+                transport.get(f"{url}?call={next(calls)}")
+
+    workers = [(Priority.BULK, args.bulk), (Priority.PREFETCH, args.prefetch)]
+    threads = [
+        threading.Thread(target=work, args=(level,), daemon=True)
+        for level, n in workers
+        for _ in range(n)
+    ]
+    for thread in threads:
+        thread.start()
+    end = time.monotonic() + args.seconds
+    while time.monotonic() < end:
+        transport.get(f"{url}?call={next(calls)}")
+        time.sleep(0.05)
+
+    # a prefetch the user ends up waiting on, like Prefetcher.get does
+    ticket = Ticket(Priority.PREFETCH)
+    waited = []
+
+    def prefetch_call() -> None:
+        with scheduled(ticket):
+            start = time.perf_counter()
+            transport.get(f"{url}?call={next(calls)}")
+            waited.append(time.perf_counter() - start)
+
+    waiter = threading.Thread(target=prefetch_call)
+    start = time.perf_counter()
+    waiter.start()
+    time.sleep(0.005)
+    ticket.expedite()
+    waiter.join()
+    expedited = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+
+    stats = {stat.priority: stat for stat in METRICS.queue_wait_stats()}
+    print(f"queue wait with {args.bulk} bulk workers and a limit of {args.limit}")
+    for stat in stats.values():
+        print(
+            f"  {stat.priority:<12} {stat.calls:>5} calls  p50 {stat.p50 * 1000:8.1f} ms"
+            f"  p95 {stat.p95 * 1000:8.1f} ms"
+        )
+    print(f"expedited prefetch done in {expedited * 1000:.1f} ms")
+
+    problems = []
+    interactive = stats[str(Priority.INTERACTIVE)]
+    prefetch = stats[str(Priority.PREFETCH)]
+    bulk = stats[str(Priority.BULK)]
+    if interactive.p95 > 0.005:
+        problems.append("interactive calls waited in the queue")
+    if prefetch.p50 >= bulk.p50:
+        problems.append("prefetch calls waited as long as bulk ones")
+    if expedited > args.latency_ms / 1000 * 3:
+        problems.append(f"the expedited prefetch took {expedited:.2f} s")
+    if problems:
+        print("FAIL")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
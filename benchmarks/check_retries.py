@@ -0,0 +1,129 @@
+"""
+Retry check against a backend that fails on purpose.
+
+Runs calls through retries.call_with_retries and the transport layer
+against a small server that answers each route with a scripted sequence
+of statuses. GETs must ride out 503s and honour a 429's Retry-After, a
+POST answered 503 must not be resent blindly, and one whose existence
+check finds the record must come back with that record instead.
+
+    python benchmarks/check_retries.py
+"""
+
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import transport  # noqa: E402
+from retries import RetryPolicy, call_with_retries  # noqa: E402
+
+POLICY = RetryPolicy(attempts=4, base_delay=0.05, max_delay=1.0)
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """answers each path with the next status in its script, then 200"""
+
+    scripts: dict[str, list[tuple[int, dict]]] = {}
+    calls: dict[str, int] = {}
+    lock = threading.Lock()
+    protocol_version = "HTTP/1.1"
+
+    def _answer(self) -> None:
+        if length := int(self.headers.get("Content-Length", 0)):
+            self.rfile.read(length)
+        with self.lock:
+            self.calls[self.path] = self.calls.get(self.path, 0) + 1
+            script = self.scripts.get(self.path, [])
+            status, headers = script.pop(0) if script else (200, {})
+        body = json.dumps({"data": {"id": 1}}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _answer
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def run(base: str, method: str, path: str, **options) -> tuple[int, int, float]:
+    """status returned, calls the server saw and seconds taken"""
+    send = getattr(transport, method)
+    start = time.perf_counter()
+    resp = call_with_retries(
+        lambda attempt: send(base + path, retry_count=attempt),
+        POLICY,
+        description=f"{method.upper()} {path}",
+        **options,
+    )
+    return resp.status_code, ScriptedHandler.calls[path], time.perf_counter() - start
+
+
+def main() -> None:
+    # the scripted 503s would otherwise open the circuit part way through
+    transport.BREAKER_FAILURES = 100
+    ScriptedHandler.scripts = {
+        "/flaky": [(503, {}), (503, {})],
+        "/throttled": [(429, {"Retry-After": "0.5"})],
+        "/down": [(503, {})] * 10,
+        "/post-once": [(503, {})],
+        "/post-found": [(503, {})],
+        "/post-throttled": [(429, {"Retry-After": "0"})],
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = "http://{}:{}".format(*server.server_address[:2])
+    found = transport.get(base + "/existing")
+    checks = [
+        ("GET through two 503s", ("get", "/flaky"), {}, (200, 3)),
+        ("GET after a 429", ("get", "/throttled"), {}, (200, 2)),
+        ("GET while down", ("get", "/down"), {}, (503, POLICY.attempts)),
+        (
+            "POST with no way to check",
+            ("post", "/post-once"),
+            {"resend_safe": False},
+            (503, 1),
+        ),
+        (
+            "POST found by its existence check",
+            ("post", "/post-found"),
+            {"resend_safe": False, "exists": lambda: found},
+            (200, 1),
+        ),
+        (
+            "POST after a 429",
+            ("post", "/post-throttled"),
+            {"resend_safe": False},
+            (200, 2),
+        ),
+    ]
+    problems = []
+    for name, (method, path), options, expected in checks:
+        status, calls, seconds = run(base, method, path, **options)
+        print(f"  {name:<36} {status} after {calls} call(s) {seconds * 1000:8.1f} ms")
+        if (status, calls) != expected:
+            problems.append(f"{name}: expected {expected}, got {(status, calls)}")
+        if path == "/throttled" and seconds < 0.5:
+            problems.append(f"{name}: Retry-After wasn't waited out")
+    server.shutdown()
+
+    if problems:
+        print("FAIL")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
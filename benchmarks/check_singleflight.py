@@ -0,0 +1,109 @@
+"""
+Single-flight check with concurrent loads of the same customer pricing.
+
+A fake backend serves one synthetic pricing document slowly while several
+threads ask for the same account's pricing at once, as prefetch, the
+pricing sync and the user can. The backend must see one call and the
+document must be parsed once. Raw GETs of one URL through the transport
+layer must share a single response the same way. The hit, miss and
+coalesced counts are read back from METRICS.
+
+    python benchmarks/check_singleflight.py [--callers 8] [--rows 1000]
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import actions  # noqa: E402
+import transport  # noqa: E402
+import workloads  # noqa: E402
+from fake_backend import FixtureStore, serve  # noqa: E402
+from fixtures import Fixture  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from models import Vendor, VendorCustomer  # noqa: E402
+
+
+def concurrently(n: int, func) -> list:
+    results = [None] * n
+    start = threading.Barrier(n)
+
+    def run(i: int) -> None:
+        start.wait()
+        results[i] = func()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--callers", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    path = "/v2/vendors/adp/vendor-customers/1"
+    doc = workloads.pricing_by_customer_doc(args.rows)
+    fixture = Fixture("GET", path, "", 200, "application/json", json.dumps(doc))
+    server = serve(FixtureStore([fixture]), port=0, latency_ms=args.latency_ms)
+    actions.BACKEND_URL = "http://{}:{}".format(*server.server_address[:2])
+    account = VendorCustomer(id=1, vendor=Vendor.interned("adp", "ADP"), name="ONE")
+    parses = []
+    parse = actions.parse_pricing_by_customer
+    actions.parse_pricing_by_customer = lambda data: parses.append(1) or parse(data)
+
+    start = time.perf_counter()
+    results = concurrently(
+        args.callers, lambda: actions.get_pricing_by_customer(account)
+    )
+    seconds = time.perf_counter() - start
+    (backend,) = [s for s in METRICS.endpoint_stats() if s.route.endswith("{id}")]
+    print(
+        f"{args.callers} concurrent pricing loads: {backend.calls} backend call(s), "
+        f"{len(parses)} parse(s), {seconds * 1000:.0f} ms"
+    )
+    actions.get_pricing_by_customer(account)
+
+    url = actions.BACKEND_URL + "/v2/vendors"
+    responses = concurrently(args.callers, lambda: transport.get(url))
+    (vendors,) = [s for s in METRICS.endpoint_stats() if s.route == "/v2/vendors"]
+    print(f"{args.callers} concurrent GETs: {vendors.calls} backend call(s)")
+    server.shutdown()
+
+    for stat in METRICS.cache_stats():
+        print(
+            f"  {stat.name:<40} hits {stat.hits:>3}  misses {stat.misses:>3}"
+            f"  coalesced {stat.coalesced:>3}"
+        )
+    stats = {stat.name: stat for stat in METRICS.cache_stats()}
+    pricing = stats["pricing_by_customer"]
+
+    problems = []
+    if backend.calls != 1 or len(parses) != 1:
+        problems.append("concurrent pricing loads weren't shared")
+    if any(len(result) != args.rows for result in results):
+        problems.append("a caller got incomplete pricing")
+    if (pricing.misses, pricing.coalesced, pricing.hits) != (1, args.callers - 1, 1):
+        problems.append(f"unexpected pricing counts {pricing}")
+    if vendors.calls != 1 or len({id(resp) for resp in responses}) != 1:
+        problems.append("concurrent GETs weren't shared")
+    if problems:
+        print("FAIL")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
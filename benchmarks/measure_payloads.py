@@ -0,0 +1,84 @@
+"""
+Bytes on the wire per endpoint, before and after payload slimming.
+
+Fetches what each GET helper fetches twice: once as it used to be sent,
+without sparse fieldsets and asking for an uncompressed response, and
+once as it is sent now. Prints the decoded size and the size on the wire
+for both.
+
+Against the backend in config.ini, authenticating as the app does:
+
+    python benchmarks/measure_payloads.py [--vendor adp] [--customer 1]
+
+or against recorded fixtures, replayed by the fake backend with sparse
+fieldsets and compression applied:
+
+    python benchmarks/measure_payloads.py --fixtures fixtures/
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import actions  # noqa: E402
+import transport  # noqa: E402
+from auth import AuthToken  # noqa: E402
+from fake_backend import FixtureStore, serve  # noqa: E402
+from models import Vendor, VendorCustomer  # noqa: E402
+
+
+def fetch_size(url: str, headers: dict) -> tuple[int, int] | None:
+    """decoded and on-the-wire bytes, None if the backend has nothing there"""
+    resp = transport.get(url, headers=headers, verify=actions.VERIFY)
+    if resp.status_code != 200:
+        return None
+    return len(resp.content), resp.raw.tell()
+
+
+def measure(name: str, build_url: Callable[[], str]) -> None:
+    auth = getattr(AuthToken, "header", None) or {}
+    actions.SPARSE_FIELDSETS = False
+    before = fetch_size(build_url(), auth | {"Accept-Encoding": "identity"})
+    actions.SPARSE_FIELDSETS = True
+    after = fetch_size(build_url(), auth)
+    if not before or not after:
+        print(f"  {name:<22} not available")
+        return
+    kib = lambda n: f"{n / 1024:,.1f} KiB"
+    print(
+        f"  {name:<22} {kib(before[1]):>12} -> {kib(after[1]):>12} on the wire"
+        f" ({1 - after[1] / before[1]:.0%} less), decoded"
+        f" {kib(before[0])} -> {kib(after[0])}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--vendor", default="adp")
+    parser.add_argument("--customer", type=int, default=1)
+    parser.add_argument("--fixtures", type=Path)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        store = FixtureStore.load(args.fixtures)
+        server = serve(store, port=0, compress=True)
+        actions.BACKEND_URL = "http://{}:{}".format(*server.server_address[:2])
+    else:
+        from auth import set_up_token
+
+        set_up_token()
+    vendor = Vendor.interned(args.vendor, args.vendor.upper())
+    account = VendorCustomer(id=args.customer, vendor=vendor, name="")
+
+    print(f"bytes per endpoint, from {actions.BACKEND_URL}")
+    measure("vendors", actions.vendors_url)
+    measure("customers", lambda: actions.customers_url(vendor))
+    measure("pricing by customer", lambda: actions.pricing_by_customer_url(account))
+    measure("zero discount pricing", actions.zero_discount_url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+Benchmarks for the client's hot paths at 100 to 100k rows.
+
+Covers the JSON:API restructuring, the vendor customer join, model
+construction, the menu/routing_menu widget builds and TableRow.render on
+synthetic payloads, and on recorded ones when given a fixture directory
+(see fake_backend.py). Each run is saved under benchmarks/results/ and
+can be compared against an earlier one to spot regressions.
+
+    python benchmarks/suite.py [--sizes 100,1000,10000,100000] [--repeat 3]
+        [--budget-s 10] [--only restructure] [--fixtures fixtures/]
+        [--compare [RESULTS_FILE]] [--threshold 0.2] [--no-save]
+
+A case is skipped at a size when scaling its previous timing linearly
+would go over the budget, so the quadratic paths still finish in
+reasonable time. Raise --budget-s to push them further.
+"""
+
+import sys
+import json
+import time
+import pickle
+import argparse
+import platform
+import subprocess
+from dataclasses import dataclass
+from functools import cache, partial
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import workloads  # noqa: E402
+from bench_models import (  # noqa: E402
+    customer_pricing_fixture,
+    ratings_fixture,
+    pricing_type_adapter,
+    pricing_trusted,
+    ratings_validated,
+    ratings_trusted,
+)
+from actions import (  # noqa: E402
+    restructure_included,
+    restructure_pricing_by_customer,
+    restructure_pricing_by_class,
+    join_vendor_customers,
+)
+from models import (  # noqa: E402
+    PRODUCT_PRICES,
+    Route,
+    TableRow,
+    Vendor,
+    VendorCustomer,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+DEFAULT_SIZES = "100,1000,10000,100000"
+RATING_HEADERS = ["outdoor_model", "indoor_model", "seer2", "eer2", "capacity2"]
+VENDOR = Vendor.interned("adp", "ADP")
+
+
+@dataclass
+class Case:
+    name: str
+    setup: Callable[[int], Any]
+    run: Callable[[Any], Any]
+    # setup runs before every repeat, for cases that consume their input
+    fresh: bool = False
+
+
+def fresh_copy(func: Callable[[int], Any]) -> Callable[[int], Any]:
+    """build the input once per size, hand out an independent copy each time"""
+    cached = cache(lambda size: pickle.dumps(func(size)))
+    return lambda size: pickle.loads(cached(size))
+
+
+@cache
+def application():
+    from main import Application
+
+    return Application()
+
+
+def pricing_parse(doc: dict) -> list:
+    """get_pricing_by_customer's network path after resp.json()"""
+    structured = restructure_included(doc["included"], "vendor-pricing-by-customer")
+    pricing = restructure_pricing_by_customer(structured)
+    return PRODUCT_PRICES.validate_python(
+        [{"id": id_, **attrs} for id_, attrs in pricing.items()]
+    )
+
+
+def pricing_tree(size: int) -> dict:
+    """what restructure_included hands restructure_pricing_by_customer"""
+    rows = workloads.pricing_by_customer_doc(size)["included"]
+    by_type: dict[str, dict] = {}
+    for item in rows:
+        by_type.setdefault(item["type"], {})[item["id"]] = item
+    tree = {}
+    for id_, item in by_type["vendor-pricing-by-customer"].items():
+        node = dict(item["attributes"])
+        for rel, link in item["relationships"].items():
+            linkage = link["data"]
+            ids = (
+                [l["id"] for l in linkage]
+                if isinstance(linkage, list)
+                else [linkage["id"]]
+            )
+            node[rel] = {i: dict(by_type[rel][i]["attributes"]) for i in ids}
+        tree[id_] = node
+    return tree
+
+
+def ratings(size: int) -> list:
+    return ratings_validated(ratings_fixture(size))
+
+
+def cached_ratings(size: int) -> list[dict]:
+    return [
+        {"id": r.id, "attributes": r.attributes.model_dump(exclude_unset=True)}
+        for r in ratings(size)
+    ]
+
+
+def accounts(size: int) -> list[VendorCustomer]:
+    return [
+        VendorCustomer(id=n, vendor=VENDOR, name=f"ACCOUNT {n:06}") for n in range(size)
+    ]
+
+
+def product_routes(size: int) -> list:
+    import urwid
+
+    products = pricing_trusted(customer_pricing_fixture(size))
+    routes, last = [], None
+    for p in products:
+        category = p.attrs["custom_description"].value
+        if category != last:
+            routes.append(urwid.Divider("-"))
+            routes.append(urwid.Text(category, align="center"))
+            last = category
+        routes.append(
+            Route(
+                callable_=print,
+                choice_title=f"{p.id:05}   {p.model_number}   ${p.price:.02f}",
+            )
+        )
+    return routes
+
+
+def table_rows(size: int) -> list[TableRow]:
+    return [TableRow(r, displayable_elements=RATING_HEADERS) for r in ratings(size)]
+
+
+def render_rows(rows: list[TableRow]) -> None:
+    for row in rows:
+        row.render((120,), focus=False)
+
+
+def synthetic_cases() -> list[Case]:
+    def menu(choices, **kwargs):
+        return application().menu("benchmark", print, choices, **kwargs)
+
+    return [
+        Case(
+            "restructure_included",
+            cache(workloads.pricing_by_customer_doc),
+            lambda doc: restructure_included(
+                doc["included"], "vendor-pricing-by-customer"
+            ),
+        ),
+        Case(
+            "restructure_pricing_by_customer",
+            fresh_copy(pricing_tree),
+            restructure_pricing_by_customer,
+            fresh=True,
+        ),
+        Case(
+            "restructure_pricing_by_class",
+            fresh_copy(workloads.pricing_by_class_tree),
+            restructure_pricing_by_class,
+            fresh=True,
+        ),
+        Case(
+            "join_vendor_customers",
+            cache(workloads.vendor_customers_doc),
+            lambda doc: join_vendor_customers(VENDOR, doc),
+        ),
+        Case(
+            "ProductPriceBasic validate",
+            cache(customer_pricing_fixture),
+            pricing_type_adapter,
+        ),
+        Case(
+            "ProductPriceBasic trusted",
+            cache(customer_pricing_fixture),
+            pricing_trusted,
+        ),
+        Case("Rating validate", cache(ratings_fixture), ratings_validated),
+        Case("Rating trusted", cache(cached_ratings), ratings_trusted),
+        Case(
+            "menu (labels)",
+            cache(accounts),
+            lambda choices: menu(choices, label_attrs=["name"]),
+        ),
+        Case(
+            "menu (table)",
+            cache(ratings),
+            lambda choices: menu(choices, as_table=True, headers=RATING_HEADERS),
+        ),
+        Case(
+            "routing_menu",
+            cache(product_routes),
+            lambda routes: application().routing_menu("benchmark", routes),
+        ),
+        Case("TableRow.render", table_rows, render_rows, fresh=True),
+    ]
+
+
+def replay_cases(directory: Path) -> list[Case]:
+    replays = workloads.load_replays(directory)
+    cases = []
+    if doc := replays.get(workloads.PRICING_ROUTE):
+        recorded = sum(
+            1 for i in doc["included"] if i["type"] == "vendor-pricing-by-customer"
+        )
+        cases.append(
+            Case(
+                "replay: pricing parse",
+                cache(partial(workloads.scaled, doc, recorded_rows=recorded)),
+                pricing_parse,
+            )
+        )
+    if doc := replays.get(workloads.CUSTOMERS_ROUTE):
+        recorded = len(doc["data"])
+        cases.append(
+            Case(
+                "replay: join_vendor_customers",
+                cache(partial(workloads.scaled, doc, recorded_rows=recorded)),
+                lambda doc: join_vendor_customers(VENDOR, doc),
+            )
+        )
+    if not cases:
+        print(f"no pricing or vendor customer fixtures found in {directory}")
+    return cases
+
+
+def time_case(case: Case, size: int, repeats: int, budget: float) -> float:
+    """best of `repeats`, stopping early once a single run is over budget"""
+    best = float("inf")
+    arg = None if case.fresh else case.setup(size)
+    for _ in range(repeats):
+        if case.fresh:
+            arg = case.setup(size)
+        start = time.perf_counter()
+        case.run(arg)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        if elapsed > budget:
+            break
+    return best
+
+
+def git_revision() -> str:
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "diff", "--quiet", "HEAD", "--", "*.py"], cwd=ROOT
+        ).returncode
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{rev}-dirty" if dirty else rev
+
+
+def latest_results() -> Path | None:
+    results = sorted(RESULTS_DIR.glob("*.json"))
+    return results[-1] if results else None
+
+
+def compare(
+    current: dict[str, dict[str, float]], baseline_path: Path, threshold: float
+) -> int:
+    with open(baseline_path) as fp:
+        baseline = json.load(fp)
+    print(f"\ncompared with {baseline_path.name} ({baseline['revision']})")
+    regressions = 0
+    for name, by_size in current.items():
+        for size, seconds in by_size.items():
+            before = baseline["results"].get(name, {}).get(size)
+            if not before or seconds is None:
+                continue
+            ratio = seconds / before
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif ratio < 1 - threshold:
+                flag = "  faster"
+            print(f"  {name:<34} {int(size):>7,}  {ratio:5.2f}x{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-s", type=float, default=10.0)
+    parser.add_argument("--only", help="run cases whose name contains this")
+    parser.add_argument("--fixtures", type=Path, help="recorded fixture directory")
+    parser.add_argument(
+        "--compare",
+        nargs="?",
+        const="latest",
+        help="results file to compare with, the latest saved run by default",
+    )
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    cases = synthetic_cases()
+    if args.fixtures:
+        cases += replay_cases(args.fixtures)
+    if args.only:
+        cases = [c for c in cases if args.only.lower() in c.name.lower()]
+    baseline = None
+    if args.compare:
+        baseline = latest_results() if args.compare == "latest" else Path(args.compare)
+        if not baseline:
+            parser.error(f"no saved results in {RESULTS_DIR} to compare with")
+
+    results: dict[str, dict[str, float | None]] = {}
+    print(f"best of {args.repeat}, {args.budget_s:g}s budget per size")
+    print(f"  {'case':<34} " + " ".join(f"{size:>10,}" for size in sizes))
+    for case in cases:
+        timings = results.setdefault(case.name, {})
+        cells = []
+        previous: tuple[int, float] = None
+        for size in sizes:
+            if previous and previous[1] * size / previous[0] > args.budget_s:
+                timings[str(size)] = None
+                cells.append(f"{'skipped':>10}")
+                continue
+            seconds = time_case(case, size, args.repeat, args.budget_s)
+            timings[str(size)] = seconds
+            cells.append(f"{seconds * 1000:>8.1f}ms")
+            previous = (size, seconds)
+        print(f"  {case.name:<34} " + " ".join(cells), flush=True)
+
+    regressions = 0
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        revision = git_revision()
+        path = RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{revision}.json"
+        with open(path, "w") as fp:
+            json.dump(
+                {
+                    "revision": revision,
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "machine": platform.node(),
+                    "repeat": args.repeat,
+                    "results": results,
+                },
+                fp,
+                indent=1,
+            )
+        print(f"\nsaved {path.relative_to(ROOT)}")
+    if regressions:
+        sys.exit(f"{regressions} regressions over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Synthetic backend payloads for the benchmark suite, shaped like the
+JSON:API documents the client receives, plus helpers to scale recorded
+fixtures to the same sizes.
+"""
+
+import sys
+import json
+import math
+import random
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fixtures import Fixture  # noqa: E402
+from fake_backend import scale_document  # noqa: E402
+from metrics import route_template  # noqa: E402
+
+SERIES = ("HE", "HH", "V", "B", "F", "S", "M")
+PRICING_ROUTE = "/v2/vendors/{vendor}/vendor-customers/{id}"
+CUSTOMERS_ROUTE = "/v2/vendors/{vendor}/vendor-customers"
+
+
+def _linkage(type_: str, id_: int) -> dict:
+    return {"id": id_, "type": type_}
+
+
+def model_number(rand: random.Random, series: str, n: int) -> str:
+    return f"{series}{rand.randint(100, 999)}{n:06}"
+
+
+def pricing_by_customer_doc(rows: int, seed: int = 1) -> dict:
+    """
+    GET /v2/vendors/adp/vendor-customers/{id} with the pricing includes,
+    one product and two customer-specific attrs per row
+    """
+    rand = random.Random(seed)
+    included = []
+    for n in range(1, rows + 1):
+        series = rand.choice(SERIES)
+        attr_ids = (n * 2, n * 2 + 1)
+        included.append(
+            {
+                "id": n,
+                "type": "vendor-pricing-by-customer",
+                "attributes": {
+                    "price": rand.randint(20_000, 400_000),
+                    "effective-date": "2024-06-01T00:00:00",
+                    "use-as-override": True,
+                },
+                "relationships": {
+                    "vendor-products": {"data": _linkage("vendor-products", n)},
+                    "vendor-pricing-by-customer-attrs": {
+                        "data": [
+                            _linkage("vendor-pricing-by-customer-attrs", id_)
+                            for id_ in attr_ids
+                        ]
+                    },
+                },
+            }
+        )
+        included.append(
+            {
+                "id": n,
+                "type": "vendor-products",
+                "attributes": {
+                    "vendor-product-identifier": model_number(rand, series, n),
+                    "vendor-product-description": f"{series} series coil",
+                },
+                "relationships": {},
+            }
+        )
+        for id_, attr, type_, value in (
+            (attr_ids[0], "custom_description", "STRING", f"{series} Coils"),
+            (attr_ids[1], "sort_order", "NUMBER", str(rand.randint(1, 50))),
+        ):
+            included.append(
+                {
+                    "id": id_,
+                    "type": "vendor-pricing-by-customer-attrs",
+                    "attributes": {"attr": attr, "type": type_, "value": value},
+                    "relationships": {},
+                }
+            )
+    rand.shuffle(included)
+    return {
+        "data": {
+            "id": 1,
+            "type": "vendor-customers",
+            "attributes": {"name": "CUSTOMER"},
+            "relationships": {
+                "vendor-pricing-by-customer": {
+                    "data": [
+                        _linkage("vendor-pricing-by-customer", n)
+                        for n in range(1, rows + 1)
+                    ]
+                }
+            },
+        },
+        "included": included,
+    }
+
+
+def pricing_by_class_tree(rows: int, seed: int = 1) -> dict:
+    """class pricing as restructure_included leaves it"""
+    rand = random.Random(seed)
+    by_class = {}
+    for n in range(1, rows + 1):
+        series = rand.choice(SERIES)
+        by_class[n] = {
+            "price": rand.randint(20_000, 400_000),
+            "vendor-products": {
+                n: {
+                    "vendor-product-identifier": model_number(rand, series, n),
+                    "vendor-product-description": f"{series} series coil",
+                    "vendor-product-attrs": {
+                        n * 2: {"attr": "series", "value": series},
+                        n * 2 + 1: {"attr": "tonnage", "value": rand.randint(2, 6)},
+                    },
+                }
+            },
+        }
+    return {
+        1: {
+            "vendor-pricing-classes": {
+                1: {"name": "ZERO_DISCOUNT", "vendor-pricing-by-class": by_class},
+                2: {"name": "STRATEGY_PRICING", "vendor-pricing-by-class": {}},
+            }
+        }
+    }
+
+
+def vendor_customers_doc(accounts: int, per_customer: int = 3, seed: int = 1) -> dict:
+    """
+    GET /v2/vendors/adp/vendor-customers with the customer mapping includes,
+    `per_customer` vendor accounts mapped to each SCA customer's location
+    """
+    rand = random.Random(seed)
+    customers = max(1, accounts // per_customer)
+    data, included = [], []
+    for c in range(1, customers + 1):
+        included.append(
+            {
+                "id": c,
+                "type": "customers",
+                "attributes": {"name": f"CUSTOMER {rand.randint(0, 99999):05}"},
+                "relationships": {},
+            }
+        )
+        included.append(
+            {
+                "id": c,
+                "type": "customer-locations",
+                "attributes": {},
+                "relationships": {"customers": {"data": _linkage("customers", c)}},
+            }
+        )
+    for a in range(1, accounts + 1):
+        location = min(customers, (a - 1) // per_customer + 1)
+        included.append(
+            {
+                "id": a,
+                "type": "customer-location-mapping",
+                "attributes": {},
+                "relationships": {
+                    "customer-locations": {
+                        "data": _linkage("customer-locations", location)
+                    }
+                },
+            }
+        )
+        data.append(
+            {
+                "id": a,
+                "type": "vendor-customers",
+                "attributes": {"name": f"ACCOUNT {a:06}"},
+                "relationships": {
+                    "customer-location-mapping": {
+                        "data": [_linkage("customer-location-mapping", a)]
+                    }
+                },
+            }
+        )
+    return {"data": data, "included": included}
+
+
+def load_replays(directory: Path) -> dict[str, dict]:
+    """the first recorded pricing and vendor customers documents, by route"""
+    replays = {}
+    for path in sorted(directory.glob("GET_*.json")):
+        fixture = Fixture.load(path)
+        if fixture.base64 or fixture.status != 200:
+            continue
+        parts = route_template(fixture.path).split("/")
+        if len(parts) > 3 and parts[1] == "v2" and parts[2] == "vendors":
+            # the vendor id segment isn't numeric, template it by position
+            parts[3] = "{vendor}"
+        route = "/".join(parts)
+        if route in (PRICING_ROUTE, CUSTOMERS_ROUTE):
+            replays.setdefault(route, json.loads(fixture.body))
+    return replays
+
+
+def scaled(doc: dict, rows: int, recorded_rows: int) -> dict:
+    """repeat a recorded document until it holds about `rows` rows"""
+    return scale_document(doc, max(1, math.ceil(rows / max(1, recorded_rows))))
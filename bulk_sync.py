@@ -0,0 +1,159 @@
+"""
+Fetches every account's pricing for a vendor ahead of time so the Product
+Strategy screen opens from LOCAL_STORAGE without waiting on the network.
+
+Requests go out from a thread pool as background calls, so the transport
+layer adapts how many run at once to how the backend is coping and keeps
+them from crowding out the user's own calls. Responses are parsed on the
+worker threads, decoded as they arrive, or in worker processes when
+[OTHER] sync_processes is set, since the restructuring is CPU bound.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+import actions
+from actions import (
+    LOCAL_STORAGE,
+    configs,
+    r_get,
+    shared_fetch,
+    pricing_by_customer_url,
+    decode_pricing_by_customer,
+    get_pricing_by_customer,
+    parse_pricing_by_customer,
+)
+from circuit import CircuitOpenError
+from decoding import document, read_document
+from metrics import METRICS
+from throttle import Priority, priority
+from models import VendorCustomer
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# a ceiling, transport's adaptive limit decides how many are in flight
+SYNC_WORKERS = configs.getint("OTHER", "sync_workers", fallback=8)
+SYNC_PROCESSES = configs.getint("OTHER", "sync_processes", fallback=0)
+
+
+@dataclass(slots=True)
+class SyncResult:
+    total: int
+    cached: int = 0
+    fetched: int = 0
+    failed: list[VendorCustomer] = field(default_factory=list)
+    cancelled: bool = False
+    stopped_by: str = ""
+    seconds: float = 0.0
+
+    @property
+    def done(self) -> int:
+        return self.cached + self.fetched + len(self.failed)
+
+    def __str__(self) -> str:
+        text = f"{self.fetched} fetched, {self.cached} already cached"
+        if self.failed:
+            text += f", {len(self.failed)} failed"
+        if self.stopped_by:
+            text += f", stopped: {self.stopped_by}"
+        elif self.cancelled:
+            text += ", cancelled"
+        return f"{text} in {self.seconds:.1f} s"
+
+
+def _sync_one(
+    account: VendorCustomer,
+    parser: Executor | None,
+    stopped: Callable[[], bool],
+) -> bool:
+    """fetch and store one account's pricing, False if stopped first"""
+    if stopped():
+        return False
+    if actions.SNAPSHOT:
+        get_pricing_by_customer(account)
+        return True
+    url = pricing_by_customer_url(account)
+
+    def fetch() -> dict:
+        # worker processes are sent the body as is
+        resp = r_get(url, decode=None if parser else read_document)
+        if resp.status_code != 200:
+            raise Exception(f"{resp.status_code} {resp.reason}")
+        with METRICS.parsing(resp.url), span("parse pricing"):
+            if parser:
+                pricing = parser.submit(
+                    decode_pricing_by_customer, resp.content
+                ).result()
+            else:
+                pricing = parse_pricing_by_customer(document(resp))[0]
+        # pricing the user loaded, and maybe edited, meanwhile is kept
+        return LOCAL_STORAGE["pricing_by_customer"].setdefault(account.id, pricing)
+
+    # shared with the user's own load of the same account if one is under way
+    shared_fetch("pricing_by_customer", url, fetch)
+    return True
+
+
+def sync_pricing(
+    accounts: list[VendorCustomer],
+    workers: int = SYNC_WORKERS,
+    processes: int = SYNC_PROCESSES,
+    cancel: threading.Event = None,
+    on_progress: Callable[[SyncResult], None] = None,
+) -> SyncResult:
+    """
+    fill LOCAL_STORAGE with pricing for every account not already in it,
+    `on_progress` is called from the sync's workers after each account
+    """
+    cancel = cancel or threading.Event()
+    # set when the backend goes down, without touching the caller's event
+    halted = threading.Event()
+    stopped = lambda: cancel.is_set() or halted.is_set()
+    cached = LOCAL_STORAGE["pricing_by_customer"]
+    missing = [a for a in accounts if a.id not in cached]
+    result = SyncResult(total=len(accounts), cached=len(accounts) - len(missing))
+    lock = threading.Lock()
+    start = time.perf_counter()
+    parser = ProcessPoolExecutor(processes) if processes > 0 and missing else None
+
+    def run(account: VendorCustomer) -> None:
+        try:
+            with priority(Priority.BULK):
+                synced = _sync_one(account, parser, stopped)
+        except CircuitOpenError as e:
+            # the rest would fail the same way, leave them for the next sync
+            result.stopped_by = str(e)
+            halted.set()
+            return
+        except Exception as e:
+            logger.warning(f"pricing sync failed for {account.name}: {e}")
+            with lock:
+                result.failed.append(account)
+        else:
+            if not synced:
+                return
+            with lock:
+                result.fetched += 1
+        if result.done % 25 == 0:
+            logger.info(f"pricing sync: {result.done}/{result.total}")
+        if on_progress:
+            on_progress(result)
+
+    with span("sync pricing", accounts=len(accounts), missing=len(missing)):
+        try:
+            with ThreadPoolExecutor(
+                max(1, workers), thread_name_prefix="pricing-sync"
+            ) as pool:
+                for _ in pool.map(run, missing):
+                    pass
+        finally:
+            if parser:
+                parser.shutdown(cancel_futures=True)
+    result.cancelled = stopped()
+    result.seconds = time.perf_counter() - start
+    logger.info(f"pricing sync: {result}")
+    return result
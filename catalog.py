@@ -0,0 +1,310 @@
+"""
+Local mirror of ADP's product catalog: every vendor product with its attrs
+and the product classes it's mapped to, in one SQLite file indexed by
+vendor-product-identifier. Existence checks and class lookups when adding
+models are answered from it instead of a backend call each.
+
+Syncs are incremental. The catalog is asked for conditionally, so an
+unchanged one costs a 304, and of a changed one only the products that
+were added, changed or dropped since the last sync are written.
+
+    python catalog.py sync [catalog.db]
+"""
+
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import argparse
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Collection
+from decoding import document, loads, read_document
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    identifier TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_by_identifier ON products (identifier);
+CREATE TABLE IF NOT EXISTS classes (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS classes_by_name ON classes (name);
+"""
+# what a sync asks for, and what it keeps of each type
+SYNC_INCLUDES = "vendor-product-attrs,vendor-product-to-class-mapping"
+SYNC_INCLUDES += ".vendor-product-classes"
+SYNC_FIELDS = {
+    "vendor-products": (
+        "vendor-product-identifier",
+        "vendor-product-description",
+        "vendor-product-attrs",
+        "vendor-product-to-class-mapping",
+    ),
+    "vendor-product-attrs": ("attr", "type", "value"),
+    "vendor-product-to-class-mapping": ("vendor-product-classes",),
+    "vendor-product-classes": ("name",),
+}
+# most SQLite builds take at least this many parameters in a statement
+BATCH = 500
+
+
+@dataclass(slots=True)
+class CatalogSync:
+    products: int = 0
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    # the backend answered 304, nothing had changed
+    not_modified: bool = False
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        if self.not_modified:
+            text = "unchanged"
+        else:
+            text = f"{self.added} added, {self.changed} changed, {self.removed} removed"
+        return f"{text}, {self.products} products, in {self.seconds:.1f} s"
+
+
+def _digest(payload: bytes) -> str:
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _pack(value: dict) -> bytes:
+    return json.dumps(value, separators=(",", ":"), sort_keys=True).encode()
+
+
+def catalog_rows(doc: dict) -> tuple[dict[int, dict], dict[int, str]]:
+    """
+    products by id, each with its attributes, attrs and class ids, and class
+    names by id, from a JSON:API catalog document
+    """
+    index = {(item["type"], item["id"]): item for item in doc.get("included", [])}
+
+    def linked(item: dict, rel: str) -> list[dict]:
+        data = item.get("relationships", {}).get(rel, {}).get("data") or []
+        if isinstance(data, dict):
+            data = [data]
+        return [index[key] for d in data if (key := (d["type"], d["id"])) in index]
+
+    classes = {
+        item["id"]: item["attributes"]["name"]
+        for (type_, _), item in index.items()
+        if type_ == "vendor-product-classes"
+    }
+    products = {}
+    data = doc.get("data") or []
+    for product in [data] if isinstance(data, dict) else data:
+        products[int(product["id"])] = {
+            "attributes": product.get("attributes", {}),
+            "attrs": sorted(
+                (
+                    [a["attributes"]["attr"], a["attributes"].get("value")]
+                    for a in linked(product, "vendor-product-attrs")
+                ),
+                key=str,
+            ),
+            "classes": sorted(
+                int(class_["id"])
+                for mapping in linked(product, "vendor-product-to-class-mapping")
+                for class_ in linked(mapping, "vendor-product-classes")
+            ),
+        }
+    return products, classes
+
+
+class CatalogMirror:
+    """the mirror's file, safe to share across threads"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            if self._meta("version") not in (None, str(CATALOG_VERSION)):
+                logger.info(f"{path} is from another version, starting it over")
+                self._conn.executescript(
+                    "DELETE FROM meta; DELETE FROM products; DELETE FROM classes;"
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('version', ?)",
+                (str(CATALOG_VERSION),),
+            )
+
+    def _meta(self, key: str) -> str | None:
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def meta(self, key: str) -> str | None:
+        with self._lock:
+            return self._meta(key)
+
+    def _query(self, sql: str, *params) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def __len__(self) -> int:
+        return self._query("SELECT count(*) FROM products")[0][0]
+
+    def product(self, identifier: str) -> dict | None:
+        """the vendor-products record for `identifier`, as the backend has it"""
+        return self.products([identifier]).get(identifier)
+
+    def products(self, identifiers: Collection[str]) -> dict[str, dict]:
+        """records of those of `identifiers` in the catalog"""
+        identifiers = list(identifiers)
+        found = {}
+        for start in range(0, len(identifiers), BATCH):
+            batch = identifiers[start : start + BATCH]
+            # with repeats of an identifier the newest record wins,
+            # find_vendor_product takes the last match too
+            rows = self._query(
+                "SELECT id, identifier, payload FROM products WHERE identifier IN "
+                f"({','.join('?' * len(batch))}) ORDER BY id",
+                *batch,
+            )
+            for id_, identifier, payload in rows:
+                found[identifier] = {
+                    "id": id_,
+                    "type": "vendor-products",
+                    "attributes": loads(payload)["attributes"],
+                }
+        return found
+
+    def _payload(self, identifier: str) -> dict | None:
+        rows = self._query(
+            "SELECT payload FROM products WHERE identifier = ? ORDER BY id DESC",
+            identifier,
+        )
+        return loads(rows[0][0]) if rows else None
+
+    def product_attrs(self, identifier: str) -> dict[str, str] | None:
+        if payload := self._payload(identifier):
+            return dict(payload["attrs"])
+        return None
+
+    def product_classes(self, identifier: str) -> list[str]:
+        """names of the classes the product is mapped to"""
+        if not (payload := self._payload(identifier)):
+            return []
+        names = dict(self._query("SELECT id, name FROM classes"))
+        return [names[id_] for id_ in payload["classes"] if id_ in names]
+
+    def class_id(self, name: str) -> int | None:
+        rows = self._query("SELECT id FROM classes WHERE name = ? ORDER BY id", name)
+        return rows[-1][0] if rows else None
+
+    def apply(
+        self,
+        products: dict[int, dict],
+        classes: dict[int, str],
+        validators: dict[str, str] = None,
+    ) -> CatalogSync:
+        """
+        make the mirror match the catalog as just fetched, writing only what
+        differs. `validators` are the response's ETag and Last-Modified, for
+        asking conditionally next time.
+        """
+        result = CatalogSync(products=len(products))
+        # packed before taking the lock, lookups carry on meanwhile
+        packed = {id_: _pack(product) for id_, product in products.items()}
+        with self._lock, self._conn:
+            stored = dict(self._conn.execute("SELECT id, digest FROM products"))
+            writes = []
+            for id_, payload in packed.items():
+                digest = _digest(payload)
+                was = stored.pop(id_, None)
+                if was == digest:
+                    continue
+                if was is None:
+                    result.added += 1
+                else:
+                    result.changed += 1
+                identifier = products[id_]["attributes"]["vendor-product-identifier"]
+                writes.append((id_, identifier, digest, payload))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?)", writes
+            )
+            self._conn.executemany(
+                "DELETE FROM products WHERE id = ?", [(id_,) for id_ in stored]
+            )
+            self._conn.execute("DELETE FROM classes")
+            self._conn.executemany("INSERT INTO classes VALUES (?, ?)", classes.items())
+            for key, value in (validators or {}).items():
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value)
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('synced_at', ?)",
+                (time.strftime("%Y-%m-%d %H:%M:%S"),),
+            )
+        result.removed = len(stored)
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def sync_catalog(mirror: CatalogMirror) -> CatalogSync:
+    """bring `mirror` up to date with the backend's catalog"""
+    import actions
+
+    start = time.perf_counter()
+    url = f"{actions.BACKEND_URL}/v2/vendors/adp/vendor-products?page_number=0"
+    url += f"&include={SYNC_INCLUDES}{actions.sparse_fields(SYNC_FIELDS)}"
+    conditions = {
+        "If-None-Match": mirror.meta("etag"),
+        "If-Modified-Since": mirror.meta("last_modified"),
+    }
+    resp = actions.r_get(
+        url,
+        headers={name: value for name, value in conditions.items() if value},
+        decode=read_document,
+    )
+    if resp.status_code == 304:
+        result = CatalogSync(products=len(mirror), not_modified=True)
+    elif resp.status_code != 200:
+        raise Exception(f"Unable to sync the catalog: {resp.status_code}")
+    else:
+        with METRICS.parsing(resp.url):
+            products, classes = catalog_rows(document(resp))
+        validators = {
+            "etag": resp.headers.get("ETag", ""),
+            "last_modified": resp.headers.get("Last-Modified", ""),
+        }
+        result = mirror.apply(products, classes, validators)
+    result.seconds = time.perf_counter() - start
+    logger.info(f"catalog synced: {result}")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="bring the mirror up to date")
+    sync.add_argument("path", type=Path, nargs="?", default=Path("catalog.db"))
+    args = parser.parse_args()
+
+    from auth import set_up_token
+
+    logging.basicConfig(level=logging.WARNING)
+    set_up_token()
+    mirror = CatalogMirror(args.path.resolve())
+    print(f"{mirror.path}: {sync_catalog(mirror)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import time
+import logging
+import threading
+from enum import StrEnum
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(StrEnum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half open"
+
+
+class CircuitOpenError(Exception):
+    """Exception for a call refused because its backend is known to be down"""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` failed calls in a row (connection errors,
+    timeouts, 502/503/504) and from then on refuses calls immediately.
+    Once `reset_after` seconds have passed a single probe call is let
+    through: success closes the circuit, failure opens it for another
+    `reset_after` seconds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failures: int = 5,
+        reset_after: float = 30.0,
+        on_change: Callable[[str, CircuitState], None] = None,
+    ) -> None:
+        self.name = name
+        self.failures = failures
+        self.reset_after = reset_after
+        self.on_change = on_change
+        self.state = CircuitState.CLOSED
+        self._failed = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """raises CircuitOpenError unless the call may go out"""
+        with self._lock:
+            if self.state is CircuitState.CLOSED:
+                return
+            wait = self._opened_at + self.reset_after - time.monotonic()
+            if wait > 0 or self._probing:
+                raise CircuitOpenError(
+                    f"{self.name} is not responding, "
+                    f"retrying in {max(wait, 0):.0f} s"
+                )
+            self._probing = True
+            changed = self._set(CircuitState.HALF_OPEN)
+        self._notify(changed)
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._probing = False
+            if ok:
+                self._failed = 0
+                changed = self._set(CircuitState.CLOSED)
+            else:
+                self._failed += 1
+                if (
+                    self.state is CircuitState.HALF_OPEN
+                    or self._failed >= self.failures
+                ):
+                    self._opened_at = time.monotonic()
+                    changed = self._set(CircuitState.OPEN)
+                else:
+                    changed = None
+        self._notify(changed)
+
+    def release(self) -> None:
+        """a call ended without telling anything about the backend's health"""
+        with self._lock:
+            self._probing = False
+
+    def _set(self, state: CircuitState) -> CircuitState | None:
+        if state is self.state:
+            return None
+        self.state = state
+        return state
+
+    def _notify(self, changed: CircuitState | None) -> None:
+        if changed is None:
+            return
+        log = logger.warning if changed is CircuitState.OPEN else logger.info
+        log(f"circuit for {self.name} is {changed}")
+        if self.on_change:
+            self.on_change(self.name, changed)
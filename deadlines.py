@@ -0,0 +1,56 @@
+"""
+Per-thread deadlines. A UI action opens one and every backend call made
+while handling it gets no more than the time remaining, so a stalled
+backend can't hold the UI thread for longer than the action's budget.
+
+Kept free of heavy imports, the main loop uses it before `requests` loads.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+_local = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    """Exception for a backend call attempted after its action ran out of time"""
+
+
+def remaining() -> float | None:
+    """seconds left before the current thread's deadline, None without one"""
+    if (at := getattr(_local, "at", None)) is None:
+        return None
+    return at - time.monotonic()
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """nested deadlines never extend the one already in force"""
+    outer = getattr(_local, "at", None)
+    outer_budget = getattr(_local, "budget", None)
+    at = time.monotonic() + seconds
+    _local.at = at if outer is None else min(at, outer)
+    if outer is None:
+        _local.budget = seconds
+    try:
+        yield
+    finally:
+        _local.at, _local.budget = outer, outer_budget
+
+
+@contextmanager
+def restarted() -> Iterator[None]:
+    """
+    a fresh budget as long as the action's, for each item of a long action
+    like a bulk add, where one deadline for the whole of it would cut an
+    item off partway through
+    """
+    outer = getattr(_local, "at", None)
+    if (budget := getattr(_local, "budget", None)) is not None:
+        _local.at = time.monotonic() + budget
+    try:
+        yield
+    finally:
+        _local.at = outer
@@ -0,0 +1,171 @@
+"""
+JSON decoding for backend responses. Whole bodies go through orjson when
+it's installed and the standard library otherwise.
+
+Large JSON:API documents can instead be decoded while they arrive, see
+read_document: transport hands it the body chunk by chunk and the
+resources under `data` and `included` are decoded one at a time, so
+decoding overlaps with the transfer and the raw body is never held whole
+next to what it decodes to.
+"""
+
+import os
+import re
+import json
+import codecs
+import configparser
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+from tracing import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+configs = configparser.ConfigParser()
+configs.read(
+    os.environ.get("BACKEND_TUI_CONFIG", Path(__file__).resolve().parent / "config.ini")
+)
+# bodies at least this big are decoded as they arrive, 0 to always read them whole.
+# That takes a few times the CPU, it's for the customers whose pricing is huge
+STREAM_OVER = configs.getint("OTHER", "stream_json_over_kb", fallback=8192) * 1024
+DECODER = "orjson" if orjson else "json"
+# members of a JSON:API document that hold long lists of resources
+STREAMED_MEMBERS = frozenset({"data", "included"})
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def loads(content: bytes | str) -> Any:
+    return orjson.loads(content) if orjson else json.loads(content)
+
+
+def document(resp) -> Any:
+    """a response's JSON, as read_document left it or decoded from the body"""
+    if (decoded := getattr(resp, "decoded", None)) is not None:
+        return decoded
+    with span("json decode", bytes=len(resp.content), decoder=DECODER):
+        return loads(resp.content)
+
+
+def read_document(chunks: Iterable[bytes]) -> Any:
+    """
+    A JSON document from its body in chunks. Bodies shorter than
+    STREAM_OVER are decoded whole once they are in, longer ones as they
+    arrive.
+    """
+    chunks = iter(chunks)
+    head, size = [], 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if STREAM_OVER and size >= STREAM_OVER:
+            break
+    else:
+        with span("json decode", bytes=size, decoder=DECODER):
+            return loads(b"".join(head))
+    # the span takes in the rest of the transfer too
+    with span("json decode", streamed=True):
+        return _StreamReader(head, chunks).document()
+
+
+class _StreamReader:
+    """
+    Walks the top level object of a document itself and leaves each value,
+    or each item of the STREAMED_MEMBERS arrays, to the standard library's
+    decoder once enough of it has arrived. The decoder only shares the
+    strings of repeated keys within one call, they're shared across the
+    whole document here or it would take a good deal more memory than one
+    decoded in one go.
+    """
+
+    def __init__(self, head: list[bytes], rest: Iterator[bytes]) -> None:
+        self._chunks = rest
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._text = self._utf8.decode(b"".join(head))
+        self._pos = 0
+        self._ended = False
+        keys = {}
+        self._raw_decode = json.JSONDecoder(
+            object_pairs_hook=lambda pairs: {keys.setdefault(k, k): v for k, v in pairs}
+        ).raw_decode
+
+    def _more(self, want: int = 0) -> bool:
+        """
+        read on until at least `want` characters are waiting, dropping what's
+        been decoded, False if nothing more came
+        """
+        if self._ended:
+            return False
+        parts = [self._text[self._pos :]]
+        waiting = before = len(parts[0])
+        while waiting < want or len(parts) == 1:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._ended = True
+                parts.append(self._utf8.decode(b"", final=True))
+                break
+            parts.append(self._utf8.decode(chunk))
+            waiting += len(parts[-1])
+        self._text = "".join(parts)
+        self._pos = 0
+        return len(self._text) > before
+
+    def _peek(self) -> str:
+        """the next character that isn't whitespace, "" at the end"""
+        while True:
+            self._pos = WHITESPACE.match(self._text, self._pos).end()
+            if self._pos < len(self._text):
+                return self._text[self._pos]
+            if not self._more():
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f"Expecting one of {chars!r}", self._text, self._pos
+            )
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._raw_decode(self._text, self._pos)
+            except json.JSONDecodeError:
+                # a long value isn't decoded over again for every chunk
+                if not self._more(2 * (len(self._text) - self._pos)):
+                    raise
+                continue
+            # a number at the very end of what's arrived may go on in the next chunk
+            if end < len(self._text) or not self._more():
+                self._pos = end
+                return value
+
+    def document(self) -> Any:
+        if self._peek() != "{":
+            # nothing to walk, decode it the slow way
+            return self._value()
+        self._expect("{")
+        doc = {}
+        if self._peek() == "}":
+            self._pos += 1
+            return doc
+        while True:
+            member = self._value()
+            self._expect(":")
+            if member in STREAMED_MEMBERS and self._peek() == "[":
+                self._pos += 1
+                doc[member] = items = []
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    items.append(self._value())
+                    while self._expect(",]") == ",":
+                        items.append(self._value())
+            else:
+                doc[member] = self._value()
+            if self._expect(",}") == "}":
+                return doc
@@ -0,0 +1,283 @@
+"""
+Local stand-in for the backend that replays recorded fixtures.
+
+Record fixtures by setting `record_fixtures_dir` under [OTHER] in
+config.ini and using the app against the real backend, then serve them:
+
+    python fake_backend.py fixtures/ [--port 8765] [--latency-ms 80]
+        [--jitter-ms 20] [--scale 10] [--compress]
+
+Point a copy of config.ini at http://127.0.0.1:<port> (for both
+backend_url and oauth_url) and run the app or a benchmark with
+BACKEND_TUI_CONFIG=<that copy>.
+
+Requests are matched on method, path and query first. Failing that, they
+are matched on method and the route template, so a fixture recorded for
+one customer or product id answers for any id. `--scale` multiplies the
+resources in JSON:API documents, shifting ids so relationships still
+resolve, to load-test the parsing paths on bigger payloads.
+
+JSON:API sparse fieldsets (`fields[type]=...`) are applied to what is
+replayed, and `--compress` gzips responses, or uses brotli when the
+client accepts it and the brotli package is installed, as a production
+server would.
+"""
+
+import copy
+import gzip
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qsl, urlsplit
+from fixtures import Fixture, normalize_query
+from metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+
+class FixtureStore:
+    def __init__(self, fixtures: list[Fixture]) -> None:
+        self.exact: dict[tuple[str, str, str], Fixture] = {}
+        self.by_route: dict[tuple[str, str], Fixture] = {}
+        for fixture in fixtures:
+            self.exact[fixture.key] = fixture
+            self.by_route.setdefault(
+                (fixture.method, route_template(fixture.path)), fixture
+            )
+
+    @classmethod
+    def load(cls, directory: Path) -> "FixtureStore":
+        return cls([Fixture.load(path) for path in sorted(directory.glob("*.json"))])
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    def match(self, method: str, path: str, query: str) -> Fixture | None:
+        key = (method, path, normalize_query(query))
+        if fixture := self.exact.get(key):
+            return fixture
+        return self.by_route.get((method, route_template(path)))
+
+
+def _shift_id(id_, offset: int):
+    match id_:
+        case bool():
+            return id_
+        case int():
+            return id_ + offset
+        case str() if id_.isdigit():
+            return str(int(id_) + offset)
+        case _:
+            return id_
+
+
+def _shift_resource(resource: dict, offset: int) -> dict:
+    resource = copy.deepcopy(resource)
+    if "id" in resource:
+        resource["id"] = _shift_id(resource["id"], offset)
+    for rel in (resource.get("relationships") or {}).values():
+        match rel.get("data") if isinstance(rel, dict) else None:
+            case dict() as linkage:
+                linkage["id"] = _shift_id(linkage.get("id"), offset)
+            case list() as linkages:
+                for linkage in linkages:
+                    linkage["id"] = _shift_id(linkage.get("id"), offset)
+    return resource
+
+
+def _max_id(resources: list[dict]) -> int:
+    ids = [str(r.get("id")) for r in resources]
+    return max((int(i) for i in ids if i.isdigit()), default=0)
+
+
+def scale_document(doc: dict, factor: int) -> dict:
+    """
+    Repeat the resources of a JSON:API document `factor` times. Each copy
+    has its ids and relationship ids shifted by the same offset, so the
+    copies join among themselves exactly like the original does.
+    """
+    if factor <= 1 or not isinstance(doc, dict):
+        return doc
+    sections = [s for s in ("data", "included") if isinstance(doc.get(s), list)]
+    if not sections:
+        return doc
+    offset = max(_max_id(doc[s]) for s in sections) + 1
+    scaled = dict(doc)
+    for section in sections:
+        original = doc[section]
+        scaled[section] = original + [
+            _shift_resource(resource, offset * n)
+            for n in range(1, factor)
+            for resource in original
+        ]
+    return scaled
+
+
+def apply_fieldsets(doc: dict, query: str) -> dict:
+    """
+    Keep only the attributes and relationships a query's
+    `fields[type]=...` parameters ask for, for the types they name
+    """
+    fields = {
+        key[len("fields[") : -1]: set(value.split(","))
+        for key, value in parse_qsl(query)
+        if key.startswith("fields[") and key.endswith("]")
+    }
+    if not fields or not isinstance(doc, dict):
+        return doc
+
+    def trim(resource: dict) -> dict:
+        wanted = fields.get(resource.get("type"))
+        if wanted is None:
+            return resource
+        trimmed = dict(resource)
+        for member in ("attributes", "relationships"):
+            kept = {k: v for k, v in resource.get(member, {}).items() if k in wanted}
+            if kept:
+                trimmed[member] = kept
+            else:
+                trimmed.pop(member, None)
+        return trimmed
+
+    trimmed = dict(doc)
+    for section in ("data", "included"):
+        match doc.get(section):
+            case list() as resources:
+                trimmed[section] = [trim(resource) for resource in resources]
+            case dict() as resource:
+                trimmed[section] = trim(resource)
+    return trimmed
+
+
+def compress(body: bytes, accept_encoding: str) -> tuple[bytes, str | None]:
+    accepted = {e.split(";")[0].strip() for e in accept_encoding.split(",")}
+    if "br" in accepted:
+        try:
+            import brotli
+        except ImportError:
+            pass
+        else:
+            return brotli.compress(body), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    store: FixtureStore
+    latency: float = 0.0
+    jitter: float = 0.0
+    scale: int = 1
+    compress: bool = False
+    protocol_version = "HTTP/1.1"
+
+    def _replay(self) -> None:
+        url = urlsplit(self.path)
+        if length := int(self.headers.get("Content-Length", 0)):
+            self.rfile.read(length)
+        fixture = self.store.match(self.command, url.path, url.query)
+        if delay := self.latency + random.uniform(0, self.jitter):
+            time.sleep(delay)
+        if not fixture:
+            logger.warning(f"no fixture for {self.command} {self.path}")
+            body = json.dumps({"detail": f"no fixture for {url.path}"}).encode()
+            self._send(404, "application/json", body)
+            return
+        body = fixture.content()
+        if not fixture.base64 and (self.scale > 1 or "fields" in url.query):
+            try:
+                doc = json.loads(body)
+            except ValueError:
+                pass
+            else:
+                doc = scale_document(doc, self.scale)
+                doc = apply_fieldsets(doc, url.query)
+                body = json.dumps(doc).encode()
+        self._send(fixture.status, fixture.content_type, body)
+
+    def _send(self, status: int, content_type: str, body: bytes) -> None:
+        encoding = None
+        if self.compress:
+            accepted = self.headers.get("Accept-Encoding", "")
+            body, encoding = compress(body, accepted)
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _replay
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format % args)
+
+
+def serve(
+    store: FixtureStore,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    latency_ms: float = 0,
+    jitter_ms: float = 0,
+    scale: int = 1,
+    compress: bool = False,
+) -> ThreadingHTTPServer:
+    """start replaying on a background thread, port 0 picks a free port"""
+    handler = type(
+        "ConfiguredReplayHandler",
+        (ReplayHandler,),
+        {
+            "store": store,
+            "latency": latency_ms / 1000,
+            "jitter": jitter_ms / 1000,
+            "scale": scale,
+            "compress": compress,
+        },
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="fake-backend", daemon=True
+    ).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("fixtures", type=Path, help="directory of recorded fixtures")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--compress", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    store = FixtureStore.load(args.fixtures)
+    server = serve(
+        store,
+        args.host,
+        args.port,
+        args.latency_ms,
+        args.jitter_ms,
+        args.scale,
+        args.compress,
+    )
+    host, port = server.server_address[:2]
+    logger.info(f"replaying {len(store)} fixtures on http://{host}:{port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Record-and-replay fixtures for backend calls.
+
+While recording, every response that comes back through the shared
+transport session is written to the fixture directory along with the
+request that produced it. Credentials and tokens are scrubbed before
+anything touches disk. fake_backend.py serves the files back.
+"""
+
+import re
+import json
+import base64
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests as r
+
+logger = logging.getLogger(__name__)
+
+SCRUBBED = "***"
+SECRET_KEY = re.compile(
+    r"secret|password|authorization|^(access_|refresh_|id_)?token$", re.IGNORECASE
+)
+
+
+def normalize_query(query: str) -> str:
+    """parameter order doesn't matter when matching a request to a fixture"""
+    return urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+def scrub(value):
+    """replace anything that looks like a credential, at any depth"""
+    match value:
+        case dict():
+            return {
+                k: SCRUBBED if SECRET_KEY.search(str(k)) else scrub(v)
+                for k, v in value.items()
+            }
+        case list():
+            return [scrub(v) for v in value]
+        case _:
+            return value
+
+
+@dataclass
+class Fixture:
+    method: str
+    path: str
+    query: str
+    status: int
+    content_type: str
+    body: str
+    # binary bodies (e.g. downloaded spreadsheets) are stored as base64
+    base64: bool = False
+    request_body: str | None = None
+
+    @property
+    def key(self) -> tuple[str, str, str]:
+        return (self.method, self.path, normalize_query(self.query))
+
+    @property
+    def filename(self) -> str:
+        digest = hashlib.sha1("|".join(self.key).encode()).hexdigest()[:10]
+        slug = re.sub(r"[^a-zA-Z0-9]+", "-", self.path).strip("-") or "root"
+        return f"{self.method}_{slug}_{digest}.json"
+
+    def content(self) -> bytes:
+        if self.base64:
+            return base64.b64decode(self.body)
+        return self.body.encode()
+
+    @classmethod
+    def from_response(cls, resp: r.Response) -> "Fixture":
+        request = resp.request
+        url = urlsplit(request.url)
+        content_type = resp.headers.get("Content-Type", "")
+        try:
+            body, is_b64 = json.dumps(scrub(json.loads(resp.content))), False
+        except ValueError:
+            if content_type.startswith("text/"):
+                body, is_b64 = resp.text, False
+            else:
+                body, is_b64 = base64.b64encode(resp.content).decode(), True
+        request_body = request.body
+        if isinstance(request_body, bytes):
+            request_body = request_body.decode(errors="replace")
+        return cls(
+            method=request.method,
+            path=url.path,
+            query=url.query,
+            status=resp.status_code,
+            content_type=content_type,
+            body=body,
+            base64=is_b64,
+            request_body=scrub_text(request_body) if request_body else None,
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "Fixture":
+        with open(path) as fp:
+            return cls(**json.load(fp))
+
+    def save(self, directory: Path) -> Path:
+        path = directory / self.filename
+        with open(path, "w") as fp:
+            json.dump(asdict(self), fp, indent=1)
+        return path
+
+
+def scrub_text(text: str) -> str:
+    try:
+        return json.dumps(scrub(json.loads(text)))
+    except ValueError:
+        return text
+
+
+class FixtureRecorder:
+    """a requests response hook that saves each response as a fixture"""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, resp: r.Response, *args, **kwargs) -> r.Response:
+        try:
+            fixture = Fixture.from_response(resp)
+            with self._lock:
+                fixture.save(self.directory)
+                self.recorded += 1
+        except Exception as e:
+            logger.error(f"unable to record fixture for {resp.url}: {e}")
+        return resp
+
+
+def start_recording(directory: Path, session: r.Session = None) -> FixtureRecorder:
+    """record every response on `session`, the shared transport one by default"""
+    if session is None:
+        from transport import SESSION as session
+
+    recorder = FixtureRecorder(directory)
+    session.hooks["response"].append(recorder)
+    logger.info(f"recording backend fixtures to {directory}")
+    return recorder
+
+
+def stop_recording(recorder: FixtureRecorder, session: r.Session = None) -> None:
+    if session is None:
+        from transport import SESSION as session
+
+    session.hooks["response"].remove(recorder)
+    logger.info(f"recorded {recorder.recorded} fixtures to {recorder.directory}")
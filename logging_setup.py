@@ -0,0 +1,122 @@
+import json
+import time
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from queue import SimpleQueue
+from typing import Any, MutableMapping
+
+# attributes every LogRecord has, anything else was passed through `extra`
+_BLANK_RECORD = logging.LogRecord("", 0, "", 0, "", None, None)
+RECORD_ATTRS = frozenset(_BLANK_RECORD.__dict__) | {"message", "asctime"}
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+def extra_fields(record: logging.LogRecord) -> dict[str, Any]:
+    return {k: v for k, v in record.__dict__.items() if k not in RECORD_ATTRS}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """one JSON object per line, with any `extra` fields at the top level"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage().strip(),
+        }
+        entry |= extra_fields(record)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """the original text format, with `extra` fields appended as key=value"""
+
+    def __init__(self) -> None:
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        if fields := extra_fields(record):
+            text += " | " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return text
+
+
+class RotatingLogHandler(RotatingFileHandler):
+    """rolls the log over once it reaches `max_bytes` or is `max_age` seconds old"""
+
+    def __init__(
+        self, filename: Path, max_bytes: int, backups: int, max_age: float = 0
+    ) -> None:
+        super().__init__(
+            filename,
+            maxBytes=max_bytes,
+            backupCount=backups,
+            encoding="utf-8",
+            delay=True,
+        )
+        self.max_age = max_age
+        self.rollover_at = time.time() + max_age
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.max_age and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.max_age
+
+
+class StepLogger(logging.LoggerAdapter):
+    """
+    Adds fixed context (customer id, model) to every record, merged with
+    any `extra` given per call, and how long it has been since the previous
+    record from the same adapter as `duration_ms`, i.e. how long the step
+    being reported took.
+    """
+
+    def __init__(self, logger: logging.Logger, **context) -> None:
+        super().__init__(logger, context)
+        self._mark = time.perf_counter()
+
+    def process(
+        self, msg: Any, kwargs: MutableMapping[str, Any]
+    ) -> tuple[Any, MutableMapping[str, Any]]:
+        now = time.perf_counter()
+        kwargs["extra"] = {
+            **self.extra,
+            **kwargs.get("extra", {}),
+            "duration_ms": round((now - self._mark) * 1000, 1),
+        }
+        self._mark = now
+        return msg, kwargs
+
+
+def configure_logging(
+    log_file: Path,
+    json_lines: bool = True,
+    max_bytes: int = 10 * 1024 * 1024,
+    backups: int = 5,
+    max_age: float = 0,
+    level: int = logging.INFO,
+) -> QueueListener:
+    """
+    Callers only put records on a queue. A listener thread formats them and
+    writes to the rotating file, so logging never blocks on disk I/O.
+    """
+    handler = RotatingLogHandler(log_file, max_bytes, backups, max_age)
+    handler.setFormatter(JsonLinesFormatter() if json_lines else TextFormatter())
+    records = SimpleQueue()
+    listener = QueueListener(records, handler, respect_handler_level=True)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(records))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
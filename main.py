@@ -1,14 +1,22 @@
+from __future__ import annotations
+import time
+
+STARTED_AT = time.perf_counter()
+
 import urwid
+import weakref
+import threading
 from urwid.widget.frame import HeaderWidget, BodyWidget
+from collections import defaultdict
+from queue import SimpleQueue, Empty
 from functools import partial
-from typing import Callable, Annotated, Any, Iterable
+from typing import TYPE_CHECKING, Callable, Annotated, Any, Iterable
+from os import environ
 from os.path import dirname, abspath
 from pathlib import Path
 from configparser import ConfigParser
-from auth import set_up_token
 import logging
 
-set_up_token()
 from models import (
     SCACustomer,
     SCACustomerV2,
@@ -16,31 +24,60 @@ from models import (
     VendorCustomer,
     Route,
     Palette,
-    Attr,
-    Price,
-)
-from actions import (
-    get_vendors,
-    get_sca_customers_w_vendor_accounts,
-    LOCAL_STORAGE,
 )
-from models import TableHeader, TableRow, Route, ProductPriceBasic, Attr
-from vendor_handlers import HANDLERS
+from write_behind import WriteBehindQueue, EditKey, EditKind, SyncState
+from prefetch import Prefetcher
+from metrics import METRICS
+from tracing import TRACER, span
+from profiling import ActionProfiler
+from deadlines import DeadlineExceeded, deadline, remaining
+from logging_setup import configure_logging
+from models import TableHeader, TableRow, Route
+
+if TYPE_CHECKING:
+    from schemas import ProductPriceBasic, Attr, Price
+    from circuit import CircuitState
+    from write_behind import PendingEdit
 
 FILE_DIR = Path(dirname(abspath(__file__)))
 CONFIGS = ConfigParser()
-CONFIGS.read(str(FILE_DIR / "config.ini"))
+CONFIGS.read(environ.get("BACKEND_TUI_CONFIG", str(FILE_DIR / "config.ini")))
 BACKEND_URL = CONFIGS["ENDPOINTS"]["backend_url"]
 BASE_YEAR = CONFIGS["OTHER"]["price_year"]
 V2_AVAILABILITY_ENDPOINT = BACKEND_URL + "/v2"
+UI_POLL_INTERVAL = 0.1
+FIRST_PAINT_TARGET_MS = CONFIGS.getint("OTHER", "first_paint_target_ms", fallback=250)
+PREFETCH_WORKERS = CONFIGS.getint("OTHER", "prefetch_workers", fallback=2)
+RECORD_FIXTURES_DIR = CONFIGS.get("OTHER", "record_fixtures_dir", fallback=None)
+PROFILE_ACTIONS = CONFIGS.getboolean("OTHER", "profile_actions", fallback=False)
+PROFILE_MIN_MS = CONFIGS.getint("OTHER", "profile_min_ms", fallback=200)
+PROFILE_TOP = CONFIGS.getint("OTHER", "profile_top", fallback=40)
+ACTION_DEADLINE_S = CONFIGS.getfloat("OTHER", "action_deadline_s", fallback=30.0)
+LOG_FILE = FILE_DIR / "log.log"
+SNAPSHOT_PATH = Path(
+    CONFIGS.get("OTHER", "snapshot_path", fallback=str(FILE_DIR / "snapshot.db"))
+)
+CATALOG_MIRROR = CONFIGS.getboolean("OTHER", "catalog_mirror", fallback=True)
+CATALOG_PATH = Path(
+    CONFIGS.get("OTHER", "catalog_path", fallback=str(FILE_DIR / "catalog.db"))
+)
+TRACE_DIR = Path(CONFIGS.get("OTHER", "trace_dir", fallback=str(FILE_DIR / "traces")))
+
+VENDORS_KEY = ("vendors",)
 
 CACHE = {}
 
-logging.basicConfig(
-    filename="log.log",
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-    filemode="a",
+
+def customers_key(vendor: Vendor) -> tuple[str, str]:
+    return ("customers", vendor.id)
+
+
+LOG_LISTENER = configure_logging(
+    LOG_FILE,
+    json_lines=CONFIGS.get("OTHER", "log_format", fallback="json") == "json",
+    max_bytes=CONFIGS.getint("OTHER", "log_max_mb", fallback=10) * 1024 * 1024,
+    backups=CONFIGS.getint("OTHER", "log_backups", fallback=5),
+    max_age=CONFIGS.getfloat("OTHER", "log_rotate_hours", fallback=24) * 3600,
 )
 
 logger = logging.getLogger(__name__)
@@ -66,9 +103,49 @@ class VimScrollableColumns(urwid.Columns):
         return super().keypress(size, motions.get(key, key))
 
 
+class TracedMainLoop(urwid.MainLoop):
+    """
+    Opens a root span for each batch of input and each redraw, and profiles
+    the input handling when the action profiler asks for it. Backend calls
+    made while handling input share one deadline, long actions restart it
+    per item with deadlines.restarted. An action that still runs out of
+    time is reported through `on_deadline` rather than ending the loop.
+    """
+
+    def __init__(
+        self,
+        *args,
+        profiler: ActionProfiler,
+        on_deadline: Callable[[DeadlineExceeded], None],
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.profiler = profiler
+        self.on_deadline = on_deadline
+
+    def process_input(self, keys: Iterable) -> bool:
+        names = [str(k) for k in keys]
+        with (
+            span("input", keys=names),
+            self.profiler.profiling(f"input {names}"),
+            deadline(ACTION_DEADLINE_S),
+        ):
+            try:
+                return super().process_input(keys)
+            except DeadlineExceeded as e:
+                self.on_deadline(e)
+                return True
+
+    def draw_screen(self) -> None:
+        with span("draw"):
+            super().draw_screen()
+
+
 class Application:
 
-    def __init__(self):
+    def __init__(self, offline: Path = None):
+        """`offline` is a snapshot file to browse instead of the backend"""
+        self.offline = offline
         self.sca_customer: SCACustomer = None
         self.vendor_customer: VendorCustomer = None
         self.user_input: urwid.Edit = None
@@ -76,6 +153,22 @@ class Application:
         self.NAV_STACK: list[tuple[HeaderWidget, BodyWidget]] = []
         self.WELCOME_SCREEN = True
         self.edit_mode = False
+        self.perf_panel_open = False
+        self.vendor: Vendor = None
+        self.pricing_sync: threading.Thread | None = None
+        self.sync_cancel = threading.Event()
+        self.startup_done = threading.Event()
+        self.startup_error: Exception | None = None
+        self._startup_retry = threading.Lock()
+        self.prefetcher = Prefetcher(CACHE, workers=PREFETCH_WORKERS)
+        self._ui_calls: SimpleQueue[tuple[Callable, tuple]] = SimpleQueue()
+        self.sync_rows: defaultdict[EditKey, weakref.WeakSet[TableRow]] = defaultdict(
+            weakref.WeakSet
+        )
+        self.write_behind = WriteBehindQueue(
+            self.persist_edits,
+            on_state_change=partial(self.call_soon, self.show_sync_state),
+        ).start()
 
         # footer buttons
         back_to_top = urwid.Button("Main Menu")
@@ -96,9 +189,11 @@ class Application:
         main = urwid.Padding(self.welcome_screen(), left=2, right=2)
         self.frame = urwid.Frame(main)
         self.frame.footer = button_row
-        self.frame.header = urwid.Text(
-            f"connecting to backend: {BACKEND_URL} | price year: {BASE_YEAR}"
-        )
+        if offline:
+            source = f"offline snapshot: {offline.name}"
+        else:
+            source = f"connecting to backend: {BACKEND_URL}"
+        self.frame.header = urwid.Text(f"{source} | price year: {BASE_YEAR}")
         top = urwid.Overlay(
             self.frame,
             urwid.SolidFill("\N{MEDIUM SHADE}"),
@@ -109,19 +204,190 @@ class Application:
             min_width=20,
             min_height=9,
         )
-        self.main_loop = urwid.MainLoop(
-            top, palette=[p.value for p in Palette], unhandled_input=self.change_focus
+        self.profiler = ActionProfiler(
+            LOG_FILE.parent,
+            top=PROFILE_TOP,
+            always=PROFILE_ACTIONS,
+            min_seconds=PROFILE_MIN_MS / 1000,
+            on_dump=self.profile_written,
+        )
+        self.main_loop = TracedMainLoop(
+            top,
+            palette=[p.value for p in Palette],
+            unhandled_input=self.change_focus,
+            profiler=self.profiler,
+            on_deadline=self.deadline_exceeded,
+        )
+        self.main_loop.set_alarm_in(UI_POLL_INTERVAL, self._drain_ui_calls)
+        self._first_paint_handle = self.main_loop.event_loop.enter_idle(
+            self._first_paint
         )
 
+    def _first_paint(self) -> None:
+        """
+        Runs once the welcome screen is up. Authentication and the heavier
+        imports only start now so they never delay the first draw.
+        """
+        self.main_loop.event_loop.remove_enter_idle(self._first_paint_handle)
+        self.main_loop.draw_screen()
+        elapsed_ms = (time.perf_counter() - STARTED_AT) * 1000
+        msg = f"time to first paint: {elapsed_ms:.0f} ms"
+        if elapsed_ms > FIRST_PAINT_TARGET_MS:
+            logger.warning(f"{msg} (target {FIRST_PAINT_TARGET_MS} ms)")
+        else:
+            logger.info(msg)
+        threading.Thread(
+            target=self._background_setup, name="startup", daemon=True
+        ).start()
+
+    def _setup(self) -> None:
+        """authenticate and import the api layer, raising what went wrong"""
+        if self.offline:
+            import actions, vendor_handlers
+
+            actions.use_snapshot(self.offline)
+            return
+        if RECORD_FIXTURES_DIR:
+            from fixtures import start_recording
+
+            start_recording(Path(RECORD_FIXTURES_DIR))
+        from auth import set_up_token
+
+        set_up_token()
+        # import the api layer while the user reads the welcome screen
+        import actions, vendor_handlers, transport
+
+        transport.on_circuit_change(partial(self.call_soon, self.circuit_changed))
+
+    def _after_setup(self) -> None:
+        # nothing to prefetch offline, the snapshot is local
+        if not self.offline:
+            self.start_prefetch()
+            self.start_catalog_sync()
+
+    def _background_setup(self) -> None:
+        try:
+            self._setup()
+        except Exception as e:
+            logger.error(f"startup failed: {e}")
+            self.startup_error = e
+        finally:
+            self.startup_done.set()
+        if not self.startup_error:
+            self._after_setup()
+
+    def start_prefetch(self) -> None:
+        """warm the vendor menu and then each implemented vendor's customers"""
+        from actions import get_vendors, get_sca_customers_w_vendor_accounts
+        from vendor_handlers import HANDLERS
+
+        def prefetch_customers(vendors: list[Vendor]) -> None:
+            implemented = [v for v in vendors if v.id in HANDLERS]
+            for rank, vendor in enumerate(implemented, start=1):
+                self.prefetcher.schedule(
+                    customers_key(vendor),
+                    partial(get_sca_customers_w_vendor_accounts, vendor),
+                    priority=rank,
+                )
+
+        self.prefetcher.schedule(VENDORS_KEY, get_vendors, then=prefetch_customers)
+
+    def start_catalog_sync(self) -> None:
+        """
+        bring the local catalog mirror up to date behind everything else,
+        lookups use what it had from the last run meanwhile
+        """
+        if not CATALOG_MIRROR:
+            return
+
+        def sync() -> None:
+            import actions
+            from catalog import sync_catalog
+            from throttle import Priority, priority
+
+            try:
+                mirror = actions.use_catalog(CATALOG_PATH)
+                with priority(Priority.BULK):
+                    sync_catalog(mirror)
+            except Exception as e:
+                logger.warning(f"catalog sync failed: {e}")
+
+        threading.Thread(target=sync, name="catalog-sync", daemon=True).start()
+
+    def wait_for_startup(self) -> None:
+        """
+        Waits on the background setup for no longer than the calling
+        thread's deadline. A setup that failed, say on a passing OAuth
+        error, is run again here rather than failing every screen after it.
+        """
+        if not self.startup_done.wait(timeout=remaining()):
+            raise DeadlineExceeded("ran out of time waiting for startup")
+        with self._startup_retry:
+            if not self.startup_error:
+                return
+            logger.info(f"retrying startup after: {self.startup_error}")
+            try:
+                self._setup()
+            except Exception as e:
+                logger.error(f"startup failed again: {e}")
+                self.startup_error = e
+                raise
+            self.startup_error = None
+        self._after_setup()
+
+    def vendor_accounts(self, vendor: Vendor) -> list[VendorCustomer]:
+        """every customer account with `vendor`, through the prefetcher's cache"""
+        from actions import get_sca_customers_w_vendor_accounts
+
+        entities = self.prefetcher.get(
+            customers_key(vendor),
+            partial(get_sca_customers_w_vendor_accounts, vendor),
+        )
+        return [account for e in entities for account in e.entity_accounts]
+
+    def persist_edits(self, edits: list[PendingEdit]) -> dict:
+        from actions import persist_pricing_edits
+
+        self.wait_for_startup()
+        return persist_pricing_edits(edits)
+
     def run(self):
-        self.main_loop.run()
+        try:
+            self.main_loop.run()
+        finally:
+            self.sync_cancel.set()
+            self.prefetcher.shutdown()
+            self.write_behind.stop()
+
+    def call_soon(self, func: Callable, *args) -> None:
+        """thread-safe: schedule func to run on the UI thread"""
+        self._ui_calls.put((func, args))
+
+    def _drain_ui_calls(self, loop: urwid.MainLoop, *args) -> None:
+        while True:
+            try:
+                func, args = self._ui_calls.get_nowait()
+            except Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"ui callback {func} failed: {e}")
+        loop.set_alarm_in(UI_POLL_INTERVAL, self._drain_ui_calls)
+
+    def show_sync_state(self, key: EditKey, state: SyncState) -> None:
+        for row in self.sync_rows.get(key, ()):
+            row.set_sync_state(state)
 
     def top_menu(self, button=None) -> VimScrollableListBox | None:
+        from actions import get_vendors
+
+        self.wait_for_startup()
         logger.info("Getting Vendors ...")
         menu_widget = self.menu(
             "Choose a vendor:",
             self.vendor_chosen,
-            choices=get_vendors(),
+            choices=self.prefetcher.get(VENDORS_KEY, get_vendors),
             label_attrs=["name"],
         )
         logger.info("Done.")
@@ -132,6 +398,7 @@ class Application:
             return menu_widget
 
     def go_back(self, *args, button=None) -> "Application":
+        self.perf_panel_open = False
         self.frame.set_focus("body")
         try:
             header, self.frame.body = self.NAV_STACK.pop()
@@ -158,6 +425,207 @@ class Application:
                 self.frame.focus_position = "body"
         elif key == "backspace":
             self.go_back()
+        elif key == "ctrl p":
+            self.toggle_performance_panel()
+        elif key == "ctrl t":
+            self.export_trace()
+        elif key == "f5":
+            self.sync_all_pricing()
+        elif key == "f9":
+            self.profiler.arm()
+            self.flash("flash_good", "profiling the next action")
+
+    def sync_all_pricing(self) -> None:
+        """fetch every account's pricing for the chosen vendor in the background"""
+        vendor = self.vendor
+        if vendor is None:
+            self.flash("flash_bad", "choose a vendor to sync its pricing")
+            return
+        if self.pricing_sync and self.pricing_sync.is_alive():
+            self.flash("flash_bad", "a pricing sync is already running")
+            return
+
+        def sync() -> None:
+            from bulk_sync import sync_pricing
+
+            try:
+                self.wait_for_startup()
+                accounts = self.vendor_accounts(vendor)
+                result = sync_pricing(accounts, cancel=self.sync_cancel)
+            except Exception as e:
+                logger.error(f"pricing sync for {vendor.name} failed: {e}")
+                self.call_soon(self.flash, "flash_bad", f"pricing sync failed - {e}")
+            else:
+                msg = f"{vendor.name} pricing synced: {result}"
+                attr = "flash_bad" if result.failed else "flash_good"
+                self.call_soon(self.flash, attr, msg)
+
+        self.flash("flash_good", f"syncing all {vendor.name} pricing")
+        self.pricing_sync = threading.Thread(
+            target=sync, name="pricing-sync", daemon=True
+        )
+        self.pricing_sync.start()
+
+    def circuit_changed(self, host: str, state: CircuitState) -> None:
+        from circuit import CircuitState
+
+        match state:
+            case CircuitState.OPEN:
+                self.flash(
+                    "flash_bad", f"{host} is not responding, calls will fail fast"
+                )
+            case CircuitState.CLOSED:
+                self.flash("flash_good", f"{host} is responding again")
+
+    def flash(self, attr: str, msg: str) -> None:
+        self.frame.header = urwid.Pile([urwid.Text((attr, msg)), self.frame.header])
+
+    def deadline_exceeded(self, e: DeadlineExceeded) -> None:
+        logger.error(f"action cut off: {e}")
+        self.flash("flash_bad", f"{e}, the action was stopped")
+
+    def profile_written(self, path: Path) -> None:
+        self.flash("flash_good", f"profile written to {path}")
+
+    def export_trace(self) -> None:
+        """write recorded spans out as a Chrome trace"""
+        try:
+            path = TRACER.export_chrome_trace(TRACE_DIR)
+        except OSError as e:
+            logger.error(f"unable to export trace: {e}")
+            self.flash("flash_bad", f"trace export failed - {e}")
+        else:
+            logger.info(f"trace written to {path}")
+            self.flash("flash_good", f"trace written to {path}")
+
+    def toggle_performance_panel(self) -> None:
+        """hidden diagnostics screen with backend call timings"""
+        if self.perf_panel_open:
+            self.perf_panel_open = False
+            self.go_back()
+            return
+        self.perf_panel_open = True
+        self.NAV_STACK.append((self.frame.header, self.frame.body))
+        self.frame.header = urwid.AttrMap(
+            urwid.Text("Backend performance (ctrl-p to close)"),
+            Palette.HEADER.value[0],
+        )
+        self.frame.body = urwid.Padding(self.performance_panel(), left=2, right=2)
+        self.frame.set_focus("body")
+
+    @staticmethod
+    def performance_panel() -> VimScrollableListBox:
+        def row(cells: list[tuple[int | None, str]], attr: str = "normal"):
+            columns = []
+            for width, text in cells:
+                cell = urwid.Text((attr, text), wrap="ellipsis")
+                columns.append(("fixed", width, cell) if width else ("weight", 1, cell))
+            return urwid.Columns(columns, dividechars=2)
+
+        ms = lambda seconds: f"{seconds * 1000:,.0f}ms"
+        body: list[urwid.Widget] = [
+            urwid.Divider(),
+            urwid.Text(("header", "Per endpoint (rolling window)")),
+            row(
+                [
+                    (None, "endpoint"),
+                    (5, "calls"),
+                    (4, "errs"),
+                    (9, "p50"),
+                    (9, "p95"),
+                    (9, "parse"),
+                    (10, "avg size"),
+                    (10, "on wire"),
+                ],
+                "selector",
+            ),
+        ]
+        for stat in METRICS.endpoint_stats():
+            body.append(
+                row(
+                    [
+                        (None, f"{stat.method} {stat.route}"),
+                        (5, str(stat.calls)),
+                        (4, str(stat.errors)),
+                        (9, ms(stat.p50)),
+                        (9, ms(stat.p95)),
+                        (9, ms(stat.parse_p50) if stat.parse_p50 is not None else "-"),
+                        (10, f"{stat.mean_bytes / 1024:,.1f}KiB"),
+                        (10, f"{stat.mean_wire_bytes / 1024:,.1f}KiB"),
+                    ]
+                )
+            )
+        body += [
+            urwid.Divider(),
+            urwid.Text(("header", "Queue wait by priority")),
+            row(
+                [(None, "priority"), (5, "calls"), (9, "p50"), (9, "p95"), (9, "max")],
+                "selector",
+            ),
+        ]
+        for stat in METRICS.queue_wait_stats():
+            body.append(
+                row(
+                    [
+                        (None, stat.priority),
+                        (5, str(stat.calls)),
+                        (9, ms(stat.p50)),
+                        (9, ms(stat.p95)),
+                        (9, ms(stat.max)),
+                    ]
+                )
+            )
+        body += [
+            urwid.Divider(),
+            urwid.Text(("header", "Caching and coalescing")),
+            row(
+                [(None, "fetch"), (7, "hits"), (7, "misses"), (9, "coalesced")],
+                "selector",
+            ),
+        ]
+        for stat in METRICS.cache_stats():
+            body.append(
+                row(
+                    [
+                        (None, stat.name),
+                        (7, str(stat.hits)),
+                        (7, str(stat.misses)),
+                        (9, str(stat.coalesced)),
+                    ]
+                )
+            )
+        body += [
+            urwid.Divider(),
+            urwid.Text(("header", "Slowest recent calls")),
+            row(
+                [
+                    (None, "endpoint"),
+                    (6, "status"),
+                    (8, "dns"),
+                    (8, "connect"),
+                    (8, "ttfb"),
+                    (9, "total"),
+                    (7, "retries"),
+                ],
+                "selector",
+            ),
+        ]
+        for call in METRICS.slowest():
+            body.append(
+                row(
+                    [
+                        (None, f"{call.method} {call.route}"),
+                        (6, str(call.status or "ERR")),
+                        (8, ms(call.dns)),
+                        (8, ms(call.connect)),
+                        (8, ms(call.ttfb)),
+                        (9, ms(call.total)),
+                        (7, str(call.retries)),
+                    ],
+                    "norm_red" if not call.status or call.status >= 400 else "normal",
+                )
+            )
+        return VimScrollableListBox(urwid.SimpleFocusListWalker(body))
 
     def welcome_screen(self) -> urwid.Filler:
         msg = f"""Welcome to the SCA Data Administration Program \n\n
@@ -206,21 +674,29 @@ class Application:
         self.frame.header = urwid.AttrMap(urwid.Text(title), Palette.HEADER.value[0])
         body = [urwid.Divider()]
         if as_table:
+            from schemas import Attr, Price, edit_key
+
             # body.append(TableHeader([" "] + headers))
-            pass
-        for c in choices:
-            c: Annotated[str, Any]
-            if label_attrs:
-                button = urwid.Button(self.extract_attr(c, label_attrs))
-            elif as_table:
-                button = TableRow(c, displayable_elements=headers)
-            else:
-                button = urwid.Button(c)
-            urwid.connect_signal(button, "click", callback, user_args=(c,))
-            if as_table:
-                body.append(button)
-            else:
-                body.append(urwid.AttrMap(button, attr_map=None, focus_map="reversed"))
+        with span("menu", title=title):
+            for c in choices:
+                c: Annotated[str, Any]
+                if label_attrs:
+                    button = urwid.Button(self.extract_attr(c, label_attrs))
+                elif as_table:
+                    button = TableRow(c, displayable_elements=headers)
+                    if isinstance(c, Attr | Price):
+                        key = edit_key(c)
+                        button.set_sync_state(self.write_behind.state(*key))
+                        self.sync_rows[key].add(button)
+                else:
+                    button = urwid.Button(c)
+                urwid.connect_signal(button, "click", callback, user_args=(c,))
+                if as_table:
+                    body.append(button)
+                else:
+                    body.append(
+                        urwid.AttrMap(button, attr_map=None, focus_map="reversed")
+                    )
         return VimScrollableListBox(urwid.SimpleFocusListWalker(body))
 
     def show_new_screen(self, *args) -> None:
@@ -231,7 +707,8 @@ class Application:
         else:
             self.NAV_STACK.append((self.frame.header, self.frame.body))
         try:
-            new_screen = self.next_screen()
+            with span("build screen"):
+                new_screen = self.next_screen()
         except Exception as e:
             import traceback as tb
 
@@ -257,48 +734,55 @@ class Application:
             self.next_screen = next_
             self.show_new_screen()
 
-        for element in elements:
-            match element:
-                case Route():
-                    route = element
-                    button = urwid.Button(route.choice_title)
-                    if route.callable_choices:
-                        callback_ = partial(
-                            self.menu,
-                            route.callable_title,
-                            route.callable_,
-                            route.callable_choices,
-                        )
-                        if route.callable_label_attrs:
-                            callback_ = partial(callback_, route.callable_label_attrs)
-                        elif route.callable_as_table:
+        with span("routing_menu", title=title, elements=len(elements)):
+            for element in elements:
+                match element:
+                    case Route():
+                        route = element
+                        button = urwid.Button(route.choice_title)
+                        if route.callable_choices:
                             callback_ = partial(
-                                callback_, None, True, route.callable_headers
+                                self.menu,
+                                route.callable_title,
+                                route.callable_,
+                                route.callable_choices,
                             )
-                        next_screen = partial(menu_callback, callback_)
-                    else:
-                        next_screen = partial(menu_callback, route.callable_)
-                    urwid.connect_signal(button, "click", next_screen)
-                    body.append(urwid.AttrMap(button, None, focus_map=focus_map))
-                case urwid.Widget():
-                    body.append(element)
+                            if route.callable_label_attrs:
+                                callback_ = partial(
+                                    callback_, route.callable_label_attrs
+                                )
+                            elif route.callable_as_table:
+                                callback_ = partial(
+                                    callback_, None, True, route.callable_headers
+                                )
+                            next_screen = partial(menu_callback, callback_)
+                        else:
+                            next_screen = partial(menu_callback, route.callable_)
+                        urwid.connect_signal(button, "click", next_screen)
+                        body.append(urwid.AttrMap(button, None, focus_map=focus_map))
+                    case urwid.Widget():
+                        body.append(element)
         return VimScrollableListBox(urwid.SimpleFocusListWalker(body))
 
     # Menu Path Construction Begins
     def vendor_chosen(self, vendor: Vendor, button) -> None:
+        from actions import get_sca_customers_w_vendor_accounts
+        from vendor_handlers import HANDLERS
+
         if not vendor.id in HANDLERS:
             msg = f"{vendor.name} has not been implemented yet"
             text = urwid.Text(("flash_bad", msg))
             self.frame.header = urwid.Pile([text, self.frame.header])
             logger.warning(msg)
         else:
+            self.vendor = vendor
             new_title = f"Choose the SCA Customer for {vendor.name}:"
-            entities = CACHE.get(vendor.id, None)
-            if not entities:
-                logger.info(f"Getting customers for {vendor.name}")
-                entities = get_sca_customers_w_vendor_accounts(vendor)
-                logger.info("Done.")
-                CACHE[vendor.id] = entities
+            logger.info(f"Getting customers for {vendor.name}")
+            entities = self.prefetcher.get(
+                customers_key(vendor),
+                partial(get_sca_customers_w_vendor_accounts, vendor),
+            )
+            logger.info("Done.")
 
             self.next_screen = partial(
                 self.menu,
@@ -324,6 +808,7 @@ class Application:
         self.show_new_screen()
 
     def product_selected(self, product: ProductPriceBasic) -> Callable:
+        from schemas import Price
 
         choices: list[Attr | Price] = list(product.attrs.values())
         choices.append(Price(id=product.id, value=product.price))
@@ -342,6 +827,10 @@ class Application:
 
     def customer_account_chosen(self, chosen_customer: VendorCustomer, button) -> None:
         """Delegate from here to the vendor-specific handlers"""
+        from vendor_handlers import HANDLERS
+
+        # the user is past the menus the prefetch was warming
+        self.prefetcher.cancel_pending()
         self.vendor_customer = chosen_customer
         if Handler := HANDLERS.get(chosen_customer.vendor.id):
             self.handler = Handler(self)
@@ -349,6 +838,9 @@ class Application:
             self.handler.app.show_new_screen()
 
     def edit_last_column(self, listbox: VimScrollableListBox, **kwargs):
+        from actions import LOCAL_STORAGE
+        from schemas import Attr, Price
+
         focus_widget: TableRow = listbox.focus
         focus_position: int = listbox.focus_position
 
@@ -370,10 +862,9 @@ class Application:
                 prior_focus: urwid.Button = prior_screen_list.focus.base_widget
                 # prior_focus.set_label()
                 passed_in_attr = kwargs.get("attr")
+                vendor_id = self.vendor_customer.vendor.id
                 match passed_in_attr:
                     case Attr():
-                        # TODO IMPLEMENT LOGIC FOR AN API CALL TO PERSIST THE CHANGE
-                        # IN THE BACKEND
                         attr_modified: Attr = passed_in_attr
                         attr_modified.value = new_text
                         customers_pricing = LOCAL_STORAGE["pricing_by_customer"][
@@ -386,9 +877,10 @@ class Application:
                                 if attr["id"] == attr_modified.id:
                                     attr["value"] = new_text
                                     break
+                        self.write_behind.submit(
+                            EditKind.ATTR, attr_modified.id, vendor_id, new_text
+                        )
                     case Price():
-                        # TODO IMPLEMENT LOGIC FOR AN API CALL TO PERSIST THE CHANGE
-                        # IN THE BACKEND
                         attr_modified: Price = passed_in_attr
                         attr_modified.value = int(new_text)
                         customers_pricing = LOCAL_STORAGE["pricing_by_customer"][
@@ -398,6 +890,12 @@ class Application:
                             if price_id == attr_modified.id:
                                 product["price"] = attr_modified.value * 100
                                 break
+                        self.write_behind.submit(
+                            EditKind.PRICE,
+                            attr_modified.id,
+                            vendor_id,
+                            attr_modified.value,
+                        )
 
                 prior_focus._invalidate()
                 self.edit_mode = False
@@ -434,5 +932,16 @@ class Application:
 
 
 if __name__ == "__main__":
-    app = Application()
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--offline",
+        type=Path,
+        nargs="?",
+        const=SNAPSHOT_PATH,
+        help=f"browse a pricing snapshot instead of the backend ({SNAPSHOT_PATH})",
+    )
+    args = parser.parse_args()
+    app = Application(offline=args.offline and args.offline.resolve())
     app.run()
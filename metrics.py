@@ -0,0 +1,198 @@
+import re
+import time
+import threading
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import Iterator
+from urllib.parse import urlsplit
+
+NUMERIC_SEGMENT = re.compile(r"^\d+$")
+
+
+def route_template(url: str) -> str:
+    """
+    Groups calls by endpoint, dropping the query and numeric ids:
+    /v2/vendors/adp/vendor-customers/123?page_number=0
+    -> /v2/vendors/adp/vendor-customers/{id}
+    """
+    path = urlsplit(url).path
+    return "/".join(
+        "{id}" if NUMERIC_SEGMENT.match(segment) else segment
+        for segment in path.split("/")
+    )
+
+
+@dataclass(slots=True)
+class CallRecord:
+    method: str
+    route: str
+    status: int | None
+    bytes: int
+    # as transferred, before decompression
+    wire_bytes: int
+    dns: float
+    connect: float
+    ttfb: float
+    total: float
+    retries: int
+    finished_at: float
+
+
+@dataclass(slots=True)
+class EndpointStats:
+    method: str
+    route: str
+    calls: int
+    errors: int
+    p50: float
+    p95: float
+    parse_p50: float | None
+    mean_bytes: int
+    mean_wire_bytes: int
+
+
+@dataclass(slots=True)
+class QueueWaitStats:
+    priority: str
+    calls: int
+    p50: float
+    p95: float
+    max: float
+
+
+@dataclass(slots=True)
+class CacheStats:
+    name: str
+    hits: int
+    misses: int
+    coalesced: int
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """nearest-rank percentile of an unsorted sample"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class RequestMetrics:
+    """
+    Rolling per-endpoint timings of backend calls, kept in memory for the
+    performance panel. Parse timings are recorded separately so backend
+    latency can be told apart from client-side work on the response.
+    """
+
+    def __init__(self, window: int = 200, recent: int = 500) -> None:
+        self.window = window
+        self._calls: defaultdict[tuple[str, str], deque[CallRecord]] = defaultdict(
+            partial(deque, maxlen=window)
+        )
+        self._parse: defaultdict[str, deque[float]] = defaultdict(
+            partial(deque, maxlen=window)
+        )
+        self._recent: deque[CallRecord] = deque(maxlen=recent)
+        self._queue_wait: defaultdict[str, deque[float]] = defaultdict(
+            partial(deque, maxlen=window)
+        )
+        self._cache: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def record(self, call: CallRecord) -> None:
+        with self._lock:
+            self._calls[(call.method, call.route)].append(call)
+            self._recent.append(call)
+
+    def record_parse(self, route: str, seconds: float) -> None:
+        with self._lock:
+            self._parse[route].append(seconds)
+
+    def record_queue_wait(self, priority: str, seconds: float) -> None:
+        """time a call spent waiting for the client to let it go out"""
+        with self._lock:
+            self._queue_wait[priority].append(seconds)
+
+    def count_cache(self, name: str, outcome: str) -> None:
+        """a "hit", "miss" or "coalesced" fetch of `name`"""
+        with self._lock:
+            self._cache[name][outcome] += 1
+
+    @contextmanager
+    def parsing(self, url: str) -> Iterator[None]:
+        """time client-side handling of a response from `url`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_parse(route_template(url), time.perf_counter() - start)
+
+    def endpoint_stats(self) -> list[EndpointStats]:
+        with self._lock:
+            calls = {key: list(records) for key, records in self._calls.items()}
+            parse = {route: list(times) for route, times in self._parse.items()}
+        stats = []
+        for (method, route), records in calls.items():
+            totals = [c.total for c in records]
+            parse_times = parse.get(route)
+            stats.append(
+                EndpointStats(
+                    method=method,
+                    route=route,
+                    calls=len(records),
+                    errors=sum(1 for c in records if not c.status or c.status >= 400),
+                    p50=percentile(totals, 50),
+                    p95=percentile(totals, 95),
+                    parse_p50=percentile(parse_times, 50) if parse_times else None,
+                    mean_bytes=sum(c.bytes for c in records) // len(records),
+                    mean_wire_bytes=sum(c.wire_bytes for c in records) // len(records),
+                )
+            )
+        stats.sort(key=lambda s: s.p95, reverse=True)
+        return stats
+
+    def queue_wait_stats(self) -> list[QueueWaitStats]:
+        with self._lock:
+            waits = {name: list(times) for name, times in self._queue_wait.items()}
+        return [
+            QueueWaitStats(
+                priority=name,
+                calls=len(times),
+                p50=percentile(times, 50),
+                p95=percentile(times, 95),
+                max=max(times),
+            )
+            for name, times in sorted(waits.items())
+        ]
+
+    def cache_stats(self) -> list[CacheStats]:
+        with self._lock:
+            counts = {name: counter.copy() for name, counter in self._cache.items()}
+        return [
+            CacheStats(
+                name=name,
+                hits=counter["hit"],
+                misses=counter["miss"],
+                coalesced=counter["coalesced"],
+            )
+            for name, counter in sorted(counts.items())
+        ]
+
+    def slowest(self, n: int = 10) -> list[CallRecord]:
+        """slowest of the most recent calls, across all endpoints"""
+        with self._lock:
+            recent = list(self._recent)
+        return sorted(recent, key=lambda c: c.total, reverse=True)[:n]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._calls.clear()
+            self._parse.clear()
+            self._recent.clear()
+            self._queue_wait.clear()
+            self._cache.clear()
+
+
+METRICS = RequestMetrics()
@@ -1,9 +1,38 @@
-from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import StrEnum, auto, Enum
-from pydantic import BaseModel, ConfigDict, Field
-from typing import Optional, Callable, Iterable, Literal
+from typing import TYPE_CHECKING, Any, Optional, Callable, Iterable, Literal
 from urwid import Columns, Text, AttrMap, Widget, Align
+from write_behind import SyncState
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+
+def __getattr__(name: str) -> Any:
+    """
+    The pydantic models live in schemas and are only built on first use,
+    so importing models for the UI does not pay for pydantic at startup.
+    """
+    if name.startswith("__"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import schemas
+
+    try:
+        value = getattr(schemas, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    globals()[name] = value
+    return value
+
+
+def _row_schemas() -> tuple[type, ...]:
+    """the schema classes a TableRow matches on, looked up once"""
+    try:
+        return _ROW_SCHEMAS
+    except NameError:
+        pass
+    globals()["_ROW_SCHEMAS"] = tuple(map(__getattr__, ("Rating", "Attr", "Price")))
+    return _ROW_SCHEMAS
 
 
 class Palette(Enum):
@@ -15,9 +44,10 @@ class Palette(Enum):
     NORMAL = ("normal", "white", "")
     NORM_RED = ("norm_red", "dark red", "")
     NORM_GREEN = ("norm_green", "dark green", "")
+    NORM_YELLOW = ("norm_yellow", "yellow", "")
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ADPCustomer:
     adp_alias: str
     id: int
@@ -29,13 +59,24 @@ class SCACustomer:
     adp_objs: list[ADPCustomer]
 
 
-@dataclass
+_INTERNED_VENDORS: dict[tuple[str, str], "Vendor"] = {}
+
+
+@dataclass(slots=True, frozen=True)
 class Vendor:
     id: str
     name: str
 
+    @classmethod
+    def interned(cls, id: str, name: str) -> "Vendor":
+        """one shared instance per vendor for the whole session"""
+        key = (id, name)
+        if not (vendor := _INTERNED_VENDORS.get(key)):
+            vendor = _INTERNED_VENDORS.setdefault(key, cls(id, name))
+        return vendor
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class VendorCustomer:
     id: int
     vendor: Vendor
@@ -47,12 +88,12 @@ class VendorCustomers:
     entites: list[VendorCustomer]
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SCACustomerV2:
     sca_id: int
     sca_name: str
     vendor: Vendor
-    entity_accounts: list[VendorCustomer]
+    entity_accounts: tuple[VendorCustomer, ...]
 
 
 class Stage(StrEnum):
@@ -68,272 +109,18 @@ class ADPActions(StrEnum):
     # REVIEW_RATINGS = "Review Ratings"
     PRODUCT = "Product Strategy"
     PRICE_CHECK = "Price Check"
+    ANALYTICS = "Pricing Analytics"
 
 
-class VendorProductAttrs(BaseModel):
-    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
-    vendor_product_identifier: str
-    vendor_product_description: str
-
-
-class VendorProduct(BaseModel):
-    id: int
-    attributes: VendorProductAttrs
-
-
-class VendorProductAttrAttrs(BaseModel):
-    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
-    attr: str
-    type: str
-    value: str
-
-
-class VendorProductAttr(BaseModel):
-    id: int
-    attributes: VendorProductAttrAttrs
-
-
-class CoilAttrs(BaseModel):
-    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
-    category: str
-    model_number: str = Field(alias="model-number")
-    mpg: str
-    series: str
-    tonnage: int
-    pallet_qty: int = Field(alias="pallet-qty")
-    width: float
-    depth: Optional[float] = None
-    length: Optional[float] = None
-    height: float
-    weight: int
-    metering: str
-    cabinet: str
-    zero_discount_price: int = Field(alias="zero-discount-price")
-    material_group_discount: Optional[float] = Field(
-        default=None, alias="material-group-discount"
-    )
-    material_group_net_price: Optional[float] = Field(
-        default=None, alias="material-group-net-price"
-    )
-    snp_discount: Optional[float] = Field(default=None, alias="snp-discount")
-    snp_price: Optional[float] = Field(default=None, alias="snp-price")
-    net_price: Optional[float] = Field(default=None, alias="net-price")
-    effective_date: datetime = Field(default=None, alias="effective-date")
-    last_file_gen: datetime = Field(default=None, alias="last-file-gen")
-    stage: str
-
-
-class Attr(BaseModel):
-    id: int
-    attr: str
-    type_: str
-    value: str
-
-    def model_post_init(self, __context):
-        self.attr = self.attr.replace("_", " ").title()
-        return super().model_post_init(__context)
-
-
-class Price(BaseModel):
-    id: int
-    attr: str = "Price"
-    value: int
-
-
-class ProductPriceBasic(BaseModel):
-    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
-    id: int
-    model_number: str = Field(alias="model-number")
-    description: Optional[str] = ""
-    price: int
-    effective_date: datetime = Field(default=None, alias="effective-date")
-    attrs: dict[str, Attr]
-
-    def model_post_init(self, __context) -> None:
-        self.price = int(self.price / 100)
-        self.effective_date: str = str(self.effective_date)
-        return super().model_post_init(__context)
-
-
-class CoilAttrsV2(BaseModel):
-    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
-    category: str
-    model_number: str = Field(alias="model-number")
-    mpg: str
-    series: str
-    tonnage: int
-    pallet_qty: int = Field(alias="pallet-qty")
-    width: float
-    depth: Optional[float] = None
-    length: Optional[float] = None
-    height: float
-    weight: int
-    metering: str
-    cabinet: str
-    price: int
-    effective_date: datetime = Field(default=None, alias="effective-date")
-
-    def model_post_init(self, __context):
-        self.price = int(self.price / 100)
-        self.effective_date: str = str(self.effective_date)
-        return super().model_post_init(__context)
-
-
-class Coil(BaseModel):
-    id: int
-    attributes: CoilAttrs
-
-
-class Coils(BaseModel):
-    data: list[Coil]
-
-
-class AHAttrs(BaseModel):
-    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
-    category: str
-    model_number: str = Field(alias="model-number")
-    mpg: str
-    series: str
-    tonnage: int
-    pallet_qty: Optional[int] = Field(default=None, alias="pallet-qty")
-    min_qty: Optional[int] = Field(default=None, alias="min-qty")
-    width: float
-    depth: float
-    height: float
-    weight: int
-    metering: str
-    motor: str
-    heat: str
-    zero_discount_price: int = Field(alias="zero-discount-price")
-    material_group_discount: Optional[float] = Field(
-        default=None, alias="material-group-discount"
-    )
-    material_group_net_price: Optional[float] = Field(
-        default=None, alias="material-group-net-price"
-    )
-    snp_discount: Optional[float] = Field(default=None, alias="snp-discount")
-    snp_price: Optional[float] = Field(default=None, alias="snp-price")
-    net_price: Optional[float] = Field(default=None, alias="net-price")
-    effective_date: datetime = Field(default=None, alias="effective-date")
-    last_file_gen: datetime = Field(default=None, alias="last-file-gen")
-    stage: str
-
-
-class AHAttrsV2(BaseModel):
-    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
-    category: str
-    model_number: str = Field(alias="model-number")
-    mpg: str
-    series: str
-    tonnage: int
-    pallet_qty: Optional[int] = Field(default=None, alias="pallet-qty")
-    min_qty: Optional[int] = Field(default=None, alias="min-qty")
-    width: float
-    depth: float
-    height: float
-    weight: int
-    metering: str
-    motor: str
-    heat: str
-    price: int
-    effective_date: datetime = Field(default=None, alias="effective-date")
-
-    def model_post_init(self, __context):
-        self.price = int(self.price / 100)
-        self.effective_date: str = str(self.effective_date)
-        return super().model_post_init(__context)
-
-
-class AH(BaseModel):
-    id: int
-    attributes: AHAttrs
-
-
-class AHV2(BaseModel):
-    id: int
-    attributes: AHAttrsV2
-
-
-class AHs(BaseModel):
-    data: list[AH]
-
-
-class AHsV2(BaseModel):
-    data: list[AHV2]
-
-
-class RatingAttrs(BaseModel):
-    model_config = ConfigDict(populate_by_name=True, protected_namespaces=())
-    ahrinumber: Optional[str] = None
-    outdoor_model: Optional[str] = Field(default=None, alias="outdoor-model")
-    oem_name: Optional[str] = Field(default=None, alias="oem-name")
-    oem_name_1: Optional[str] = Field(default=None, alias="oem-name-1")
-    indoor_model: Optional[str] = Field(default=None, alias="indoor-model")
-    furnace_model: Optional[str] = None
-    oem_name_2: Optional[str] = Field(default=None, alias="OEM Name")
-    m1: Optional[str] = None
-    status: Optional[str] = None
-    oem_series: Optional[str] = Field(default=None, alias="OEM Series")
-    adp_series: Optional[str] = Field(default=None, alias="ADP Series")
-    model_number: Optional[str] = Field(default=None, alias="Model Number")
-    coil_model_number: Optional[str] = Field(default=None, alias="Coil Model Number")
-    furnace_model_number: Optional[str] = Field(
-        default=None, alias="Furnace Model Number"
-    )
-    seer: Optional[float] = None
-    eer: Optional[float] = None
-    capacity: Optional[float] = None
-    four_seven_o: Optional[float] = Field(default=None, alias="47o")
-    one_seven_o: Optional[float] = Field(default=None, alias="17o")
-    hspf: Optional[float] = None
-    seer2: Optional[float] = None
-    eer2: Optional[float] = None
-    capacity2: Optional[float] = None
-    four_seven_o2: Optional[float] = Field(default=None, alias="47o2")
-    one_seven_o2: Optional[float] = Field(default=None, alias="17o2")
-    hspf2: Optional[float] = None
-    ahri_ref_number: Optional[int] = Field(default=None, alias="AHRI Ref Number")
-    region: Optional[str] = None
-    effective_date: str = Field(alias="effective-date")
-    seer2_as_submitted: Optional[float] = None
-    eer95f2_as_submitted: Optional[float] = None
-    capacity2_as_submitted: Optional[float] = None
-    hspf2_as_submitted: Optional[float] = None
-
-
-class Rel(BaseModel):
-    id: int
-    type: str
-
-
-class RelObj(BaseModel):
-    data: Rel
-
-
-class RatingRels(BaseModel):
-    model_config = ConfigDict(populate_by_name=True)
-    adp_customers: RelObj = Field(alias="adp-customers")
-
-
-class Rating(BaseModel):
-    id: int
-    attributes: RatingAttrs
-    relationships: RatingRels
-
-
-class Ratings(BaseModel):
-    data: list[Rating]
-
-
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Route:
     callable_: Callable
     choice_title: str
     callable_title: Optional[str] = None
-    callable_choices: Iterable = None
-    callable_label_attrs: list[str] = None
+    callable_choices: Iterable = field(default=None, hash=False)
+    callable_label_attrs: list[str] = field(default=None, hash=False)
     callable_as_table: bool = (False,)
-    callable_headers: list[str] = None
+    callable_headers: list[str] = field(default=None, hash=False)
 
 
 class TableHeader(Columns):
@@ -347,16 +134,24 @@ class TableHeader(Columns):
 class TableRow(Columns):
     KeypressSize = tuple[()] | tuple[int] | tuple[int, int]
     signals = ["click"]
+    SYNC_MARKERS = {
+        SyncState.PENDING: ("norm_yellow", " ~"),
+        SyncState.FLUSHED: ("norm_green", " \N{CHECK MARK}"),
+        SyncState.FAILED: ("norm_red", " !"),
+    }
 
     def __init__(
         self,
-        contents: BaseModel | str,
+        contents: "BaseModel | str | tuple[str, ...]",
         selector_text=">",
         displayable_elements: tuple[str] = None,
     ) -> None:
         self.selector_text = selector_text
         self.displayable = displayable_elements
         self.selector = Text(selector_text, align="left")
+        self.sync_state: SyncState | None = None
+        Rating, Attr, Price = _row_schemas()
+
         match contents:
             case Rating():
                 attrs = contents.attributes
@@ -365,6 +160,8 @@ class TableRow(Columns):
                 cells = self._extract_displayable(contents=contents)
             case str():
                 cells = [Text(c, align="left") for c in contents]
+            case tuple() | list():
+                cells = [self.selective_coloring(str(c), "left") for c in contents]
         cells = [("weight", 10, cell) for cell in cells]
         cells.insert(0, ("fixed", 5, AttrMap(self.selector, "normal", "selector")))
         super().__init__(cells, dividechars=3)
@@ -372,6 +169,11 @@ class TableRow(Columns):
     def selectable(self) -> bool:
         return True
 
+    def set_sync_state(self, state: SyncState | None) -> None:
+        """shows whether an edit on this row is pending, flushed or failed"""
+        self.sync_state = state
+        self._invalidate()
+
     def _extract_displayable(self, contents) -> list[Widget]:
         if self.displayable:
             attrs_treated = [
@@ -423,10 +225,11 @@ class TableRow(Columns):
         return Text((attr_map, text), align=align)
 
     def render(self, size, focus=False):
+        marker = [self.SYNC_MARKERS[self.sync_state]] if self.sync_state else []
         if focus:
-            self.selector.set_text(("selector", self.selector_text))
+            self.selector.set_text([("selector", self.selector_text), *marker])
         else:
-            self.selector.set_text(("normal", " "))
+            self.selector.set_text([("normal", " "), *marker])
         for cell in self.contents:
             cell: tuple[Widget, tuple]
             widget, options = cell
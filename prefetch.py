@@ -0,0 +1,156 @@
+import heapq
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Any, Callable, Hashable
+from throttle import Priority, Ticket, scheduled
+from deadlines import DeadlineExceeded, remaining
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(order=True)
+class PrefetchTask:
+    priority: int
+    seq: int
+    key: Hashable = field(compare=False)
+    fetch: Callable[[], Any] = field(compare=False)
+    then: Callable[[Any], None] | None = field(compare=False, default=None)
+    future: Future = field(compare=False, default_factory=Future)
+    cancelled: bool = field(compare=False, default=False)
+    ticket: Ticket = field(compare=False, default=None)
+
+
+class Prefetcher:
+    """
+    Fetches data the user is likely to ask for next on background workers
+    and stores it in the shared `cache` under the task's key.
+
+    Lower priority values run first. A task the user asks for with `get`
+    while it is still queued is run right away on the calling thread, and
+    navigation can `cancel_pending` work that is no longer useful.
+    Work that has already started is left to finish, its result is cached.
+    """
+
+    def __init__(self, cache: dict, workers: int = 2) -> None:
+        self.cache = cache
+        self._queue: list[PrefetchTask] = []
+        self._tasks: dict[Hashable, PrefetchTask] = {}
+        self._seq = count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._workers = [
+            threading.Thread(target=self._run, name=f"prefetch-{n}", daemon=True)
+            for n in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def schedule(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Any],
+        priority: int = 0,
+        then: Callable[[Any], None] = None,
+    ) -> None:
+        """queue `fetch` unless its result is cached or already on the way"""
+        with self._cond:
+            if self._closed or key in self.cache or key in self._tasks:
+                return
+            task = PrefetchTask(priority, next(self._seq), key, fetch, then)
+            self._tasks[key] = task
+            heapq.heappush(self._queue, task)
+            self._cond.notify()
+
+    def cancel_pending(self, keep: tuple[Hashable, ...] = ()) -> int:
+        """drop queued tasks the user has navigated away from"""
+        cancelled = 0
+        with self._cond:
+            for key, task in list(self._tasks.items()):
+                if key in keep or task.future.running() or task.future.done():
+                    continue
+                task.cancelled = True
+                task.future.cancel()
+                del self._tasks[key]
+                cancelled += 1
+        if cancelled:
+            logger.info(f"cancelled {cancelled} prefetch tasks")
+        return cancelled
+
+    def get(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        The cached value for `key`, waiting on a prefetch already in flight
+        for no longer than the calling thread's deadline. A prefetch that is
+        still queued is taken over and run right away on the calling thread,
+        and one that failed is retried the same way.
+        """
+        if key in self.cache:
+            return self.cache[key]
+        with self._cond:
+            task = self._tasks.get(key)
+            if task and not task.future.running() and not task.future.done():
+                task.cancelled = True
+                task.future.cancel()
+                del self._tasks[key]
+                task = None
+        if task:
+            # the user is waiting on it now, its calls shouldn't queue
+            if task.ticket:
+                task.ticket.expedite()
+            try:
+                return task.future.result(timeout=remaining())
+            except TimeoutError:
+                # the prefetch carries on and caches its result for next time
+                raise DeadlineExceeded(f"ran out of time waiting on {key}")
+            except Exception as e:
+                logger.warning(f"prefetch of {key} failed, fetching again: {e}")
+        value = fetch()
+        self.cache[key] = value
+        return value
+
+    def shutdown(self) -> None:
+        self.cancel_pending()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _next_task(self) -> PrefetchTask | None:
+        with self._cond:
+            while True:
+                while self._queue and self._queue[0].cancelled:
+                    heapq.heappop(self._queue)
+                if self._queue:
+                    task = heapq.heappop(self._queue)
+                    if task.future.set_running_or_notify_cancel():
+                        task.ticket = Ticket(Priority.PREFETCH)
+                        return task
+                    continue
+                if self._closed:
+                    return None
+                self._cond.wait()
+
+    def _run(self) -> None:
+        while task := self._next_task():
+            logger.info(f"prefetching {task.key}")
+            try:
+                with scheduled(task.ticket):
+                    value = task.fetch()
+            except Exception as e:
+                logger.warning(f"prefetch of {task.key} failed: {e}")
+                task.future.set_exception(e)
+                with self._cond:
+                    if self._tasks.get(task.key) is task:
+                        del self._tasks[task.key]
+                continue
+            self.cache[task.key] = value
+            with self._cond:
+                if self._tasks.get(task.key) is task:
+                    del self._tasks[task.key]
+            task.future.set_result(value)
+            if task.then:
+                try:
+                    task.then(value)
+                except Exception as e:
+                    logger.warning(f"follow-up for prefetch {task.key} failed: {e}")
@@ -0,0 +1,301 @@
+"""
+Price files written locally from pricing the client already holds, instead
+of having the backend render and send one per account.
+
+    python price_export.py OUT_DIR [--snapshot snapshot.db] [--vendor adp]
+        [--format xlsx|csv] [--workers 4]
+
+Without --snapshot each account's pricing is fetched from the backend
+first. Files are written one row at a time, XLSX included, so memory
+use doesn't grow with the size of a customer's program.
+"""
+
+import re
+import csv
+import time
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from enum import StrEnum
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+from xml.sax.saxutils import escape
+
+
+class PriceFileFormat(StrEnum):
+    XLSX = "xlsx"
+    CSV = "csv"
+
+
+# header, cell value and whether it is a price, in the server file's order
+PRICE_FILE_COLUMNS: tuple[tuple[str, Callable, bool], ...] = (
+    ("Category", lambda p: _attr_value(p, "custom_description"), False),
+    ("Model Number", lambda p: p.model_number, False),
+    ("Description", lambda p: p.description or "", False),
+    ("Price", lambda p: p.price, True),
+    ("Effective Date", lambda p: str(p.effective_date or "")[:10], False),
+)
+INVALID_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+UNSAFE_FILENAME = re.compile(r'[<>:"/\\|?*\x00-\x1f]+')
+UNSAFE_SHEET_NAME = re.compile(r"[\[\]:*?/\\\x00-\x1f]+")
+
+
+def _attr_value(product, attr: str) -> str:
+    return product.attrs[attr].value if attr in product.attrs else ""
+
+
+def price_rows(stored_pricing: dict) -> Iterator[tuple]:
+    """
+    A customer's pricing as held in LOCAL_STORAGE, as price file rows in
+    the order the app lists them
+    """
+    from schemas import ProductPriceBasic, trusted_constructor, pricing_sort_key
+
+    construct = trusted_constructor(ProductPriceBasic)
+    products = [
+        construct({"id": id_, **attrs}) for id_, attrs in stored_pricing.items()
+    ]
+    products.sort(key=pricing_sort_key)
+    for product in products:
+        yield tuple(value(product) for _, value, _ in PRICE_FILE_COLUMNS)
+
+
+def write_csv(path: Path, rows: Iterable[tuple]) -> Path:
+    with open(path, "w", newline="", encoding="utf-8-sig") as fp:
+        writer = csv.writer(fp)
+        writer.writerow([header for header, _, _ in PRICE_FILE_COLUMNS])
+        writer.writerows(rows)
+    return path
+
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats'
+        '.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships"><sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/>'
+        "</sheets></workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats'
+        '.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/><Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'styles" Target="styles.xml"/></Relationships>'
+    ),
+    # style 1 is bold for the header, style 2 the built-in #,##0.00 for prices
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/'
+        'main"><fonts count="2"><font/><font><b/></font></fonts>'
+        '<fills count="1"><fill/></fills><borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs><cellXfs count="3"><xf/>'
+        '<xf fontId="1" applyFont="1"/><xf numFmtId="4" applyNumberFormat="1"/>'
+        "</cellXfs></styleSheet>"
+    ),
+}
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    "<sheetData>"
+)
+SHEET_TAIL = "</sheetData></worksheet>"
+
+
+def _text_cell(value, style: int = 0) -> str:
+    text = escape(INVALID_XML.sub("", str(value)))
+    style_attr = f' s="{style}"' if style else ""
+    return (
+        f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+    )
+
+
+def _row_xml(row: tuple) -> str:
+    cells = []
+    for value, (_, _, is_price) in zip(row, PRICE_FILE_COLUMNS):
+        if isinstance(value, int | float) and not isinstance(value, bool):
+            style = ' s="2"' if is_price else ""
+            cells.append(f"<c{style}><v>{value}</v></c>")
+        else:
+            cells.append(_text_cell(value))
+    return f"<row>{''.join(cells)}</row>"
+
+
+def write_xlsx(
+    path: Path, rows: Iterable[tuple], sheet_name: str = "Pricing", chunk: int = 500
+) -> Path:
+    """a single-sheet workbook, the sheet XML streamed straight into the zip"""
+    sheet_name = UNSAFE_SHEET_NAME.sub(" ", sheet_name)[:31].strip() or "Pricing"
+    sheet = escape(sheet_name, {'"': "&quot;"})
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in XLSX_PARTS.items():
+            zf.writestr(name, xml.replace("{sheet}", sheet))
+        with zf.open("xl/worksheets/sheet1.xml", "w") as fp:
+            header = "".join(_text_cell(h, 1) for h, _, _ in PRICE_FILE_COLUMNS)
+            buffer = [SHEET_HEAD, f"<row>{header}</row>"]
+            for row in rows:
+                buffer.append(_row_xml(row))
+                if len(buffer) >= chunk:
+                    fp.write("".join(buffer).encode())
+                    buffer.clear()
+            buffer.append(SHEET_TAIL)
+            fp.write("".join(buffer).encode())
+    return path
+
+
+def price_file_name(customer_name: str, vendor_name: str, fmt: PriceFileFormat) -> str:
+    name = UNSAFE_FILENAME.sub("_", f"{customer_name} {vendor_name} Pricing")
+    return f"{name} {date.today():%Y-%m-%d}.{fmt}"
+
+
+def export_price_file(
+    stored_pricing: dict,
+    directory: Path,
+    customer_name: str,
+    vendor_name: str,
+    fmt: PriceFileFormat = PriceFileFormat.XLSX,
+) -> Path:
+    """write one customer's price file, returns where it went"""
+    path = directory / price_file_name(customer_name, vendor_name, fmt)
+    rows = price_rows(stored_pricing)
+    match PriceFileFormat(fmt):
+        case PriceFileFormat.XLSX:
+            return write_xlsx(path, rows, sheet_name=customer_name)
+        case PriceFileFormat.CSV:
+            return write_csv(path, rows)
+
+
+PriceFileJob = tuple[dict, str, str]  # stored pricing, customer name, vendor name
+
+
+def export_price_files(
+    jobs: list[PriceFileJob],
+    directory: Path,
+    fmt: PriceFileFormat = PriceFileFormat.XLSX,
+    workers: int = 1,
+) -> list[Path | Exception]:
+    """
+    Write many price files, across `workers` processes when there is more
+    than one. Results line up with `jobs`, a failed file gives its exception.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    if workers <= 1 or len(jobs) <= 1:
+        results = []
+        for stored_pricing, customer_name, vendor_name in jobs:
+            try:
+                results.append(
+                    export_price_file(
+                        stored_pricing, directory, customer_name, vendor_name, fmt
+                    )
+                )
+            except Exception as e:
+                results.append(e)
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                export_price_file,
+                stored_pricing,
+                directory,
+                customer_name,
+                vendor_name,
+                fmt,
+            )
+            for stored_pricing, customer_name, vendor_name in jobs
+        ]
+        return [f.exception() or f.result() for f in futures]
+
+
+def collect_jobs(
+    snapshot_path: Path | None, vendor_ids: list[str] | None
+) -> list[PriceFileJob]:
+    """pricing for every account, from a snapshot or fetched from the backend"""
+    if snapshot_path:
+        from snapshot import Snapshot
+
+        source = Snapshot(snapshot_path)
+        vendors = source.vendors()
+        customers = source.customers
+        pricing = lambda account: source.pricing_by_customer(account.id)
+    else:
+        from auth import set_up_token
+
+        set_up_token()
+        import actions
+
+        vendors = actions.get_vendors()
+        customers = actions.get_sca_customers_w_vendor_accounts
+
+        def pricing(account) -> dict | None:
+            try:
+                actions.get_pricing_by_customer(account)
+            except Exception:
+                return None
+            return actions.LOCAL_STORAGE["pricing_by_customer"][account.id]
+
+    from vendor_handlers import HANDLERS
+
+    jobs = []
+    for vendor in vendors:
+        if vendor.id not in HANDLERS or (vendor_ids and vendor.id not in vendor_ids):
+            continue
+        for sca_customer in customers(vendor):
+            for account in sca_customer.entity_accounts:
+                if stored := pricing(account):
+                    jobs.append((stored, account.name, vendor.name))
+    return jobs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--snapshot", type=Path)
+    parser.add_argument("--vendor", action="append", dest="vendors")
+    parser.add_argument(
+        "--format", choices=list(PriceFileFormat), default=PriceFileFormat.XLSX
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    out_dir = args.out_dir.resolve()
+    snapshot_path = args.snapshot and args.snapshot.resolve()
+    start = time.perf_counter()
+    jobs = collect_jobs(snapshot_path, args.vendors)
+    collected = time.perf_counter()
+    results = export_price_files(jobs, out_dir, args.format, args.workers)
+    failed = [(job, e) for job, e in zip(jobs, results) if isinstance(e, Exception)]
+    for (_, customer_name, _), e in failed:
+        print(f"  {customer_name}: {e}")
+    print(
+        f"{len(jobs) - len(failed)} of {len(jobs)} price files in {out_dir}, "
+        f"{collected - start:.1f} s collecting, "
+        f"{time.perf_counter() - collected:.1f} s writing"
+    )
+
+
+if __name__ == "__main__":
+    main()
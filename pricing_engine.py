@@ -0,0 +1,166 @@
+"""
+Price checks worked out locally instead of by a model lookup round trip.
+
+A check's net price is the product's zero discount price less the better
+of the customer's material group and SNP discounts for the product's
+material group, as display_price_check reads the server's answers. ZDP
+comes from the zero discount pricing every ADP product has, loaded once
+in the background. Material groups and each customer's discounts are
+learned from the answers the server gives to the checks it still answers.
+
+A sample of local answers is checked against the server. A customer whose
+local answer disagrees goes back to the server for good.
+"""
+
+import random
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable
+from throttle import Priority, priority
+
+logger = logging.getLogger(__name__)
+
+# prices agree when they're this close, in dollars
+TOLERANCE = 0.01
+
+
+def discount_off(zdp: float, net: float | None) -> float | None:
+    """
+    the fraction off `zdp` that gave the server's `net` price. The stated
+    discounts come back as either 0.35 or 35, so a 1 can't be told from
+    100% by looking at it, the prices can.
+    """
+    if net is None or not zdp:
+        return None
+    derived = 1 - net / zdp
+    # net is in cents, a whole hundredth of a percent that gives the same
+    # price is the discount itself and carries over to dearer products
+    if round(zdp * (1 - (snapped := round(derived, 4))), 2) == round(net, 2):
+        return snapped
+    return derived
+
+
+@dataclass(slots=True, frozen=True)
+class Discounts:
+    material_group: float | None
+    snp: float | None
+
+
+class PriceEngine:
+    def __init__(
+        self,
+        zero_discount: Callable[[], dict[int, dict]],
+        material_group: Callable[[str], str | None] = lambda model: None,
+        sample: float = 0.05,
+    ) -> None:
+        """
+        `zero_discount` fetches ZDP rows by product id, shaped like
+        restructure_pricing_by_class. `material_group` is asked for the
+        group of a model no server answer has named yet.
+        """
+        self.sample = sample
+        self._zero_discount = zero_discount
+        self._material_group = material_group
+        self._by_model: dict[str, dict] | None = None
+        self._loading = False
+        self._groups: dict[str, str] = {}
+        self._discounts: dict[tuple[int, str], Discounts] = {}
+        self._distrusted: set[int] = set()
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        try:
+            with priority(Priority.BULK):
+                rows = self._zero_discount()
+        except Exception as e:
+            logger.warning(f"no zero discount pricing for local price checks: {e}")
+            with self._lock:
+                self._loading = False
+            return
+        by_model = {row["model_number"]: row for row in rows.values()}
+        with self._lock:
+            self._by_model = by_model
+
+    def _product(self, model: str) -> dict | None:
+        """the model's ZDP row, starting the one-off load if it hasn't begun"""
+        with self._lock:
+            if self._by_model is not None:
+                return self._by_model.get(model)
+            if self._loading:
+                return None
+            self._loading = True
+        threading.Thread(target=self._load, name="zdp-load", daemon=True).start()
+        return None
+
+    def learn(self, customer_id: int, answer: dict) -> None:
+        """take in a price check answer from the server"""
+        model, group = answer.get("model_number"), answer.get("mpg")
+        zdp = answer.get("zero_discount_price")
+        if not model or not group or not zdp:
+            return
+        discounts = Discounts(
+            discount_off(zdp, answer.get("material_group_net_price")),
+            discount_off(zdp, answer.get("snp_price")),
+        )
+        with self._lock:
+            self._groups[model] = group
+            self._discounts[(customer_id, group)] = discounts
+
+    def quote(self, customer_id: int, model: str) -> dict | None:
+        """
+        the answer the server would give, in the same shape, or None when
+        it can't be worked out here
+        """
+        with self._lock:
+            if customer_id in self._distrusted:
+                return None
+            group = self._groups.get(model)
+        group = group or self._material_group(model)
+        with self._lock:
+            discounts = self._discounts.get((customer_id, group))
+        if discounts is None or (product := self._product(model)) is None:
+            return None
+        zdp = product["price"] / 100
+        answer = {
+            key: value
+            for key, value in product.items()
+            if key not in ("price", "description")
+        }
+        answer |= {"mpg": group, "zero_discount_price": zdp, "net_price": zdp}
+        if discounts.material_group is not None:
+            net = round(zdp * (1 - discounts.material_group), 2)
+            answer["material_group_discount"] = discounts.material_group
+            answer["material_group_net_price"] = net
+            answer["net_price"] = min(answer["net_price"], net)
+        if discounts.snp is not None:
+            net = round(zdp * (1 - discounts.snp), 2)
+            answer["snp_discount"] = discounts.snp
+            answer["snp_price"] = net
+            answer["net_price"] = min(answer["net_price"], net)
+        if answer["net_price"] <= 0:
+            return None
+        return answer
+
+    def verifying(self) -> bool:
+        """whether to check this local answer against the server too"""
+        return random.random() < self.sample
+
+    def agrees(self, customer_id: int, local: dict, server: dict) -> bool:
+        """
+        whether a local answer matches the server's, the customer's checks
+        all go to the server from now on when it doesn't
+        """
+        agree = all(
+            abs(local[key] - (server.get(key) or 0)) <= TOLERANCE
+            for key in ("zero_discount_price", "net_price")
+        )
+        if not agree:
+            with self._lock:
+                self._distrusted.add(customer_id)
+            logger.warning(
+                f"local price check for {local['model_number']} said "
+                f"{local['net_price']}, the server {server.get('net_price')}, "
+                f"checks for customer {customer_id} go to the server from now on"
+            )
+        return agree
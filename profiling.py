@@ -0,0 +1,75 @@
+import time
+import pstats
+import logging
+import cProfile
+from contextlib import contextmanager
+from itertools import count
+from pathlib import Path
+from typing import Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class ActionProfiler:
+    """
+    Runs cProfile around a UI action and writes the raw stats (.prof, for
+    snakeviz or pstats) next to a text summary of the top functions.
+
+    `arm` profiles the next action only. With `always` set every action is
+    profiled, but only those slower than `min_seconds` are written out.
+    Work on background threads (prefetch, write-behind) isn't captured.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        top: int = 40,
+        always: bool = False,
+        min_seconds: float = 0.0,
+        on_dump: Callable[[Path], None] = None,
+    ) -> None:
+        self.directory = directory
+        self.top = top
+        self.always = always
+        self.min_seconds = min_seconds
+        self.on_dump = on_dump
+        self.armed = False
+        self._seq = count(1)
+
+    def arm(self) -> None:
+        self.armed = True
+
+    @contextmanager
+    def profiling(self, label: str) -> Iterator[None]:
+        if not (self.armed or self.always):
+            yield
+            return
+        one_shot, self.armed = self.armed, False
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - start
+            if one_shot or elapsed >= self.min_seconds:
+                self._dump(profile, label, elapsed)
+
+    def _dump(self, profile: cProfile.Profile, label: str, elapsed: float) -> None:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        stem = self.directory / f"profile-{stamp}-{next(self._seq)}"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            profile.dump_stats(stem.with_suffix(".prof"))
+            with open(stem.with_suffix(".txt"), "w") as fp:
+                fp.write(f"{label} took {elapsed:.3f} s\n\n")
+                stats = pstats.Stats(profile, stream=fp)
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+                stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        except OSError as e:
+            logger.error(f"unable to write profile {stem}: {e}")
+            return
+        logger.info(f"profiled {label} ({elapsed:.3f} s) to {stem}.prof")
+        if self.on_dump:
+            self.on_dump(stem.with_suffix(".prof"))
@@ -0,0 +1,98 @@
+"""
+Retrying backend calls that failed for reasons likely to pass: connection
+errors, timeouts, 429 and 502/503/504.
+
+Idempotent calls are simply sent again after an exponential backoff with
+full jitter. A POST is only sent again when it can't have created anything
+(the connection was never made, or the backend answered 429), when the
+backend rejects duplicates itself, or after an existence check finds
+nothing was created.
+"""
+
+import time
+import random
+import logging
+from dataclasses import dataclass
+from typing import Callable
+import requests as r
+from urllib3.exceptions import NewConnectionError, NameResolutionError
+from deadlines import remaining
+from throttle import retry_after
+from transport import NETWORK_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    attempts: int = 4
+    base_delay: float = 0.25
+    max_delay: float = 8.0
+    statuses: frozenset[int] = frozenset({429, 502, 503, 504})
+
+    def backoff(self, attempt: int, resp: r.Response = None) -> float:
+        """seconds to wait before retry number `attempt` + 1"""
+        if resp is not None and (after := retry_after(resp.headers)) is not None:
+            return min(after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+def never_sent(error: Exception) -> bool:
+    """whether a failed call certainly never reached the backend"""
+    if isinstance(error, r.exceptions.ConnectTimeout):
+        return True
+    cause = error.__context__
+    while cause is not None:
+        if isinstance(cause, (NewConnectionError, NameResolutionError)):
+            return True
+        cause = cause.__context__
+    return False
+
+
+def call_with_retries(
+    send: Callable[[int], r.Response],
+    policy: RetryPolicy,
+    resend_safe: bool = True,
+    exists: Callable[[], r.Response | None] = None,
+    description: str = "",
+) -> r.Response:
+    """
+    `send(attempt)` makes the call. When resending isn't safe, `exists` is
+    asked before each retry whether the first attempt took effect after
+    all, and what it returns is used as the response if so.
+    """
+    attempt = 0
+    while True:
+        resp, error = None, None
+        try:
+            resp = send(attempt)
+        except NETWORK_ERRORS as e:
+            error = e
+        if resp is not None and resp.status_code not in policy.statuses:
+            return resp
+        if attempt + 1 >= policy.attempts:
+            break
+        status_429 = resp is not None and resp.status_code == 429
+        if not (resend_safe or status_429 or (error and never_sent(error))):
+            if exists is None:
+                break
+            try:
+                found = exists()
+            except NETWORK_ERRORS:
+                break
+            if found is not None:
+                logger.info(f"{description} had gone through, not resending")
+                return found
+        delay = policy.backoff(attempt, resp)
+        if (left := remaining()) is not None and left < delay:
+            break
+        reason = error or resp.status_code
+        logger.warning(
+            f"{description} failed ({reason}), "
+            f"retry {attempt + 1} of {policy.attempts - 1} in {delay:.2f} s"
+        )
+        time.sleep(delay)
+        attempt += 1
+    if error:
+        raise error
+    return resp
@@ -0,0 +1,438 @@
+from datetime import datetime
+from enum import Enum, auto
+from functools import cache, lru_cache
+from types import UnionType
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from typing import (
+    Any,
+    Optional,
+    Callable,
+    Self,
+    Union,
+    get_args,
+    get_origin,
+)
+from write_behind import EditKind, EditKey
+
+
+class FieldKind(Enum):
+    PLAIN = auto()
+    DATETIME = auto()
+    MODEL = auto()
+    MODEL_LIST = auto()
+    MODEL_DICT = auto()
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    if get_origin(annotation) in (Union, UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _is_model(annotation: Any) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+_set_attr = object.__setattr__
+# effective dates repeat across thousands of rows
+_parse_datetime = lru_cache(maxsize=256)(datetime.fromisoformat)
+_datetime_text = lru_cache(maxsize=256)(str)
+
+
+@lru_cache(maxsize=256)
+def _attr_title(attr: str) -> str:
+    return attr.replace("_", " ").title()
+
+
+def _field_kind(annotation: Any) -> tuple[FieldKind, type[BaseModel] | None]:
+    annotation = _unwrap_optional(annotation)
+    origin, args = get_origin(annotation), get_args(annotation)
+    if _is_model(annotation):
+        return FieldKind.MODEL, annotation
+    elif origin is list and args and _is_model(args[0]):
+        return FieldKind.MODEL_LIST, args[0]
+    elif origin is dict and len(args) == 2 and _is_model(args[1]):
+        return FieldKind.MODEL_DICT, args[1]
+    elif annotation is datetime:
+        return FieldKind.DATETIME, None
+    return FieldKind.PLAIN, None
+
+
+_CONVERSIONS = {
+    FieldKind.PLAIN: "{value}",
+    FieldKind.DATETIME: (
+        "_parse_datetime({value}) if isinstance({value}, str) else {value}"
+    ),
+    FieldKind.MODEL: ("{nested}({value}) if isinstance({value}, dict) else {value}"),
+    FieldKind.MODEL_LIST: (
+        "[{nested}(v) if isinstance(v, dict) else v for v in {value}]"
+        " if {value} is not None else None"
+    ),
+    FieldKind.MODEL_DICT: (
+        "{{k: {nested}(v) if isinstance(v, dict) else v for k, v in {value}.items()}}"
+        " if {value} is not None else None"
+    ),
+}
+
+
+@cache
+def trusted_constructor(model: type[BaseModel]) -> Callable[[dict], BaseModel]:
+    """
+    Compile a constructor for `model` that takes data which has already
+    passed validation once, such as records held in LOCAL_STORAGE.
+
+    Like `model_construct`, nothing is coerced or checked, but the field
+    handling is generated once per model as straight-line code. Nested
+    models are rebuilt and ISO datetime strings parsed, which keeps the
+    result identical to the validated path. Keys that are not fields are
+    dropped, as validation would do.
+    """
+    namespace = {
+        "_model": model,
+        "_set_attr": _set_attr,
+        "_parse_datetime": _parse_datetime,
+        "_defaults": {},
+    }
+    lines = [
+        "def construct(data):",
+        "    values = {}",
+        "    fields_set = set()",
+    ]
+    for i, (name, field) in enumerate(model.model_fields.items()):
+        kind, nested = _field_kind(field.annotation)
+        nested_ref = None
+        if nested:
+            nested_ref = f"_nested_{i}"
+            namespace[nested_ref] = trusted_constructor(nested)
+        convert = _CONVERSIONS[kind].format(value="value", nested=nested_ref)
+        keys = [field.alias, name] if field.alias and field.alias != name else [name]
+        for n, key in enumerate(keys):
+            keyword = "if" if n == 0 else "elif"
+            lines += [
+                f"    {keyword} {key!r} in data:",
+                f"        value = data[{key!r}]",
+                f"        values[{name!r}] = {convert}",
+                f"        fields_set.add({name!r})",
+            ]
+        if not field.is_required():
+            # keep field order, pydantic iterates fields from __dict__
+            namespace["_defaults"][name] = field.get_default(call_default_factory=True)
+            lines += [
+                "    else:",
+                f"        values[{name!r}] = _defaults[{name!r}]",
+            ]
+    lines += [
+        "    instance = _model.__new__(_model)",
+        "    _set_attr(instance, '__dict__', values)",
+        "    _set_attr(instance, '__pydantic_fields_set__', fields_set)",
+        "    _set_attr(instance, '__pydantic_extra__', None)",
+        "    _set_attr(instance, '__pydantic_private__', None)",
+    ]
+    if issubclass(model, TrustedModel):
+        namespace["_normalize"] = model.normalize
+        lines.append("    _normalize(values)")
+    elif model.__pydantic_post_init__:
+        lines.append("    instance.model_post_init(None)")
+    lines.append("    return instance")
+    exec("\n".join(lines), namespace)
+    return namespace["construct"]
+
+
+class TrustedModel(BaseModel):
+    """Models that can skip validation when rebuilt from our own cache"""
+
+    @classmethod
+    def trusted(cls, **data) -> Self:
+        return trusted_constructor(cls)(data)
+
+    @staticmethod
+    def normalize(values: dict[str, Any]) -> None:
+        """adjust field values after construction, on either path"""
+
+    def model_post_init(self, __context) -> None:
+        self.normalize(self.__dict__)
+        return super().model_post_init(__context)
+
+
+class VendorProductAttrs(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
+    vendor_product_identifier: str
+    vendor_product_description: str
+
+
+class VendorProduct(BaseModel):
+    id: int
+    attributes: VendorProductAttrs
+
+
+class VendorProductAttrAttrs(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
+    attr: str
+    type: str
+    value: str
+
+
+class VendorProductAttr(BaseModel):
+    id: int
+    attributes: VendorProductAttrAttrs
+
+
+class CoilAttrs(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
+    category: str
+    model_number: str = Field(alias="model-number")
+    mpg: str
+    series: str
+    tonnage: int
+    pallet_qty: int = Field(alias="pallet-qty")
+    width: float
+    depth: Optional[float] = None
+    length: Optional[float] = None
+    height: float
+    weight: int
+    metering: str
+    cabinet: str
+    zero_discount_price: int = Field(alias="zero-discount-price")
+    material_group_discount: Optional[float] = Field(
+        default=None, alias="material-group-discount"
+    )
+    material_group_net_price: Optional[float] = Field(
+        default=None, alias="material-group-net-price"
+    )
+    snp_discount: Optional[float] = Field(default=None, alias="snp-discount")
+    snp_price: Optional[float] = Field(default=None, alias="snp-price")
+    net_price: Optional[float] = Field(default=None, alias="net-price")
+    effective_date: datetime = Field(default=None, alias="effective-date")
+    last_file_gen: datetime = Field(default=None, alias="last-file-gen")
+    stage: str
+
+
+class Attr(TrustedModel):
+    id: int
+    attr: str
+    type_: str
+    value: str
+
+    @staticmethod
+    def normalize(values: dict[str, Any]) -> None:
+        # JSON:API ids are strings in LOCAL_STORAGE, validation makes them ints
+        values["id"] = int(values["id"])
+        values["attr"] = _attr_title(values["attr"])
+
+
+class Price(TrustedModel):
+    id: int
+    attr: str = "Price"
+    value: int
+
+
+def edit_key(editable: Attr | Price) -> EditKey:
+    match editable:
+        case Attr():
+            return (EditKind.ATTR, editable.id)
+        case Price():
+            return (EditKind.PRICE, editable.id)
+
+
+class ProductPriceBasic(TrustedModel):
+    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
+    id: int
+    model_number: str = Field(alias="model-number")
+    description: Optional[str] = ""
+    price: int
+    effective_date: datetime = Field(default=None, alias="effective-date")
+    attrs: dict[str, Attr]
+
+    @staticmethod
+    def normalize(values: dict[str, Any]) -> None:
+        values["id"] = int(values["id"])
+        values["price"] = int(values["price"] / 100)
+        values["effective_date"] = _datetime_text(values["effective_date"])
+
+
+PRODUCT_PRICES = TypeAdapter(list[ProductPriceBasic])
+_DEFAULT_SORT_ATTR = Attr(id=-1, attr="", type_="", value="999999")
+_DEFAULT_DESC_ATTR = Attr(id=-1, attr="", type_="", value="")
+
+
+def pricing_sort_key(p: ProductPriceBasic) -> tuple:
+    """the order a customer's products are listed in"""
+    return (
+        int(p.attrs.get("sort_order", _DEFAULT_SORT_ATTR).value),
+        p.attrs.get("custom_description", _DEFAULT_DESC_ATTR).value,
+        (p.description if p.description else ""),
+        p.price,
+        p.model_number,
+    )
+
+
+class CoilAttrsV2(TrustedModel):
+    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
+    category: str
+    model_number: str = Field(alias="model-number")
+    mpg: str
+    series: str
+    tonnage: int
+    pallet_qty: int = Field(alias="pallet-qty")
+    width: float
+    depth: Optional[float] = None
+    length: Optional[float] = None
+    height: float
+    weight: int
+    metering: str
+    cabinet: str
+    price: int
+    effective_date: datetime = Field(default=None, alias="effective-date")
+
+    @staticmethod
+    def normalize(values: dict[str, Any]) -> None:
+        values["price"] = int(values["price"] / 100)
+        values["effective_date"] = _datetime_text(values["effective_date"])
+
+
+class Coil(BaseModel):
+    id: int
+    attributes: CoilAttrs
+
+
+class Coils(BaseModel):
+    data: list[Coil]
+
+
+class AHAttrs(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
+    category: str
+    model_number: str = Field(alias="model-number")
+    mpg: str
+    series: str
+    tonnage: int
+    pallet_qty: Optional[int] = Field(default=None, alias="pallet-qty")
+    min_qty: Optional[int] = Field(default=None, alias="min-qty")
+    width: float
+    depth: float
+    height: float
+    weight: int
+    metering: str
+    motor: str
+    heat: str
+    zero_discount_price: int = Field(alias="zero-discount-price")
+    material_group_discount: Optional[float] = Field(
+        default=None, alias="material-group-discount"
+    )
+    material_group_net_price: Optional[float] = Field(
+        default=None, alias="material-group-net-price"
+    )
+    snp_discount: Optional[float] = Field(default=None, alias="snp-discount")
+    snp_price: Optional[float] = Field(default=None, alias="snp-price")
+    net_price: Optional[float] = Field(default=None, alias="net-price")
+    effective_date: datetime = Field(default=None, alias="effective-date")
+    last_file_gen: datetime = Field(default=None, alias="last-file-gen")
+    stage: str
+
+
+class AHAttrsV2(TrustedModel):
+    model_config = ConfigDict(populate_by_name=True, protected_namespaces={})
+    category: str
+    model_number: str = Field(alias="model-number")
+    mpg: str
+    series: str
+    tonnage: int
+    pallet_qty: Optional[int] = Field(default=None, alias="pallet-qty")
+    min_qty: Optional[int] = Field(default=None, alias="min-qty")
+    width: float
+    depth: float
+    height: float
+    weight: int
+    metering: str
+    motor: str
+    heat: str
+    price: int
+    effective_date: datetime = Field(default=None, alias="effective-date")
+
+    @staticmethod
+    def normalize(values: dict[str, Any]) -> None:
+        values["price"] = int(values["price"] / 100)
+        values["effective_date"] = _datetime_text(values["effective_date"])
+
+
+class AH(BaseModel):
+    id: int
+    attributes: AHAttrs
+
+
+class AHV2(TrustedModel):
+    id: int
+    attributes: AHAttrsV2
+
+
+class AHs(BaseModel):
+    data: list[AH]
+
+
+class AHsV2(TrustedModel):
+    data: list[AHV2]
+
+
+class RatingAttrs(TrustedModel):
+    model_config = ConfigDict(populate_by_name=True, protected_namespaces=())
+    ahrinumber: Optional[str] = None
+    outdoor_model: Optional[str] = Field(default=None, alias="outdoor-model")
+    oem_name: Optional[str] = Field(default=None, alias="oem-name")
+    oem_name_1: Optional[str] = Field(default=None, alias="oem-name-1")
+    indoor_model: Optional[str] = Field(default=None, alias="indoor-model")
+    furnace_model: Optional[str] = None
+    oem_name_2: Optional[str] = Field(default=None, alias="OEM Name")
+    m1: Optional[str] = None
+    status: Optional[str] = None
+    oem_series: Optional[str] = Field(default=None, alias="OEM Series")
+    adp_series: Optional[str] = Field(default=None, alias="ADP Series")
+    model_number: Optional[str] = Field(default=None, alias="Model Number")
+    coil_model_number: Optional[str] = Field(default=None, alias="Coil Model Number")
+    furnace_model_number: Optional[str] = Field(
+        default=None, alias="Furnace Model Number"
+    )
+    seer: Optional[float] = None
+    eer: Optional[float] = None
+    capacity: Optional[float] = None
+    four_seven_o: Optional[float] = Field(default=None, alias="47o")
+    one_seven_o: Optional[float] = Field(default=None, alias="17o")
+    hspf: Optional[float] = None
+    seer2: Optional[float] = None
+    eer2: Optional[float] = None
+    capacity2: Optional[float] = None
+    four_seven_o2: Optional[float] = Field(default=None, alias="47o2")
+    one_seven_o2: Optional[float] = Field(default=None, alias="17o2")
+    hspf2: Optional[float] = None
+    ahri_ref_number: Optional[int] = Field(default=None, alias="AHRI Ref Number")
+    region: Optional[str] = None
+    effective_date: str = Field(alias="effective-date")
+    seer2_as_submitted: Optional[float] = None
+    eer95f2_as_submitted: Optional[float] = None
+    capacity2_as_submitted: Optional[float] = None
+    hspf2_as_submitted: Optional[float] = None
+
+
+class Rel(TrustedModel):
+    id: int
+    type: str
+
+
+class RelObj(TrustedModel):
+    data: Rel
+
+
+class RatingRels(TrustedModel):
+    model_config = ConfigDict(populate_by_name=True)
+    adp_customers: RelObj = Field(alias="adp-customers")
+
+
+class Rating(TrustedModel):
+    id: int
+    attributes: RatingAttrs
+    relationships: RatingRels
+
+
+class Ratings(TrustedModel):
+    data: list[Rating]
@@ -0,0 +1,53 @@
+"""
+Single-flight: concurrent callers asking for the same thing share one
+execution. The first caller for a key runs it, the ones arriving while it
+is in flight wait for its result or exception instead of running it again.
+Nothing is kept once the flight lands, caching is left to the callers.
+
+Outcomes are counted in METRICS under the flight's name, alongside the
+cache hits its callers report, for the performance panel.
+"""
+
+import threading
+from concurrent.futures import Future, TimeoutError
+from typing import Callable, Hashable, TypeVar
+from deadlines import DeadlineExceeded, remaining
+from metrics import METRICS
+from throttle import Ticket, current_ticket
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, tuple[Future, Ticket]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], T], name: str = "") -> T:
+        ticket = current_ticket()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                future = Future()
+                self._flights[key] = (future, ticket)
+        if flight:
+            future, leader = flight
+            METRICS.count_cache(name, "coalesced")
+            # a more urgent caller shouldn't wait on a flight stuck in line
+            leader.expedite(ticket.priority)
+            try:
+                return future.result(timeout=remaining())
+            except TimeoutError:
+                raise DeadlineExceeded(f"ran out of time waiting on {name}")
+        METRICS.count_cache(name, "miss")
+        try:
+            value = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._flights[key]
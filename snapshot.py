@@ -0,0 +1,246 @@
+"""
+Offline snapshots of vendors, customers and customer pricing in one
+SQLite file, for browsing pricing without the backend.
+
+    python snapshot.py export [snapshot.db] [--vendor adp] [--ratings]
+    python main.py --offline [snapshot.db]
+
+Payloads are zlib-compressed JSON and are only decoded when a screen asks
+for them, so opening a snapshot costs next to nothing.
+"""
+
+import os
+import json
+import zlib
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Callable
+from decoding import loads
+from models import Vendor, VendorCustomer, SCACustomerV2
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE vendors (id TEXT PRIMARY KEY, name TEXT NOT NULL, rank INTEGER);
+CREATE TABLE customers (vendor_id TEXT PRIMARY KEY, payload BLOB NOT NULL);
+CREATE TABLE pricing (
+    customer_id INTEGER PRIMARY KEY, vendor_id TEXT NOT NULL, payload BLOB NOT NULL
+);
+CREATE TABLE ratings (customer_id INTEGER PRIMARY KEY, payload BLOB NOT NULL);
+"""
+
+
+class SnapshotError(Exception):
+    """Exception for a snapshot that is missing, from another version or incomplete"""
+
+
+def _pack(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+
+
+def _unpack(blob: bytes) -> Any:
+    return loads(zlib.decompress(blob))
+
+
+def write_snapshot(
+    path: Path,
+    vendors: list[Vendor],
+    customers: dict[str, list[SCACustomerV2]],
+    pricing: dict[int, tuple[str, dict]],
+    ratings: dict[int, list[dict]] = None,
+    meta: dict[str, str] = None,
+) -> Path:
+    """
+    `pricing` maps a vendor customer id to its vendor id and its pricing as
+    held in LOCAL_STORAGE. The file is built next to `path` and moved into
+    place once complete, so a failed export never clobbers a good snapshot.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(SCHEMA)
+        meta = {
+            "version": str(SNAPSHOT_VERSION),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            **(meta or {}),
+        }
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+        conn.executemany(
+            "INSERT INTO vendors VALUES (?, ?, ?)",
+            [(v.id, v.name, rank) for rank, v in enumerate(vendors)],
+        )
+        conn.executemany(
+            "INSERT INTO customers VALUES (?, ?)",
+            [
+                (
+                    vendor_id,
+                    _pack(
+                        [
+                            [
+                                c.sca_id,
+                                c.sca_name,
+                                [[a.id, a.name] for a in c.entity_accounts],
+                            ]
+                            for c in sca_customers
+                        ]
+                    ),
+                )
+                for vendor_id, sca_customers in customers.items()
+            ],
+        )
+        # JSON object keys are always strings, ids are kept as pairs so
+        # integer ids come back as integers
+        conn.executemany(
+            "INSERT INTO pricing VALUES (?, ?, ?)",
+            [
+                (customer_id, vendor_id, _pack(list(products.items())))
+                for customer_id, (vendor_id, products) in pricing.items()
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO ratings VALUES (?, ?)",
+            [
+                (customer_id, _pack(records))
+                for customer_id, records in (ratings or {}).items()
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return path
+
+
+class Snapshot:
+    """read-only access to a snapshot file, safe to share across threads"""
+
+    def __init__(self, path: Path) -> None:
+        if not path.is_file():
+            raise SnapshotError(f"no snapshot at {path}")
+        self.path = path
+        self._conn = sqlite3.connect(
+            f"{path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self.meta = dict(self._query("SELECT key, value FROM meta"))
+        if self.meta.get("version") != str(SNAPSHOT_VERSION):
+            raise SnapshotError(
+                f"{path} is snapshot version {self.meta.get('version')}, "
+                f"expected {SNAPSHOT_VERSION}"
+            )
+
+    def _query(self, sql: str, *params) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def vendors(self) -> list[Vendor]:
+        rows = self._query("SELECT id, name FROM vendors ORDER BY rank")
+        return [Vendor.interned(id_, name) for id_, name in rows]
+
+    def customers(self, vendor: Vendor) -> list[SCACustomerV2]:
+        rows = self._query(
+            "SELECT payload FROM customers WHERE vendor_id = ?", vendor.id
+        )
+        if not rows:
+            raise SnapshotError(f"no {vendor.name} customers in the snapshot")
+        return [
+            SCACustomerV2(
+                sca_id=sca_id,
+                sca_name=sca_name,
+                vendor=vendor,
+                entity_accounts=tuple(
+                    VendorCustomer(id=id_, vendor=vendor, name=name)
+                    for id_, name in accounts
+                ),
+            )
+            for sca_id, sca_name, accounts in _unpack(rows[0][0])
+        ]
+
+    def pricing_by_customer(self, customer_id: int) -> dict | None:
+        rows = self._query(
+            "SELECT payload FROM pricing WHERE customer_id = ?", customer_id
+        )
+        return dict(_unpack(rows[0][0])) if rows else None
+
+    def ratings(self, customer_id: int) -> list[dict] | None:
+        rows = self._query(
+            "SELECT payload FROM ratings WHERE customer_id = ?", customer_id
+        )
+        return _unpack(rows[0][0]) if rows else None
+
+
+def export_snapshot(
+    path: Path,
+    vendor_ids: list[str] = None,
+    with_ratings: bool = False,
+    progress: Callable[[str], None] = print,
+) -> Path:
+    """fetch everything the offline read paths need from the backend"""
+    from auth import set_up_token
+
+    set_up_token()
+    import actions
+    from vendor_handlers import HANDLERS
+
+    vendors = [
+        v
+        for v in actions.get_vendors()
+        if v.id in HANDLERS and (not vendor_ids or v.id in vendor_ids)
+    ]
+    customers, pricing, ratings = {}, {}, {}
+    for vendor in vendors:
+        customers[vendor.id] = actions.get_sca_customers_w_vendor_accounts(vendor)
+        accounts = [a for c in customers[vendor.id] for a in c.entity_accounts]
+        progress(f"{vendor.name}: {len(accounts)} accounts")
+        for n, account in enumerate(accounts, start=1):
+            try:
+                actions.get_pricing_by_customer(account)
+            except Exception as e:
+                logger.warning(f"no pricing for {account.name}: {e}")
+            else:
+                stored = actions.LOCAL_STORAGE["pricing_by_customer"][account.id]
+                pricing[account.id] = (vendor.id, stored)
+            if with_ratings and vendor.id == "adp":
+                try:
+                    actions.get_ratings(account)
+                except Exception as e:
+                    logger.warning(f"no ratings for {account.name}: {e}")
+                else:
+                    ratings[account.id] = actions.LOCAL_STORAGE["ratings"][account.id]
+            if n % 25 == 0:
+                progress(f"  {n}/{len(accounts)}")
+    return write_snapshot(
+        path,
+        vendors,
+        customers,
+        pricing,
+        ratings,
+        meta={"backend_url": actions.BACKEND_URL},
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write a snapshot from the backend")
+    export.add_argument("path", type=Path, nargs="?", default=Path("snapshot.db"))
+    export.add_argument("--vendor", action="append", dest="vendors")
+    export.add_argument("--ratings", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    start = time.perf_counter()
+    path = export_snapshot(args.path.resolve(), args.vendors, args.ratings)
+    size_kb = path.stat().st_size / 1024
+    print(f"wrote {path} ({size_kb:,.0f} KiB) in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Backpressure and priorities for background calls. Prefetching runs at
+`priority(Priority.PREFETCH)` and bulk syncs at `priority(Priority.BULK)`.
+Their calls wait in transport.request for a free slot under the host's
+adaptive concurrency limit, then for a token from the bucket of the
+endpoint class they hit. Calls made for the user are INTERACTIVE and
+never wait, but they still fill a slot, spend a token and report how the
+backend is coping, so background work backs off while the user is busy.
+
+Waiting calls get free slots in priority order, first come first served
+within a class, so a prefetch never queues behind a bulk sync. When the
+user ends up waiting on background work, `Ticket.expedite` makes it
+INTERACTIVE and it goes out at once.
+
+The limit is AIMD: each call that comes back healthy adds 1 / limit, so a
+full window of them raises it by one, and a 429, a 5xx, a network error or
+latency climbing well past its usual level halves it, at most once per
+round trip. A Retry-After holds background calls until it has passed.
+"""
+
+import time
+import logging
+import threading
+from contextlib import AbstractContextManager, contextmanager
+from email.utils import parsedate_to_datetime
+from dataclasses import dataclass
+from enum import IntEnum, StrEnum, auto
+from itertools import count
+from typing import Iterator, Mapping
+from deadlines import DeadlineExceeded, remaining
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class EndpointClass(StrEnum):
+    PRICING = auto()
+    LOOKUP = auto()
+    READ = auto()
+    WRITE = auto()
+
+
+def endpoint_class(method: str, route: str) -> EndpointClass:
+    """
+    PRICING is the customer pricing documents, far heavier to build than
+    anything else the backend serves
+    """
+    if method != "GET":
+        return EndpointClass.WRITE
+    if "/model-lookup/" in route:
+        return EndpointClass.LOOKUP
+    if route.endswith(("/vendor-customers/{id}", "/pricing")):
+        return EndpointClass.PRICING
+    return EndpointClass.READ
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    PREFETCH = 1
+    BULK = 2
+
+    def __str__(self) -> str:
+        return self.name.lower()
+
+
+@dataclass(eq=False, slots=True)
+class Ticket:
+    """where a thread's calls stand in line, can be raised while they wait"""
+
+    priority: Priority
+    waiting_on: "AdaptiveLimit | None" = None
+
+    def expedite(self, to: Priority = Priority.INTERACTIVE) -> None:
+        """someone more urgent, by default the user, is waiting on these calls"""
+        if to >= self.priority:
+            return
+        self.priority = to
+        if limit := self.waiting_on:
+            limit.wake()
+
+
+@contextmanager
+def scheduled(ticket: Ticket) -> Iterator[Ticket]:
+    """calls made on this thread meanwhile stand in line by `ticket`"""
+    outer = getattr(_local, "ticket", None)
+    _local.ticket = ticket
+    try:
+        yield ticket
+    finally:
+        _local.ticket = outer
+
+
+def priority(level: Priority) -> AbstractContextManager[Ticket]:
+    return scheduled(Ticket(level))
+
+
+def current_ticket() -> Ticket:
+    return getattr(_local, "ticket", None) or Ticket(Priority.INTERACTIVE)
+
+
+def retry_after(headers: Mapping[str, str]) -> float | None:
+    """a Retry-After header as seconds, in either of its two forms"""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _wait(cond: threading.Condition, seconds: float | None) -> None:
+    """wait on `cond`, raising DeadlineExceeded if the thread's deadline hits first"""
+    if (left := remaining()) is not None:
+        if left <= 0:
+            raise DeadlineExceeded("ran out of time waiting for the backend to free up")
+        seconds = left if seconds is None else min(seconds, left)
+    cond.wait(seconds)
+
+
+class TokenBucket:
+    """
+    `rate` tokens a second, up to `burst` saved up. Interactive calls take
+    their token without waiting and leave the bucket in debt, which the
+    background then pays off.
+    """
+
+    def __init__(self, rate: float, burst: float = None) -> None:
+        self.rate = rate
+        self.burst = max(1.0, rate if burst is None else burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, ticket: Ticket) -> None:
+        if self.rate <= 0:
+            return
+        with self._cond:
+            self._refill()
+            while ticket.priority is not Priority.INTERACTIVE and self._tokens < 1:
+                _wait(self._cond, (1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class AdaptiveLimit:
+    """
+    AIMD concurrency limit for one host's background calls, starting at
+    `minimum` and growing to at most `maximum`. Latency is judged per
+    endpoint class against a no-load baseline: the lowest seen, creeping up
+    1% a second so it follows a lasting change in the backend.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        minimum: int = 1,
+        maximum: int = 8,
+        tolerance: float = 2.0,
+        backoff: float = 0.5,
+    ) -> None:
+        self.name = name
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.limit = float(self.minimum)
+        self.in_flight = 0
+        self.hold_until = 0.0
+        self._baseline: dict[str, tuple[float, float]] = {}
+        self._recent: dict[str, float] = {}
+        self._last_cut = 0.0
+        self._waiting: dict[Ticket, int] = {}
+        self._seq = count()
+        self._cond = threading.Condition()
+
+    def acquire(self, ticket: Ticket) -> None:
+        """
+        take a slot, waiting for one unless `ticket` is INTERACTIVE.
+        Interactive calls still fill a slot, leaving the background fewer.
+        """
+        with self._cond:
+            if ticket.priority is not Priority.INTERACTIVE:
+                self._waiting[ticket] = next(self._seq)
+                ticket.waiting_on = self
+                try:
+                    while ticket.priority is not Priority.INTERACTIVE:
+                        hold = self.hold_until - time.monotonic()
+                        if (
+                            hold <= 0
+                            and self.in_flight < int(self.limit)
+                            and self._next_in_line() is ticket
+                        ):
+                            break
+                        _wait(self._cond, hold if hold > 0 else None)
+                finally:
+                    del self._waiting[ticket]
+                    ticket.waiting_on = None
+                    # whoever is next in line may go now
+                    self._cond.notify_all()
+            self.in_flight += 1
+
+    def _next_in_line(self) -> Ticket:
+        return min(self._waiting, key=lambda t: (t.priority, self._waiting[t]))
+
+    def wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self) -> None:
+        """give back the slot of a call that tells nothing about the backend"""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def record(
+        self,
+        key: str,
+        latency: float,
+        status: int = None,
+        error: bool = False,
+        retry_after: float = None,
+    ) -> None:
+        """give back the slot of a call, with how it went"""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if retry_after:
+                self.hold_until = max(self.hold_until, now + retry_after)
+            if error or status == 429 or (status or 0) >= 500:
+                reason = "network error" if error else f"{status}"
+            else:
+                reason = self._track_latency(key, latency, now)
+            if reason:
+                # the calls already in flight when the last cut was made
+                # report the same trouble, don't cut again for them
+                if now - self._last_cut > self._recent.get(key, latency):
+                    self._last_cut = now
+                    before = self.limit
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    if int(before) != int(self.limit):
+                        logger.info(
+                            f"background calls to {self.name} cut to "
+                            f"{int(self.limit)} at a time ({reason})"
+                        )
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _track_latency(self, key: str, latency: float, now: float) -> str:
+        baseline, since = self._baseline.get(key, (latency, now))
+        baseline = min(baseline * 1.01 ** (now - since), latency)
+        self._baseline[key] = (baseline, now)
+        recent = self._recent.get(key, latency) * 0.8 + latency * 0.2
+        self._recent[key] = recent
+        # a few ms either way on a fast endpoint is noise, not load
+        if recent > max(baseline * self.tolerance, baseline + 0.05):
+            return f"latency {recent * 1000:.0f} ms against {baseline * 1000:.0f} ms"
+        return ""
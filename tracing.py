@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    start_ns: int
+    thread_id: int
+    thread_name: str
+    end_ns: int = 0
+    args: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set(self, **args) -> None:
+        """attach details, e.g. row counts, once they are known"""
+        self.args.update(args)
+
+
+class Tracer:
+    """
+    Records timed, nested spans of work into a bounded in-memory buffer.
+    Spans opened inside another span on the same thread nest under it when
+    exported, so a slow interaction breaks down into the request, parsing,
+    model construction and widget building it spent its time on.
+    """
+
+    def __init__(self, capacity: int = 20_000, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._spans: deque[Span] = deque(maxlen=capacity)
+        self._origin_ns = time.perf_counter_ns()
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[Span]:
+        thread = threading.current_thread()
+        span = Span(name, time.perf_counter_ns(), thread.ident, thread.name, args=args)
+        try:
+            yield span
+        finally:
+            span.end_ns = time.perf_counter_ns()
+            if self.enabled:
+                # deque.append is atomic, no lock needed across threads
+                self._spans.append(span)
+
+    def traced(self, name: str = None) -> Callable:
+        """decorator form of `span`, named after the function by default"""
+
+        def decorator(func: Callable) -> Callable:
+            span_name = name or func.__qualname__
+
+            @wraps(func)
+            def inner(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+
+            return inner
+
+        return decorator
+
+    def spans(self) -> list[Span]:
+        return list(self._spans)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+    def chrome_trace(self) -> dict:
+        """
+        Spans as Chrome trace events, viewable in chrome://tracing or
+        https://ui.perfetto.dev
+        """
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for span in self.spans():
+            threads[span.thread_id] = span.thread_name
+            events.append(
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": (span.start_ns - self._origin_ns) / 1000,
+                    "dur": (span.end_ns - span.start_ns) / 1000,
+                    "pid": pid,
+                    "tid": span.thread_id,
+                    "args": span.args,
+                }
+            )
+        for thread_id, thread_name in threads.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": thread_id,
+                    "args": {"name": thread_name},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, directory: Path) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        with open(path, "w") as fp:
+            json.dump(self.chrome_trace(), fp, default=str)
+        return path
+
+
+TRACER = Tracer()
+span = TRACER.span
+traced = TRACER.traced
@@ -0,0 +1,392 @@
+import os
+import socket
+import hashlib
+import time
+import threading
+import configparser
+import requests as r
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Iterator
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    NameResolutionError,
+    NewConnectionError,
+)
+from urllib3.util.connection import allowed_gai_family
+from metrics import METRICS, CallRecord, route_template
+from tracing import span
+from deadlines import DeadlineExceeded, remaining
+from circuit import CircuitBreaker, CircuitState
+from singleflight import SingleFlight
+from throttle import (
+    AdaptiveLimit,
+    EndpointClass,
+    TokenBucket,
+    current_ticket,
+    endpoint_class,
+    retry_after,
+)
+
+configs = configparser.ConfigParser()
+configs.read(
+    os.environ.get("BACKEND_TUI_CONFIG", Path(__file__).resolve().parent / "config.ini")
+)
+CONNECT_TIMEOUT = configs.getfloat("OTHER", "connect_timeout_s", fallback=5.0)
+READ_TIMEOUT = configs.getfloat("OTHER", "read_timeout_s", fallback=30.0)
+BREAKER_FAILURES = configs.getint("OTHER", "breaker_failures", fallback=5)
+BREAKER_RESET = configs.getfloat("OTHER", "breaker_reset_s", fallback=30.0)
+BACKGROUND_MIN = configs.getint("OTHER", "background_min_concurrency", fallback=1)
+BACKGROUND_MAX = configs.getint("OTHER", "background_max_concurrency", fallback=8)
+LATENCY_TOLERANCE = configs.getfloat("OTHER", "latency_tolerance", fallback=2.0)
+# calls a second per endpoint class, `rate_pricing` etc., 0 for no limit
+ENDPOINT_RATES = {
+    cls: configs.getfloat("OTHER", f"rate_{cls}", fallback=fallback)
+    for cls, fallback in (
+        (EndpointClass.PRICING, 8.0),
+        (EndpointClass.LOOKUP, 10.0),
+        (EndpointClass.READ, 20.0),
+        (EndpointClass.WRITE, 5.0),
+    )
+}
+# responses that mean the backend, or what's in front of it, is struggling
+UNAVAILABLE_STATUSES = frozenset({502, 503, 504})
+# what bodies handed to a `decode` are read in
+CHUNK_SIZE = 64 * 1024
+NETWORK_ERRORS = (
+    r.exceptions.ConnectionError,
+    r.exceptions.Timeout,
+    r.exceptions.ChunkedEncodingError,
+)
+
+_local = threading.local()
+OFFLINE = False
+
+
+class OfflineError(Exception):
+    """Exception for a backend call attempted while running from a snapshot"""
+
+
+def go_offline() -> None:
+    global OFFLINE
+    OFFLINE = True
+
+
+@dataclass(slots=True)
+class CallTiming:
+    dns: float = 0.0
+    connect: float = 0.0
+    ttfb: float = 0.0
+
+
+def _current_timing() -> CallTiming | None:
+    return getattr(_local, "timing", None)
+
+
+class TimedConnectionMixin:
+    """
+    Splits connection setup into name resolution and connect (TCP + TLS).
+    Both stay at zero for calls that reuse a pooled keep-alive connection.
+    """
+
+    def _new_conn(self) -> socket.socket:
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(
+                self._dns_host.strip("[]"),
+                self.port,
+                allowed_gai_family(),
+                socket.SOCK_STREAM,
+            )
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        if timing := _current_timing():
+            timing.dns = time.perf_counter() - start
+        dns_host = self._dns_host
+        # each address just resolved in turn, as create_connection tries
+        # them, instead of resolving again
+        error = None
+        try:
+            for *_, sockaddr in addresses:
+                self._dns_host = sockaddr[0]
+                try:
+                    return super()._new_conn()
+                except (ConnectTimeoutError, NewConnectionError) as e:
+                    error = e
+        finally:
+            self._dns_host = dns_host
+        if error is None:
+            raise NewConnectionError(self, "getaddrinfo returned no addresses")
+        raise error
+
+    def connect(self) -> None:
+        start = time.perf_counter()
+        super().connect()
+        if timing := _current_timing():
+            timing.connect = time.perf_counter() - start - timing.dns
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """records time to first byte: the adapter returns once headers are in"""
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request: r.PreparedRequest, *args, **kwargs) -> r.Response:
+        start = time.perf_counter()
+        resp = super().send(request, *args, **kwargs)
+        if timing := _current_timing():
+            timing.ttfb = time.perf_counter() - start
+        return resp
+
+
+def new_session() -> r.Session:
+    session = r.Session()
+    session.mount("http://", TimedAdapter())
+    session.mount("https://", TimedAdapter())
+    return session
+
+
+# one keep-alive pool for the whole program
+SESSION = new_session()
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_circuit_listeners: list[Callable[[str, CircuitState], None]] = []
+
+
+def _circuit_changed(host: str, state: CircuitState) -> None:
+    for listener in _circuit_listeners:
+        listener(host, state)
+
+
+def on_circuit_change(listener: Callable[[str, CircuitState], None]) -> None:
+    """`listener` is called from whichever thread made the deciding call"""
+    _circuit_listeners.append(listener)
+
+
+def breaker_for(url: str) -> CircuitBreaker:
+    """one breaker per host, the backend and the OAuth server fail separately"""
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(
+                host, BREAKER_FAILURES, BREAKER_RESET, on_change=_circuit_changed
+            )
+        return _breakers[host]
+
+
+_limits: dict[str, AdaptiveLimit] = {}
+_buckets: dict[tuple[str, EndpointClass], TokenBucket] = {}
+_throttle_lock = threading.Lock()
+
+
+def limit_for(url: str) -> AdaptiveLimit:
+    host = urlsplit(url).netloc
+    with _throttle_lock:
+        if host not in _limits:
+            _limits[host] = AdaptiveLimit(
+                host, BACKGROUND_MIN, BACKGROUND_MAX, LATENCY_TOLERANCE
+            )
+        return _limits[host]
+
+
+def bucket_for(url: str, cls: EndpointClass) -> TokenBucket:
+    key = (urlsplit(url).netloc, cls)
+    with _throttle_lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(ENDPOINT_RATES[cls])
+        return _buckets[key]
+
+
+def call_timeout(timeout: float | tuple[float, float] = None) -> tuple[float, float]:
+    """
+    (connect, read) timeouts for a call, cut down to what's left of the
+    current thread's deadline. The read timeout bounds each wait on the
+    socket, not the whole transfer.
+    """
+    match timeout:
+        case (connect, read):
+            pass
+        case None:
+            connect, read = CONNECT_TIMEOUT, READ_TIMEOUT
+        case _:
+            connect = read = timeout
+    if (left := remaining()) is not None:
+        if left <= 0:
+            raise DeadlineExceeded("ran out of time waiting on the backend")
+        connect, read = min(connect, left), min(read, left)
+    return connect, read
+
+
+def auth_scope(headers: dict | None) -> str:
+    """who a call is made as, without keeping the token itself around"""
+    token = (headers or {}).get("Authorization", "")
+    return hashlib.blake2b(token.encode(), digest_size=8).hexdigest()
+
+
+# identical GETs in flight at once share one response
+_gets = SingleFlight()
+
+
+def request(
+    method: str,
+    url: str,
+    retry_count: int = 0,
+    decode: Callable[[Iterator[bytes]], Any] = None,
+    **kwargs,
+) -> r.Response:
+    """
+    Concurrent GETs for the same URL, made as the same user, go out once
+    and share the response, see _send for everything else.
+    """
+    if method != "GET" or kwargs.get("stream"):
+        return _send(method, url, retry_count, decode, **kwargs)
+    key = (
+        method,
+        url,
+        repr(kwargs.get("params")),
+        auth_scope(kwargs.get("headers")),
+        decode,
+    )
+    return _gets.do(
+        key,
+        partial(_send, method, url, retry_count, decode, **kwargs),
+        f"{method} {route_template(url)}",
+    )
+
+
+def _send(
+    method: str,
+    url: str,
+    retry_count: int = 0,
+    decode: Callable[[Iterator[bytes]], Any] = None,
+    **kwargs,
+) -> r.Response:
+    """
+    Every backend call goes through here. The response body is read before
+    returning so the recorded total covers the full transfer. With `decode`,
+    the body of a successful response is handed to it in chunks as they
+    arrive and what it makes of them is left on the response as `decoded`,
+    see decoding.read_document, instead of being kept as `content`. Calls to a
+    host whose circuit is open fail straight away with CircuitOpenError.
+    Background calls first wait their turn under the host's adaptive limit
+    and the rate of the endpoint class they hit, in priority order, see
+    throttle.
+    """
+    if OFFLINE:
+        raise OfflineError(f"offline, {method} {url} was not sent")
+    route = route_template(url)
+    cls = endpoint_class(method, route)
+    limit = limit_for(url)
+    ticket = current_ticket()
+    # the class the call was queued as, it may be expedited while waiting
+    queued_as = str(ticket.priority)
+    queued_at = time.perf_counter()
+    limit.acquire(ticket)
+    try:
+        bucket_for(url, cls).acquire(ticket)
+        METRICS.record_queue_wait(queued_as, time.perf_counter() - queued_at)
+        kwargs["timeout"] = call_timeout(kwargs.get("timeout"))
+        breaker = breaker_for(url)
+        breaker.before_call()
+    except BaseException:
+        limit.release()
+        raise
+    if decode:
+        kwargs["stream"] = True
+    timing = CallTiming()
+    _local.timing = timing
+    status, size, wire, after = None, 0, 0, None
+    start = time.perf_counter()
+    with span(f"{method} {route}") as call_span:
+        try:
+            try:
+                resp: r.Response = SESSION.request(method, url, **kwargs)
+                status = resp.status_code
+                if decode and 200 <= status < 300 and status != 204:
+                    received = []
+                    chunks = (
+                        received.append(len(chunk)) or chunk
+                        for chunk in resp.iter_content(CHUNK_SIZE)
+                    )
+                    resp.decoded = decode(chunks)
+                    # anything after the document, so the connection can be reused
+                    for _ in chunks:
+                        pass
+                    size = sum(received)
+                else:
+                    size = len(resp.content)
+                # what urllib3 read off the socket, compressed if it was sent so
+                wire = resp.raw.tell() if resp.raw else size
+                after = retry_after(resp.headers)
+            except NETWORK_ERRORS:
+                breaker.record(ok=False)
+                limit.record(cls, time.perf_counter() - start, error=True)
+                raise
+            except BaseException:
+                breaker.release()
+                limit.release()
+                raise
+            breaker.record(ok=status not in UNAVAILABLE_STATUSES)
+            limit.record(cls, timing.ttfb, status=status, retry_after=after)
+            return resp
+        finally:
+            _local.timing = None
+            record = CallRecord(
+                method=method,
+                route=route,
+                status=status,
+                bytes=size,
+                wire_bytes=wire,
+                dns=timing.dns,
+                connect=timing.connect,
+                ttfb=timing.ttfb,
+                total=time.perf_counter() - start,
+                retries=retry_count,
+                finished_at=time.time(),
+            )
+            METRICS.record(record)
+            call_span.set(
+                url=url,
+                status=status,
+                bytes=size,
+                wire_bytes=wire,
+                dns_ms=round(timing.dns * 1000, 2),
+                connect_ms=round(timing.connect * 1000, 2),
+                ttfb_ms=round(timing.ttfb * 1000, 2),
+                retries=retry_count,
+                priority=queued_as,
+                queued_ms=round((start - queued_at) * 1000, 2),
+            )
+
+
+get = partial(request, "GET")
+post = partial(request, "POST")
+patch = partial(request, "PATCH")
+delete = partial(request, "DELETE")
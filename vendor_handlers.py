@@ -1,5 +1,7 @@
+import math
 import urwid
 import logging
+import threading
 from requests import Response
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING, Callable
@@ -7,6 +9,7 @@ from models import (
     ADPActions,
     Route,
     Palette,
+    TableRow,
     ProductPriceBasic,
     Attr,
     Vendor,
@@ -17,18 +20,27 @@ from actions import (
     price_check,
     get_pricing_by_customer,
     new_product,
+    plan_bulk_add,
     post_new_ratings,
     select_file,
     debug,
 )
 from functools import partial
+from tracing import span
+from deadlines import DeadlineExceeded, restarted
+from logging_setup import StepLogger
 
 if TYPE_CHECKING:
     from main import Application
+    from bulk_sync import SyncResult
 
 logger = logging.getLogger(__name__)
 
 
+def percent(fraction: float) -> str:
+    return "-" if math.isnan(fraction) else f"{fraction * 100:0.1f}%"
+
+
 class VendorHandler(ABC):
     def __init__(self, app: "Application") -> None:
         self.app: "Application" = app
@@ -40,7 +52,7 @@ class VendorHandler(ABC):
 
 class AtcoHandler(VendorHandler):
 
-    vendor = Vendor("atco", "Atco Flex")
+    vendor = Vendor.interned("atco", "Atco Flex")
 
     def get_action_flow(self) -> Callable:
         return partial(
@@ -54,7 +66,9 @@ class AtcoHandler(VendorHandler):
         customer = self.app.vendor_customer
         try:
             logger.info(f"Downloading {customer.vendor.name} file for {customer.name}")
-            download_file(vendor=self.vendor, customer_id=customer.id)
+            download_file(
+                vendor=self.vendor, customer_id=customer.id, customer_name=customer.name
+            )
         except Exception as e:
             flash_text = urwid.Text(
                 ("flash_bad", f"an error occured - {str(e)}"), align="center"
@@ -69,7 +83,7 @@ class AtcoHandler(VendorHandler):
 
 class VybondHandler(VendorHandler):
 
-    vendor = Vendor("vybond", "Vybond")
+    vendor = Vendor.interned("vybond", "Vybond")
 
     def get_action_flow(self) -> Callable:
         return partial(
@@ -83,7 +97,9 @@ class VybondHandler(VendorHandler):
         customer = self.app.vendor_customer
         try:
             logger.info(f"Downloading {customer.vendor.name} file for {customer.name}")
-            download_file(vendor=self.vendor, customer_id=customer.id)
+            download_file(
+                vendor=self.vendor, customer_id=customer.id, customer_name=customer.name
+            )
         except Exception as e:
             flash_text = urwid.Text(
                 ("flash_bad", f"an error occured - {str(e)}"), align="center"
@@ -99,7 +115,7 @@ class VybondHandler(VendorHandler):
 class ADPHandler(VendorHandler):
     """ADP Management Flows"""
 
-    vendor = Vendor("adp", "ADP")
+    vendor = Vendor.interned("adp", "ADP")
 
     def get_action_flow(self) -> Callable:
         return partial(
@@ -175,6 +191,126 @@ class ADPHandler(VendorHandler):
             self.app.frame.body = urwid.Filler(urwid.Pile([response_body]))
         return
 
+    def pricing_analytics(self) -> urwid.ListBox:
+        """
+        pricing across every ADP customer, loaded once into columns on a
+        worker thread, the menu replaces the progress shown meanwhile
+        """
+        status = urwid.Text("Loading ADP customers")
+        loading = urwid.ListBox([urwid.Divider(), status])
+        threading.Thread(
+            target=self._load_analytics,
+            args=(loading, status),
+            name="analytics-load",
+            daemon=True,
+        ).start()
+        return loading
+
+    def _load_analytics(self, loading: urwid.ListBox, status: urwid.Text) -> None:
+        from actions import get_zero_discount_pricing
+        from analytics import PricingColumns, collect_pricing
+
+        def progress(result: "SyncResult") -> None:
+            msg = f"Loading pricing: {result.done} of {result.total} accounts"
+            self.app.call_soon(status.set_text, msg)
+
+        try:
+            with span("analytics load"):
+                self.app.wait_for_startup()
+                accounts = self.app.vendor_accounts(self.vendor)
+                logger.info(f"Loading pricing for {len(accounts)} ADP accounts")
+                pricing, failed = collect_pricing(accounts, on_progress=progress)
+                self.app.call_soon(status.set_text, "Building the analytics")
+                self.columns = PricingColumns.build(
+                    pricing,
+                    get_zero_discount_pricing(),
+                    {account.id: account.name for account in accounts},
+                )
+        except Exception as e:
+            logger.error(f"pricing analytics failed to load: {e}")
+            self.app.call_soon(status.set_text, ("flash_bad", f"Unable to load - {e}"))
+            return
+        logger.info(f"Done. {len(self.columns)} rows, {len(failed)} without pricing")
+        self.app.call_soon(self._show_analytics, loading, len(pricing), failed)
+
+    def _show_analytics(
+        self, loading: urwid.ListBox, accounts: int, failed: list[VendorCustomer]
+    ) -> None:
+        title = (
+            f"Pricing analytics - {accounts} accounts, "
+            f"{len(self.columns):,} products"
+        )
+        if failed:
+            title += f", {len(failed)} accounts without pricing"
+        if self.app.frame.body.base_widget is not loading:
+            self.app.flash("flash_good", f"{title} loaded, open it again to see it")
+            return
+        by_series = partial(
+            self.analytics_table,
+            "Discounts off ZDP by series",
+            ["series", "rows", "customers", "mean", "p10", "median", "p90"],
+            lambda: [
+                (s.series, s.rows, s.customers, *map(percent, s[3:]))
+                for s in self.columns.discounts_by_series()
+            ],
+        )
+        by_customer = partial(
+            self.analytics_table,
+            "Products below ZDP by customer",
+            ["customer", "rows", "below ZDP", "mean discount", "deepest"],
+            lambda: [
+                (c.customer, c.rows, c.below_zdp, *map(percent, c[3:]))
+                for c in self.columns.discounts_by_customer()
+            ],
+        )
+        routes = [
+            Route(callable_=by_series, choice_title="Discounts by series"),
+            Route(callable_=by_customer, choice_title="Customers below ZDP"),
+            Route(
+                callable_=self.below_zdp_lookup,
+                choice_title="Customers below ZDP on a model",
+            ),
+        ]
+        menu = self.app.routing_menu(title, routes)
+        self.app.frame.body = urwid.Padding(menu, left=2, right=2)
+
+    def analytics_table(
+        self, title: str, headers: list[str], rows: Callable[[], list[tuple]]
+    ) -> urwid.ListBox:
+        self.app.frame.header = urwid.AttrMap(
+            urwid.Text(title), Palette.HEADER.value[0]
+        )
+        with span("analytics query", title=title):
+            body = [TableRow(row) for row in rows()]
+        if not body:
+            body = [urwid.Text("Nothing to show")]
+        # laid out like TableRow, a fixed selector column then equal weights
+        header = urwid.Columns(
+            [("fixed", 5, urwid.Text(""))]
+            + [("weight", 10, urwid.Text(("header", h))) for h in headers],
+            dividechars=3,
+        )
+        return urwid.ListBox([urwid.Divider(), header, *body])
+
+    def below_zdp_lookup(self) -> urwid.ListBox:
+        self.user_input = urwid.Edit("Enter Model Number: ")
+        submit = urwid.Button("Submit", on_press=self.display_below_zdp)
+        return urwid.ListBox(
+            [self.user_input, urwid.AttrMap(submit, None, focus_map="reversed")]
+        )
+
+    def display_below_zdp(self, button) -> None:
+        model = self.user_input.edit_text.strip().upper()
+        table = self.analytics_table(
+            f"Customers below ZDP on {model}",
+            ["customer", "price", "ZDP", "discount"],
+            lambda: [
+                (m.customer, f"${m.price:,.2f}", f"${m.zdp:,.2f}", percent(m.discount))
+                for m in self.columns.below_zdp(model)
+            ],
+        )
+        self.app.frame.body = urwid.Padding(table, left=2, right=2)
+
     def add_new_product(self) -> urwid.ListBox:
         return self._add_new_model(partial(self.submit_model, new_product))
 
@@ -183,15 +319,43 @@ class ADPHandler(VendorHandler):
         customer = self.app.vendor_customer
         user_text: str = self.user_input.edit_text
         model_list: list = [model.strip().upper() for model in user_text.split(",")]
-        results = list()
-        total_items = len(model_list)
-        for i, model in enumerate(model_list):
+        plan = plan_bulk_add(customer.id, model_list)
+        results = [
+            urwid.Text(
+                ("flash_good", f"Model {model} already set up for {customer.name}")
+            )
+            for model in plan.already_priced
+        ]
+        results += [
+            urwid.Text(("flash_good", f"Model {model} was entered more than once"))
+            for model in plan.repeated
+        ]
+        total_items = len(plan.to_add)
+        for i, model in enumerate(plan.to_add):
+            log = StepLogger(logger, customer_id=customer.id, model=model)
             current_msg = f"Working on {model}  ({i+1} of {total_items})"
-            logger.info(current_msg)
-            resp: Response = product_type_method(customer.id, model)
+            log.info(current_msg, extra={"step": "start"})
+            try:
+                # each model gets the whole budget, the batch as a whole has none
+                with restarted():
+                    resp: Response = product_type_method(
+                        customer.id, model, catalog=plan.catalog
+                    )
+            except DeadlineExceeded as e:
+                log.error(f"Failure: {e}", extra={"step": "done"})
+                results.append(
+                    urwid.Text(
+                        (
+                            "flash_bad",
+                            f"Ran out of time adding model {model}, "
+                            "it may be partly set up",
+                        )
+                    )
+                )
+                continue
             body = resp.json()
             if resp.status_code == 200:
-                logger.info("Success")
+                log.info("Success", extra={"step": "done"})
                 body_data: dict[str, str | dict] = body["data"]
                 response_header = urwid.Text(
                     (
@@ -201,7 +365,7 @@ class ADPHandler(VendorHandler):
                     )
                 )
             else:
-                logger.error("Failure")
+                log.error("Failure", extra={"step": "done"})
                 response_header = urwid.Text(
                     ("flash_bad", f"Unable to add model {model}")
                 )
@@ -213,7 +377,8 @@ class ADPHandler(VendorHandler):
     def upload_ratings(self, selected_file: str) -> None:
         customer = self.app.vendor_customer
         try:
-            post_new_ratings(customer.id, selected_file)
+            with restarted():
+                post_new_ratings(customer.id, selected_file)
         except Exception as e:
             header_text = urwid.Text(("flash_bad", str(e)))
             logging.info(f"error uploading ratings: {e}")
@@ -235,7 +400,11 @@ class ADPHandler(VendorHandler):
                     logger.info(
                         f"Downloading {customer.vendor.name} file for {customer.name}"
                     )
-                    download_file(vendor=self.vendor, customer_id=customer.id)
+                    download_file(
+                        vendor=self.vendor,
+                        customer_id=customer.id,
+                        customer_name=customer.name,
+                    )
                 except Exception as e:
                     flash_text = urwid.Text(
                         ("flash_bad", f"an error occured - {str(e)}"), align="center"
@@ -272,26 +441,27 @@ class ADPHandler(VendorHandler):
                         align="center",
                     )
                 )
-                cats = set()
-                for p in products:
-                    if category_obj := p.attrs.get("custom_description", None):
-                        category = category_obj.value
-                    else:
-                        category = ""
-                    if category not in cats:
-                        routes.append(urwid.Divider("-"))
-                        routes.append(
-                            urwid.Text(
-                                (Palette.NORMAL.value[0], f"{category}"),
-                                align="center",
+                with span("build product routes", products=len(products)):
+                    cats = set()
+                    for p in products:
+                        if category_obj := p.attrs.get("custom_description", None):
+                            category = category_obj.value
+                        else:
+                            category = ""
+                        if category not in cats:
+                            routes.append(urwid.Divider("-"))
+                            routes.append(
+                                urwid.Text(
+                                    (Palette.NORMAL.value[0], f"{category}"),
+                                    align="center",
+                                )
                             )
+                            cats.add(category)
+                        route = Route(
+                            callable_=self.app.product_selected(p),
+                            choice_title=f"{p.id:05}   {p.model_number}   ${p.price:.02f}",
                         )
-                        cats.add(category)
-                    route = Route(
-                        callable_=self.app.product_selected(p),
-                        choice_title=f"{p.id:05}   {p.model_number}   ${p.price:.02f}",
-                    )
-                    routes.append(route)
+                        routes.append(route)
                 self.app.next_screen = partial(
                     self.app.routing_menu,
                     f"{customer.name}",
@@ -301,6 +471,9 @@ class ADPHandler(VendorHandler):
             case ADPActions.PRICE_CHECK:
                 self.app.next_screen = self.do_model_lookup
                 self.app.show_new_screen()
+            case ADPActions.ANALYTICS:
+                self.app.next_screen = self.pricing_analytics
+                self.app.show_new_screen()
             case _:
                 response = "No Action taken"
                 response_text = urwid.Text(response)
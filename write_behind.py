@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from enum import StrEnum, auto
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EditKind(StrEnum):
+    ATTR = auto()
+    PRICE = auto()
+
+
+class SyncState(StrEnum):
+    PENDING = auto()
+    FLUSHED = auto()
+    FAILED = auto()
+
+
+EditKey = tuple[EditKind, int]
+
+
+@dataclass
+class PendingEdit:
+    kind: EditKind
+    id: int
+    vendor_id: str
+    value: str | int
+    version: int = 0
+
+    @property
+    def key(self) -> EditKey:
+        return (self.kind, self.id)
+
+
+FlushMethod = Callable[[list[PendingEdit]], dict[EditKey, Optional[Exception]]]
+StateListener = Callable[[EditKey, SyncState], None]
+
+
+class WriteBehindQueue:
+    """
+    Buffers local edits and persists them on a background worker.
+
+    Repeated edits to the same attr or price id are coalesced so only the
+    latest value is sent. The worker waits `flush_interval` seconds after
+    the first pending edit before flushing, giving fast keyboard edits a
+    chance to collapse into a single batch.
+    """
+
+    def __init__(
+        self,
+        flush_method: FlushMethod,
+        on_state_change: StateListener = None,
+        flush_interval: float = 0.5,
+        max_batch: int = 50,
+    ) -> None:
+        self.flush_method = flush_method
+        self.on_state_change = on_state_change
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: dict[EditKey, PendingEdit] = {}
+        self._states: dict[EditKey, SyncState] = {}
+        self._versions: dict[EditKey, int] = {}
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._worker: threading.Thread = None
+
+    def start(self) -> "WriteBehindQueue":
+        if not self._worker:
+            self._worker = threading.Thread(
+                target=self._run, name="write-behind", daemon=True
+            )
+            self._worker.start()
+        return self
+
+    def submit(
+        self, kind: EditKind, id_: int, vendor_id: str, value: str | int
+    ) -> None:
+        """queue an edit, replacing any unsent edit for the same id"""
+        key = (kind, id_)
+        with self._cond:
+            version = self._versions.get(key, 0) + 1
+            self._versions[key] = version
+            self._pending[key] = PendingEdit(kind, id_, vendor_id, value, version)
+            self._states[key] = SyncState.PENDING
+            self._cond.notify()
+        self._notify(key, SyncState.PENDING)
+
+    def state(self, kind: EditKind, id_: int) -> SyncState | None:
+        with self._cond:
+            return self._states.get((kind, id_))
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """flush whatever is still buffered and stop the worker"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._worker:
+            self._worker.join(timeout)
+            if self._worker.is_alive():
+                logger.error(
+                    f"write-behind queue stopped with {self.pending_count()} "
+                    "edits not persisted"
+                )
+
+    def _notify(self, key: EditKey, state: SyncState) -> None:
+        if self.on_state_change:
+            try:
+                self.on_state_change(key, state)
+            except Exception as e:
+                logger.error(f"write-behind state listener failed: {e}")
+
+    def _take_batch(self) -> list[PendingEdit]:
+        batch = []
+        for key in list(self._pending)[: self.max_batch]:
+            batch.append(self._pending.pop(key))
+        self._in_flight = len(batch)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending and self._stopping:
+                    return
+                # debounce window so repeated edits coalesce before sending
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopping and (left := deadline - time.monotonic()) > 0:
+                    self._cond.wait(left)
+                batch = self._take_batch()
+            self._flush(batch)
+
+    def _flush(self, batch: list[PendingEdit]) -> None:
+        logger.info(f"flushing {len(batch)} edits")
+        try:
+            results = self.flush_method(batch)
+        except Exception as e:
+            results = {edit.key: e for edit in batch}
+        changed: list[tuple[EditKey, SyncState]] = []
+        with self._cond:
+            self._in_flight = 0
+            for edit in batch:
+                error = results.get(edit.key)
+                if error:
+                    logger.error(f"unable to persist {edit.kind} {edit.id}: {error}")
+                if self._versions.get(edit.key) != edit.version:
+                    # a newer edit is queued and owns the displayed state
+                    continue
+                state = SyncState.FAILED if error else SyncState.FLUSHED
+                self._states[edit.key] = state
+                changed.append((edit.key, state))
+        for key, state in changed:
+            self._notify(key, state)